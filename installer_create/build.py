@@ -20,6 +20,7 @@ if __name__ == '__main__':
         '--hidden-import=win32com.client',
         '--hidden-import=winshell',
         '--hidden-import=psutil',
+        '--hidden-import=psm.backends.windows',
         '--collect-all=pystray',
         '--collect-all=PIL',
         '--noconfirm',
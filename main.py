@@ -1,91 +1,25 @@
+import time
+
+# Начало отсчёта профиля запуска (до импорта остальных модулей)
+STARTUP_STARTED = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import subprocess
-import psutil
 import os
 import sys
-import json
 import threading
-import time
-import pystray
-from PIL import Image, ImageDraw
-import winshell
-from win32com.client import Dispatch
 from datetime import datetime
-import uuid
 import shutil
-import winreg
-
-
-def find_system_python():
-    """
-    Находит системный интерпретатор Python в следующих местах:
-    1. В переменной PATH
-    2. В реестре Windows (установленные версии Python)
-    3. Стандартные пути установки
-    """
-    # 1. Поиск в PATH
-    # python_path = shutil.which("python")
-    # if python_path and os.path.exists(python_path):
-    #     return python_path
-
-    # 2. Поиск в реестре Windows
-    try:
-        # Пытаемся найти в реестре установленные версии Python
-        registry_paths = [
-            (winreg.HKEY_CURRENT_USER, r"Software\Python\PythonCore"),
-            (winreg.HKEY_LOCAL_MACHINE, r"Software\Python\PythonCore"),
-            (winreg.HKEY_LOCAL_MACHINE, r"Software\Wow6432Node\Python\PythonCore")
-        ]
-
-        for hive, path in registry_paths:
-            try:
-                with winreg.OpenKey(hive, path) as key:
-                    # Получаем список установленных версий
-                    i = 0
-                    while True:
-                        try:
-                            version = winreg.EnumKey(key, i)
-                            try:
-                                with winreg.OpenKey(hive, f"{path}\\{version}\\InstallPath") as install_key:
-                                    install_path, _ = winreg.QueryValueEx(install_key, "")
-                                    python_exe = os.path.join(install_path, "python.exe")
-                                    if os.path.exists(python_exe):
-                                        return python_exe
-                            except:
-                                pass
-                            i += 1
-                        except WindowsError:
-                            break
-            except:
-                pass
-    except:
-        pass
-
-    # 3. Стандартные пути установки
-    standard_paths = [
-        r"C:\Python*\python.exe",
-        r"C:\Program Files\Python*\python.exe",
-        r"C:\Users\{}\AppData\Local\Programs\Python\Python*\python.exe".format(os.getenv('USERNAME')),
-    ]
-
-    for path in standard_paths:
-        if os.path.exists(path):
-            return path
-
-    # 4. Если ничего не найдено, возвращаем текущий интерпретатор
-    return sys.executable
+import codecs
 
-# Определяем базовый путь для работы с файлами в EXE
-def get_base_path():
-    if getattr(sys, 'frozen', False):
-        # Если программа запущена как EXE
-        return os.path.dirname(sys.executable)
-    else:
-        # Если программа запущена как скрипт
-        return os.path.dirname(os.path.abspath(__file__))
+# pystray, PIL, psutil, модули Windows и HTTP API загружаются при первом использовании
+from psm.engine import SupervisorEngine, ScriptRuntime, ScriptLaunchError
+from psm.output import OUTPUT_ENCODING_CHOICES, DEFAULT_OUTPUT_MAX_LINES, DEFAULT_OUTPUT_MAX_BYTES
+from psm.placement import PRIORITY_LEVELS, IO_PRIORITY_LEVELS, parse_cpu_list, format_cpu_list
+from psm.pool import WARM_POOL_SIZE
+from psm.profiling import StartupProfile
+from psm.scheduling import AUTOSTART_MAX_CONCURRENT, AUTOSTART_CPU_THRESHOLD
 
-BASE_PATH = get_base_path()
 
 # Настройки тем
 THEMES = {
@@ -126,19 +60,572 @@ THEMES = {
 }
 
 
+
+# Период обновления окна прогресса остановки скриптов (мс)
+SHUTDOWN_PROGRESS_MS = 100
+
+
+class ScriptPanel(ScriptRuntime):
+    """Состояние активного скрипта вместе с последними показанными метриками (виджеты принадлежат панели)"""
+
+    __slots__ = ('cpu', 'memory', 'children')
+
+    def __init__(self, script_uuid, script_info):
+        super().__init__(script_uuid, script_info)
+        self.cpu = 0.0  # % CPU из последнего снимка метрик (сумма по дереву процессов)
+        self.memory = 0.0  # % памяти из последнего снимка метрик (сумма по дереву процессов)
+        self.children = ()  # ProcessMetrics потомков процесса скрипта
+
+
+# Режимы панели активных скриптов: подробные карточки или компактная таблица (по строке на скрипт)
+SCRIPT_VIEW_MODES = ('cards', 'compact')
+# Расстояние между карточками активных скриптов (пиксели)
+SCRIPT_CARD_GAP = 8
+# Шаг прокрутки списка карточек колесом мыши и стрелками полосы прокрутки (пиксели)
+SCRIPT_LIST_SCROLL_STEP = 40
+# Тег привязок, который получают все виджеты карточек, чтобы колесо мыши прокручивало список
+SCRIPT_LIST_WHEEL_TAG = "ScriptListWheel"
+# Диапазоны мини-графиков истории в карточках: ключ -> (шаг истории в секундах, число точек)
+SPARKLINE_RANGES = {'5m': (1, 300), '1h': (10, 360), '24h': (60, 1440)}
+# Размер мини-графика (пиксели)
+SPARKLINE_WIDTH = 110
+SPARKLINE_HEIGHT = 26
+
+
+class Sparkline:
+    """
+    Мини-график истории одной метрики: Canvas с единственной линией, координаты которой
+    заменяются целиком. Точек больше, чем пикселей, - соседние точки сливаются в максимум.
+    """
+
+    def __init__(self, parent, title, formatter, colors, minimum_scale=0):
+        self.title = title
+        self.formatter = formatter
+        self.minimum_scale = minimum_scale  # нижняя граница шкалы (например, 100% для CPU)
+        self._values = None
+
+        self.frame = ttk.Frame(parent)
+        self.label = ttk.Label(self.frame, text=title, font=("Arial", 8))
+        self.label.pack(anchor="w")
+        self.canvas = tk.Canvas(self.frame, width=SPARKLINE_WIDTH, height=SPARKLINE_HEIGHT,
+                                highlightthickness=0, bg=colors["frame_bg"])
+        self.canvas.pack(anchor="w")
+        self.line = self.canvas.create_line(0, SPARKLINE_HEIGHT, SPARKLINE_WIDTH, SPARKLINE_HEIGHT,
+                                            fill=colors["progress_fg"])
+
+    def apply_theme(self, colors):
+        self.canvas.configure(bg=colors["frame_bg"])
+        self.canvas.itemconfigure(self.line, fill=colors["progress_fg"])
+
+    def draw(self, values):
+        """Рисует точки values (старые - первыми, None - нет данных); без изменений ничего не делает"""
+        values = tuple(values or ())
+        if values == self._values:
+            return
+        self._values = values
+        known = [value for value in values if value is not None]
+        if not known:
+            self.label.config(text=self.title)
+            self.canvas.coords(self.line, 0, SPARKLINE_HEIGHT, SPARKLINE_WIDTH, SPARKLINE_HEIGHT)
+            return
+
+        peak = max(known)
+        scale = max(peak, self.minimum_scale) or 1
+        group = -(-len(values) // SPARKLINE_WIDTH)
+        columns = [values[i:i + group] for i in range(0, len(values), group)]
+        step = SPARKLINE_WIDTH / max(1, len(columns) - 1)
+        coords = []
+        for index, column in enumerate(columns):
+            value = max((v for v in column if v is not None), default=0)
+            coords.extend((index * step, SPARKLINE_HEIGHT - 1 - value / scale * (SPARKLINE_HEIGHT - 2)))
+        if len(coords) == 2:
+            coords.extend((SPARKLINE_WIDTH, coords[1]))
+        self.canvas.coords(self.line, *coords)
+        last = next((value for value in reversed(values) if value is not None), 0)
+        self.label.config(text=f"{self.title}: {self.formatter(last)} (пик {self.formatter(peak)})")
+
+
+class ScriptCard:
+    """Карточка активного скрипта из пула ScriptCardList; при прокрутке привязывается к другому скрипту"""
+
+    def __init__(self, parent, app, colors):
+        self.app = app
+        self.script_uuid = None
+        self._state = None  # (имя, запущен, cpu, память, процессов), показанные сейчас
+
+        self.frame = ttk.LabelFrame(parent, padding=10)
+
+        # Controls
+        controls_frame = ttk.Frame(self.frame)
+        controls_frame.pack(fill="x", pady=(0, 8))
+
+        # Кнопка консоли - изначально отключена
+        self.console_btn = ttk.Button(controls_frame, text="Консоль", state=tk.DISABLED,
+                                      command=lambda: app.open_console(self.script_uuid))
+        self.console_btn.pack(side="right", padx=2)
+
+        ttk.Button(controls_frame, text="Настройки",
+                   command=lambda: app.configure_script(self.script_uuid)).pack(side="right", padx=2)
+        ttk.Button(controls_frame, text="Удалить из активных",
+                   command=lambda: app.remove_from_active(self.script_uuid)).pack(side="right", padx=2)
+
+        # Объединенная кнопка запуска/остановки
+        self.toggle_btn = ttk.Button(controls_frame, text="Запуск", style="Start.TButton",
+                                     command=lambda: app.toggle_script(self.script_uuid))
+        self.toggle_btn.pack(side="right", padx=2)
+
+        # Resource monitoring
+        resources_frame = ttk.Frame(self.frame)
+        resources_frame.pack(fill="x", pady=8)
+
+        self.cpu_var = tk.IntVar()
+        self.memory_var = tk.IntVar()
+
+        ttk.Label(resources_frame, text="CPU:").grid(row=0, column=0, sticky="w")
+        ttk.Progressbar(resources_frame, variable=self.cpu_var,
+                        maximum=100).grid(row=0, column=1, sticky="ew", padx=5)
+        self.cpu_label = ttk.Label(resources_frame, text="0%")
+        self.cpu_label.grid(row=0, column=2, padx=5)
+
+        ttk.Label(resources_frame, text="Память:").grid(row=1, column=0, sticky="w")
+        ttk.Progressbar(resources_frame, variable=self.memory_var,
+                        maximum=100).grid(row=1, column=1, sticky="ew", padx=5)
+        self.memory_label = ttk.Label(resources_frame, text="0%")
+        self.memory_label.grid(row=1, column=2, padx=5)
+
+        # Число процессов в дереве скрипта (CPU и память выше - сумма по всем)
+        ttk.Label(resources_frame, text="Процессы:").grid(row=2, column=0, sticky="w")
+        self.processes_label = ttk.Label(resources_frame, text="")
+        self.processes_label.grid(row=2, column=1, sticky="w", padx=5)
+
+        resources_frame.columnconfigure(1, weight=1)
+
+        # История метрик скрипта (пики за выбранный в меню ВИД диапазон)
+        history_frame = ttk.Frame(self.frame)
+        history_frame.pack(fill="x")
+        self.sparklines = {
+            'cpu': Sparkline(history_frame, "CPU", lambda v: f"{v:.0f}%", colors, minimum_scale=100),
+            'rss': Sparkline(history_frame, "Память", lambda v: f"{v / 1048576:.0f} МБ", colors),
+            'threads': Sparkline(history_frame, "Потоки", lambda v: f"{v:.0f}", colors),
+            'io': Sparkline(history_frame, "Диск", lambda v: f"{v / 1024:.0f} КБ/с", colors),
+        }
+        for column, sparkline in enumerate(self.sparklines.values()):
+            sparkline.frame.grid(row=0, column=column, sticky="w", padx=(0, 8))
+
+        # Колесо мыши над любой частью карточки прокручивает список
+        stack = [self.frame]
+        while stack:
+            widget = stack.pop()
+            widget.bindtags((SCRIPT_LIST_WHEEL_TAG,) + widget.bindtags())
+            stack.extend(widget.winfo_children())
+
+    def bind(self, runtime):
+        """Показывает состояние скрипта; виджеты меняются, только если значение изменилось"""
+        self.script_uuid = runtime.script_uuid
+        script_info = runtime.script_info
+        processes = 1 + len(runtime.children) if runtime.is_running else 0
+        state = (script_info.get('display_name', script_info['name']), runtime.is_running,
+                 round(runtime.cpu, 1), round(runtime.memory, 1), processes)
+        if state == self._state:
+            return
+        old = self._state or (None, None, None, None, None)
+        self._state = state
+        title, running, cpu, memory, processes = state
+
+        if title != old[0]:
+            self.frame.configure(text=title)
+        if running != old[1]:
+            if running:
+                self.toggle_btn.config(text="Остановить", style="Stop.TButton")
+                self.console_btn.config(state=tk.NORMAL)
+            else:
+                self.toggle_btn.config(text="Запуск", style="Start.TButton")
+                self.console_btn.config(state=tk.DISABLED)
+        if cpu != old[2]:
+            self.cpu_var.set(int(cpu))
+            self.cpu_label.config(text=f"{cpu:.1f}%")
+        if memory != old[3]:
+            self.memory_var.set(int(memory))
+            self.memory_label.config(text=f"{memory:.1f}%")
+        if processes != old[4]:
+            self.processes_label.config(text=str(processes) if processes else "")
+
+    def apply_theme(self, colors):
+        for sparkline in self.sparklines.values():
+            sparkline.apply_theme(colors)
+
+    def draw_history(self, history, step, count):
+        """Обновляет мини-графики из истории метрик (показывается и для остановленного скрипта)"""
+        for field, sparkline in self.sparklines.items():
+            sparkline.draw(history.window(self.script_uuid, field, step, count) if history is not None else None)
+
+
+class ScriptCardList(ttk.Frame):
+    """
+    Виртуализированный список карточек активных скриптов.
+    Виджеты существуют только для видимых строк (плюс одна): карточка с номером i в пуле
+    показывает строки i, i + N, i + 2N..., поэтому при прокрутке сдвигаются place(),
+    а заново привязываются только карточки, которые вышли из видимой области с другой стороны.
+    Число виджетов не зависит от числа активных скриптов.
+    """
+
+    def __init__(self, parent, app, colors):
+        super().__init__(parent)
+        self.app = app
+        self.script_uuids = []  # порядок строк = порядок активных скриптов
+        self._positions = {}  # script_uuid -> номер строки
+        self.cards = []  # пул карточек
+        self._bound = {}  # script_uuid -> карточка, которая его сейчас показывает
+        self.row_height = None  # высота карточки с отступом; измеряется по первой карточке
+        self.offset = 0  # позиция прокрутки (пиксели от начала списка)
+        self.colors = colors
+        self._render_job = None
+
+        self.viewport = tk.Frame(self, bg=colors["bg"], highlightthickness=0)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.yview)
+        self.viewport.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.viewport.bindtags((SCRIPT_LIST_WHEEL_TAG,) + self.viewport.bindtags())
+        self.viewport.bind("<Configure>", lambda e: self.render())
+        # Windows/macOS присылают <MouseWheel>, X11 - кнопки 4 и 5
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.bind_class(SCRIPT_LIST_WHEEL_TAG, sequence, self._on_wheel)
+
+    def apply_theme(self, colors):
+        self.colors = colors
+        self.viewport.configure(bg=colors["bg"])
+        for card in self.cards:
+            card.apply_theme(colors)
+
+    def destroy(self):
+        if self._render_job is not None:
+            self.after_cancel(self._render_job)
+            self._render_job = None
+        super().destroy()
+
+    def __contains__(self, script_uuid):
+        return script_uuid in self._positions
+
+    def sync(self):
+        """Перечитывает список активных скриптов (добавление, удаление, порядок)"""
+        self.script_uuids = list(self.app.active_scripts)
+        self._positions = {script_uuid: i for i, script_uuid in enumerate(self.script_uuids)}
+        if self._render_job is None:
+            self._render_job = self.after_idle(self.render)
+
+    def update_script(self, script_uuid):
+        """Обновляет карточку скрипта, если она сейчас видна"""
+        card = self._bound.get(script_uuid)
+        runtime = self.app.runtimes.get(script_uuid)
+        if card is not None and runtime is not None:
+            card.bind(runtime)
+            card.draw_history(self.app.engine.metrics_history, *SPARKLINE_RANGES[self.app.sparkline_range])
+
+    def update_metrics(self):
+        """Применяет новые метрики к видимым карточкам"""
+        for script_uuid in list(self._bound):
+            self.update_script(script_uuid)
+
+    def _new_card(self):
+        card = ScriptCard(self.viewport, self.app, self.colors)
+        if self.row_height is None:
+            card.frame.update_idletasks()
+            self.row_height = card.frame.winfo_reqheight() + SCRIPT_CARD_GAP
+        return card
+
+    def render(self):
+        """Размещает карточки видимых строк и синхронизирует полосу прокрутки"""
+        if self._render_job is not None:
+            self.after_cancel(self._render_job)
+            self._render_job = None
+        if not self.script_uuids and not self.cards:
+            self.scrollbar.set(0, 1)
+            return
+        if self.row_height is None:
+            self.cards.append(self._new_card())
+
+        height = max(1, self.viewport.winfo_height())
+        row_height = self.row_height
+        content_height = len(self.script_uuids) * row_height
+        self.offset = max(0, min(self.offset, content_height - height))
+
+        # Пул растёт до числа строк, одновременно помещающихся в окне
+        pool_size = height // row_height + 2
+        while len(self.cards) < pool_size:
+            self.cards.append(self._new_card())
+        pool_size = len(self.cards)
+
+        first = self.offset // row_height
+        last = min(len(self.script_uuids), (self.offset + height) // row_height + 1)
+        bound = {}
+        visible_cards = set()
+        for row in range(first, last):
+            script_uuid = self.script_uuids[row]
+            runtime = self.app.runtimes.get(script_uuid)
+            if runtime is None:
+                continue
+            card = self.cards[row % pool_size]
+            card.bind(runtime)
+            card.draw_history(self.app.engine.metrics_history, *SPARKLINE_RANGES[self.app.sparkline_range])
+            card.frame.place(x=5, y=row * row_height - self.offset, relwidth=1, width=-10,
+                             height=row_height - SCRIPT_CARD_GAP)
+            bound[script_uuid] = card
+            visible_cards.add(card)
+        for card in self.cards:
+            if card not in visible_cards:
+                card.frame.place_forget()
+        self._bound = bound
+
+        if content_height > 0:
+            self.scrollbar.set(self.offset / content_height, min(1.0, (self.offset + height) / content_height))
+        else:
+            self.scrollbar.set(0, 1)
+
+    def yview(self, *args):
+        """Команды полосы прокрутки: moveto доля | scroll n units/pages"""
+        if self.row_height is None:
+            return
+        if args[0] == 'moveto':
+            self.offset = int(float(args[1]) * len(self.script_uuids) * self.row_height)
+        elif args[0] == 'scroll':
+            step = SCRIPT_LIST_SCROLL_STEP if args[2] == 'units' else self.viewport.winfo_height()
+            self.offset += int(args[1]) * step
+        self.render()
+
+    def _on_wheel(self, event):
+        if event.num == 4:
+            direction = -1
+        elif event.num == 5:
+            direction = 1
+        else:
+            direction = -1 if event.delta > 0 else 1
+        self.yview('scroll', direction, 'units')
+        return "break"
+
+    def see(self, script_uuid):
+        """Прокручивает список так, чтобы карточка скрипта была видна"""
+        row = self._positions.get(script_uuid)
+        if row is None or self.row_height is None:
+            return
+        top = row * self.row_height
+        height = self.viewport.winfo_height()
+        if top < self.offset:
+            self.offset = top
+        elif top + self.row_height > self.offset + height:
+            self.offset = top + self.row_height - height
+        self.render()
+
+
+class ScriptTable(ttk.Frame):
+    """
+    Компактный режим панели активных скриптов: одна строка таблицы на скрипт.
+    Строки Treeview - не виджеты, поэтому таблица спокойно держит сотни скриптов;
+    строка перерисовывается, только если её значения изменились. Кнопки действуют на выделенные скрипты.
+    Потомки процесса скрипта (воркеры, вспомогательные программы) - свёрнутые вложенные строки.
+    """
+
+    def __init__(self, parent, app, colors):
+        super().__init__(parent)
+        self.app = app
+        self._rows = {}  # script_uuid -> (text, values), как сейчас показано в таблице
+        self._order = []  # UUID в порядке строк таблицы
+        self._children = {}  # script_uuid -> {iid строки потомка: (text, values)}
+
+        toolbar = ttk.Frame(self)
+        toolbar.pack(fill="x", pady=(0, 5))
+        ttk.Button(toolbar, text="Запуск", style="Start.TButton",
+                   command=self.start_selected).pack(side="left", padx=2)
+        ttk.Button(toolbar, text="Остановить", style="Stop.TButton",
+                   command=self.stop_selected).pack(side="left", padx=2)
+        ttk.Button(toolbar, text="Консоль",
+                   command=lambda: self._with_selected(app.open_console)).pack(side="left", padx=2)
+        ttk.Button(toolbar, text="Настройки",
+                   command=lambda: self._with_selected(app.configure_script)).pack(side="left", padx=2)
+        ttk.Button(toolbar, text="Удалить из активных",
+                   command=self.remove_selected).pack(side="left", padx=2)
+
+        table_frame = ttk.Frame(self)
+        table_frame.pack(fill="both", expand=True)
+
+        self.tree = ttk.Treeview(table_frame, columns=("status", "cpu", "memory", "pid"),
+                                 show="tree headings", selectmode="extended")
+        self.tree.heading("#0", text="Скрипт")
+        self.tree.column("#0", width=250)
+        self.tree.heading("status", text="Статус")
+        self.tree.column("status", width=100)
+        self.tree.heading("cpu", text="CPU")
+        self.tree.column("cpu", width=70, anchor="e")
+        self.tree.heading("memory", text="Память")
+        self.tree.column("memory", width=70, anchor="e")
+        self.tree.heading("pid", text="PID")
+        self.tree.column("pid", width=70, anchor="e")
+
+        scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+
+        # Двойной клик - запуск или остановка скрипта
+        self.tree.bind("<Double-Button-1>", self._on_double_click)
+
+    def apply_theme(self, colors):
+        # Цвета таблицы задаёт общий стиль Treeview
+        pass
+
+    def __contains__(self, script_uuid):
+        return script_uuid in self._rows
+
+    def selected(self):
+        # Выделенная строка потомка означает её скрипт
+        items = [self.tree.parent(item) or item for item in self.tree.selection()]
+        return [item for item in dict.fromkeys(items) if item in self.app.runtimes]
+
+    def _with_selected(self, action):
+        selection = self.selected()
+        if selection:
+            action(selection[0])
+
+    def start_selected(self):
+        for script_uuid in self.selected():
+            if not self.app.is_script_running(script_uuid):
+                self.app.start_script(script_uuid)
+
+    def stop_selected(self):
+        for script_uuid in self.selected():
+            if self.app.is_script_running(script_uuid):
+                self.app.stop_script(script_uuid)
+
+    def remove_selected(self):
+        for script_uuid in self.selected():
+            self.app.remove_from_active(script_uuid)
+
+    def _on_double_click(self, event):
+        script_uuid = self.tree.identify_row(event.y)
+        if script_uuid in self.app.runtimes:
+            self.app.toggle_script(script_uuid)
+
+    @staticmethod
+    def _row(runtime):
+        script_info = runtime.script_info
+        if runtime.is_running:
+            values = ("Запущен", f"{runtime.cpu:.1f}%", f"{runtime.memory:.1f}%", runtime.pid or "")
+        else:
+            values = ("Остановлен", "", "", "")
+        return script_info.get('display_name', script_info['name']), values
+
+    def sync(self):
+        """Приводит строки таблицы к списку активных скриптов"""
+        script_uuids = list(self.app.active_scripts)
+        wanted = set(script_uuids)
+        for script_uuid in list(self._rows):
+            if script_uuid not in wanted:
+                self.tree.delete(script_uuid)
+                del self._rows[script_uuid]
+                self._children.pop(script_uuid, None)
+        for script_uuid in script_uuids:
+            runtime = self.app.runtimes.get(script_uuid)
+            if runtime is not None and script_uuid not in self._rows:
+                text, values = self._row(runtime)
+                self.tree.insert("", tk.END, iid=script_uuid, text=text, values=values)
+                self._rows[script_uuid] = (text, values)
+        # Порядок строк меняется только при расхождении с порядком активных скриптов
+        order = [script_uuid for script_uuid in script_uuids if script_uuid in self._rows]
+        if order != self._order:
+            for index, script_uuid in enumerate(order):
+                self.tree.move(script_uuid, "", index)
+            self._order = order
+
+    def update_script(self, script_uuid):
+        runtime = self.app.runtimes.get(script_uuid)
+        if runtime is None or script_uuid not in self._rows:
+            return
+        row = self._row(runtime)
+        if self._rows[script_uuid] != row:
+            self.tree.item(script_uuid, text=row[0], values=row[1])
+            self._rows[script_uuid] = row
+        self._update_children(script_uuid, runtime)
+
+    def _update_children(self, script_uuid, runtime):
+        """Приводит вложенные строки к потомкам процесса скрипта из последнего снимка метрик"""
+        shown = self._children.setdefault(script_uuid, {})
+        wanted = {}
+        if runtime.is_running:
+            for child in runtime.children:
+                wanted[f"{script_uuid}/{child.pid}"] = (
+                    child.name, ("", f"{child.cpu:.1f}%", f"{child.memory:.1f}%", child.pid))
+        for iid in [iid for iid in shown if iid not in wanted]:
+            self.tree.delete(iid)
+            del shown[iid]
+        for iid, row in wanted.items():
+            if iid not in shown:
+                self.tree.insert(script_uuid, tk.END, iid=iid, text=row[0], values=row[1])
+            elif shown[iid] != row:
+                self.tree.item(iid, text=row[0], values=row[1])
+            shown[iid] = row
+
+    def update_metrics(self):
+        """Обновляет строки видимой части таблицы; остальные - на первом обновлении после прокрутки к ним"""
+        order = self._order
+        if not order:
+            return
+        top, bottom = self.tree.yview()
+        start = max(0, int(top * len(order)) - 1)
+        stop = min(len(order), int(bottom * len(order)) + 2)
+        for script_uuid in order[start:stop]:
+            self.update_script(script_uuid)
+
+    def see(self, script_uuid):
+        if script_uuid in self._rows:
+            self.tree.see(script_uuid)
+
+
+# Идентификаторы групп в дереве каталога (строки скриптов используют UUID как iid)
+TREE_ACTIVE_NODE = "group:active"
+TREE_INACTIVE_NODE = "group:inactive"
+# Задержка, за которую накопленные изменения каталога сливаются в одно обновление дерева
+TREE_UPDATE_DELAY_MS = 50
+
+
+# Частота отрисовки нового вывода в консоли (~30 кадров в секунду)
+CONSOLE_FLUSH_INTERVAL_MS = 33
+# Сколько строк буфера одновременно находится в текстовом поле консоли
+CONSOLE_WINDOW_LINES = 2000
+# Запас строк до края окна, при котором окно сдвигается за прокруткой
+CONSOLE_WINDOW_MARGIN = 200
+
+
 class ConsoleDialog(tk.Toplevel):
-    def __init__(self, parent, script_name, process, theme="light"):
+    """
+    Консоль скрипта с виртуализированным выводом.
+    В текстовом поле находится только окно из CONSOLE_WINDOW_LINES строк вокруг видимой области,
+    строки подтягиваются из OutputBuffer, а полоса прокрутки отражает весь буфер.
+    Новый вывод проверяется раз в кадр и дописывается одной вставкой.
+    """
+
+    def __init__(self, parent, script_name, process, theme="light", on_search=None):
         super().__init__(parent)
         self.theme = theme
         self.colors = THEMES.get(theme, THEMES["light"])
         self.script_name = script_name
         self.process = process
+        self.on_search = on_search  # открывает поиск по выводу этого скрипта
+
+        self.output_buffer = None
+        self._view_start = 0  # строки до этого номера скрыты кнопкой "Очистить вывод"
+        self._win_start = 0  # абсолютный номер первой строки в текстовом поле
+        self._win_end = 0  # абсолютный номер строки после последней в текстовом поле
+        self._seen_end = 0  # конец буфера на предыдущем кадре
+        self._tail_partial = False  # последняя строка окна ещё не завершена
+        self._recenter_job = None
+        self._flush_job = None
 
         self.title(f"Консоль: {script_name}")
         self.geometry("800x600")
         self.resizable(True, True)
 
         self.setup_ui()
+        self._flush_job = self.after(CONSOLE_FLUSH_INTERVAL_MS, self._flush_pending)
 
     def setup_ui(self):
         main_frame = ttk.Frame(self, padding=10)
@@ -158,12 +645,14 @@ class ConsoleDialog(tk.Toplevel):
             insertbackground=self.colors["console_fg"],
             state=tk.DISABLED
         )
+        self.output_text.tag_configure('found', background=self.colors["progress_fg"], foreground="#ffffff")
 
-        output_scrollbar = ttk.Scrollbar(output_frame, orient=tk.VERTICAL, command=self.output_text.yview)
-        self.output_text.configure(yscrollcommand=output_scrollbar.set)
+        # Полоса прокрутки управляет положением во всём буфере, а не только в текстовом поле
+        self.output_scrollbar = ttk.Scrollbar(output_frame, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.output_text.configure(yscrollcommand=self._on_text_scroll)
 
         self.output_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        output_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.output_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
         # Input area
         input_frame = ttk.Frame(main_frame)
@@ -183,13 +672,43 @@ class ConsoleDialog(tk.Toplevel):
 
         ttk.Button(buttons_frame, text="Очистить вывод",
                    command=self.clear_output).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(buttons_frame, text="В начало",
+                   command=self.scroll_to_top).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(buttons_frame, text="В конец",
+                   command=self.scroll_to_bottom).pack(side=tk.LEFT, padx=(0, 10))
         ttk.Button(buttons_frame, text="Закрыть",
                    command=self.destroy).pack(side=tk.RIGHT)
+        if self.on_search is not None:
+            ttk.Button(buttons_frame, text="Найти...",
+                       command=self.on_search).pack(side=tk.RIGHT, padx=(0, 5))
+            self.bind('<Control-f>', lambda event: self.on_search())
+
+        # Переход к выводу на заданное время (по индексу журнала на диске)
+        ttk.Label(buttons_frame, text="К времени:").pack(side=tk.LEFT, padx=(0, 5))
+        self.time_entry = ttk.Entry(buttons_frame, width=10)
+        self.time_entry.pack(side=tk.LEFT, padx=(0, 10))
+        self.time_entry.bind('<Return>', self.go_to_time)
+
+        # Счётчик строк, вытесненных из буфера вывода
+        self.dropped_label = ttk.Label(buttons_frame, text="")
+        self.dropped_label.pack(side=tk.LEFT)
+
+    def destroy(self):
+        for job in (self._flush_job, self._recenter_job):
+            if job is not None:
+                try:
+                    self.after_cancel(job)
+                except tk.TclError:
+                    pass
+        self._flush_job = None
+        self._recenter_job = None
+        super().destroy()
 
     def clear_output(self):
-        self.output_text.config(state=tk.NORMAL)
-        self.output_text.delete(1.0, tk.END)
-        self.output_text.config(state=tk.DISABLED)
+        """Скрывает уже накопленный вывод; сам буфер не изменяется"""
+        if self.output_buffer is not None:
+            self._view_start = self.output_buffer.end_index
+        self._render_window(self._view_start)
 
     def send_input(self, event=None):
         input_text = self.input_entry.get()
@@ -209,16 +728,383 @@ class ConsoleDialog(tk.Toplevel):
                 self.append_text(f"Ошибка ввода: {str(e)}\n")
 
     def append_text(self, text):
-        """Безопасное добавление текста в текстовое поле"""
+        """Добавляет служебный текст в буфер вывода; он появится в консоли в следующем кадре"""
+        if self.output_buffer is not None:
+            self.output_buffer.append(text)
+
+    def go_to_time(self, event=None):
+        """Показывает вывод начиная с введённого времени: ЧЧ:ММ[:СС] сегодня или ГГГГ-ММ-ДД ЧЧ:ММ[:СС]"""
+        if self.output_buffer is None or not hasattr(self.output_buffer, 'line_at_time'):
+            messagebox.showwarning("Предупреждение", "Переход по времени доступен, когда включены журналы вывода на диске",
+                                   parent=self)
+            return
+        text = self.time_entry.get().strip()
+        moment = None
+        for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%H:%M:%S", "%H:%M"):
+            try:
+                moment = datetime.strptime(text, fmt)
+            except ValueError:
+                continue
+            if not fmt.startswith("%Y"):
+                moment = datetime.combine(datetime.now().date(), moment.time())
+            break
+        if moment is None:
+            messagebox.showerror("Ошибка", "Время нужно ввести как ЧЧ:ММ, ЧЧ:ММ:СС или ГГГГ-ММ-ДД ЧЧ:ММ", parent=self)
+            return
+
+        self.go_to_line(self.output_buffer.line_at_time(moment.timestamp()), highlight=False)
+
+    def go_to_line(self, line, highlight=True):
+        """Показывает строку с абсолютным номером line вверху поля (и выделяет её, например, для результата поиска)"""
+        first, end = self._bounds()
+        line = min(max(line, first), end)
+        self._render_window(line - CONSOLE_WINDOW_LINES // 2)
+        self._show_line(max(line, self._win_start))
+        self.output_text.tag_remove('found', 1.0, tk.END)
+        if highlight and self._win_start <= line < self._win_end:
+            row = line - self._win_start + 1
+            self.output_text.tag_add('found', f"{row}.0", f"{row}.end")
+
+    def load_historical_output(self, output_buffer):
+        """Подключает буфер вывода и показывает его конец"""
+        self.output_buffer = output_buffer
+        self._view_start = output_buffer.first_index if output_buffer else 0
+        self.scroll_to_bottom()
+
+    def attach(self, process, output_buffer):
+        """Переключает консоль на новый запуск скрипта"""
+        self.process = process
+        self.load_historical_output(output_buffer)
+
+    # --- Окно строк ---
+
+    def _bounds(self):
+        """Диапазон абсолютных номеров строк, доступных для показа"""
+        if self.output_buffer is None:
+            return 0, 0
+        end = self.output_buffer.end_index
+        return min(max(self.output_buffer.first_index, self._view_start), end), end
+
+    def _render_window(self, start):
+        """Заполняет текстовое поле строками буфера начиная с номера start"""
+        first, end = self._bounds()
+        start = max(first, min(start, end - CONSOLE_WINDOW_LINES))
+        stop = min(end, start + CONSOLE_WINDOW_LINES)
+        lines = self.output_buffer.get_lines(start, stop) if self.output_buffer is not None else []
+
         self.output_text.config(state=tk.NORMAL)
-        self.output_text.insert(tk.END, text)
+        self.output_text.delete(1.0, tk.END)
+        self.output_text.insert(tk.END, ''.join(lines))
+        self.output_text.config(state=tk.DISABLED)
+
+        self._win_start = start
+        self._win_end = start + len(lines)
+        self._tail_partial = bool(lines) and not lines[-1].endswith('\n')
+
+    def _show_line(self, line_number):
+        """Прокручивает текстовое поле так, чтобы строка с абсолютным номером была сверху"""
+        self.output_text.yview(f"{line_number - self._win_start + 1}.0")
+
+    def scroll_to_top(self):
+        first, _ = self._bounds()
+        self._render_window(first)
+        self.output_text.yview_moveto(0)
+
+    def scroll_to_bottom(self):
+        _, end = self._bounds()
+        self._render_window(end - CONSOLE_WINDOW_LINES)
         self.output_text.see(tk.END)
+
+    def is_at_bottom(self):
+        """
+        Проверяет, следит ли пользователь за концом вывода: поле прокручено до низа, а окно
+        заканчивалось концом буфера на предыдущем кадре (новые строки этого кадра ещё не показаны)
+        """
+        return self._win_end >= self._seen_end and self.output_text.yview()[1] >= 1.0
+
+    def _visible_range(self):
+        """Абсолютные номера первой и последней видимых строк"""
+        top = int(self.output_text.index('@0,0').split('.')[0])
+        bottom = int(self.output_text.index(f'@0,{self.output_text.winfo_height()}').split('.')[0])
+        return self._win_start + top - 1, self._win_start + bottom - 1
+
+    def _update_scrollbar(self):
+        """Синхронизирует полосу прокрутки с положением во всём буфере; возвращает видимый диапазон или None"""
+        first, end = self._bounds()
+        total = end - first
+        if total <= 0:
+            self.output_scrollbar.set(0, 1)
+            return None
+
+        top, bottom = self._visible_range()
+        self.output_scrollbar.set((top - first) / total, min(1.0, (bottom + 1 - first) / total))
+        return top, bottom
+
+    def _on_text_scroll(self, lo, hi):
+        """Обновляет полосу прокрутки и подтягивает окно строк, когда прокрутка подходит к его краю"""
+        visible = self._update_scrollbar()
+        if visible is None:
+            return
+        first, end = self._bounds()
+        top, bottom = visible
+
+        # Подходим к краю окна - сдвигаем окно, но не во время обработки прокрутки
+        near_top = top - self._win_start < CONSOLE_WINDOW_MARGIN and self._win_start > first
+        near_bottom = self._win_end - bottom < CONSOLE_WINDOW_MARGIN and self._win_end < end
+        if (near_top or near_bottom) and self._recenter_job is None:
+            self._recenter_job = self.after_idle(self._recenter)
+
+    def _recenter(self):
+        self._recenter_job = None
+        top, _ = self._visible_range()
+        self._render_window(top - CONSOLE_WINDOW_LINES // 2)
+        self._show_line(top)
+
+    def _on_scrollbar(self, *args):
+        """Команды полосы прокрутки: перетаскивание переходит к строке буфера, шаги прокручивают поле"""
+        if args[0] == 'moveto':
+            first, end = self._bounds()
+            target = first + int(float(args[1]) * (end - first))
+            self._render_window(target - CONSOLE_WINDOW_LINES // 2)
+            self._show_line(max(target, self._win_start))
+        else:
+            self.output_text.yview(*args)
+
+    def _flush_pending(self):
+        """Раз в кадр дописывает новый вывод одной вставкой"""
+        self._flush_job = self.after(CONSOLE_FLUSH_INTERVAL_MS, self._flush_pending)
+        if self.output_buffer is None:
+            return
+
+        first, end = self._bounds()
+        if self.output_buffer.dropped_lines:
+            self.dropped_label.config(text=f"Вытеснено из буфера строк: {self.output_buffer.dropped_lines}")
+
+        # Автопрокрутка только если пользователь и так смотрел в конец вывода
+        following = self.is_at_bottom()
+        self._seen_end = end
+        if not following:
+            # Полоса прокрутки отражает выросший буфер; окно не сдвигается, пока пользователь не прокрутит
+            self._update_scrollbar()
+            return
+
+        if end - self._win_end > CONSOLE_WINDOW_LINES or self._win_start < first:
+            self.scroll_to_bottom()
+            return
+
+        # Незавершённая строка могла дописаться - перечитываем её вместе с новыми
+        start = self._win_end - 1 if self._tail_partial else self._win_end
+        lines = self.output_buffer.get_lines(start, end)
+        if not lines or (self._tail_partial and end == self._win_end and len(lines) == 1
+                         and lines[0] == self.output_text.get('end-1c linestart', 'end-1c')):
+            return
+
+        self.output_text.config(state=tk.NORMAL)
+        if self._tail_partial:
+            self.output_text.delete('end-1c linestart', 'end-1c')
+        self.output_text.insert(tk.END, ''.join(lines))
+
+        # Обрезаем начало окна, чтобы поле не росло бесконечно
+        excess = end - self._win_start - CONSOLE_WINDOW_LINES
+        if excess > 0:
+            self.output_text.delete(1.0, f"{excess + 1}.0")
+            self._win_start += excess
         self.output_text.config(state=tk.DISABLED)
 
-    def load_historical_output(self, historical_output):
-        """Загружает исторический вывод при открытии консоли"""
-        if historical_output:
-            self.append_text(historical_output)
+        self._win_end = end
+        self._tail_partial = not lines[-1].endswith('\n')
+        self.output_text.see(tk.END)
+
+
+# Как часто окно поиска забирает найденное из фонового потока
+SEARCH_POLL_INTERVAL_MS = 100
+# Значение списка "Где искать" для поиска по всем скриптам
+SEARCH_ALL_SCRIPTS = "Все скрипты"
+
+
+class OutputSearchDialog(tk.Toplevel):
+    """
+    Поиск по выводу скриптов (в памяти и в журналах на диске).
+    Поиск идёт в фоновом потоке движка; найденное складывается в очередь и раз в SEARCH_POLL_INTERVAL_MS
+    переносится в таблицу, поэтому результаты появляются по мере нахождения, а поиск можно отменить.
+    """
+
+    def __init__(self, parent, app, script_uuid=None, theme="light"):
+        super().__init__(parent)
+        self.app = app
+        self.colors = THEMES.get(theme, THEMES["light"])
+        self.search = None
+        self.matches = []
+        self._incoming = []  # пачки результатов из фонового потока
+        self._finished = None  # (число найденных, достигнут предел) после окончания поиска
+        self._lock = threading.Lock()
+        self._poll_job = None
+
+        # Имена скриптов для таблицы и списка "Где"
+        self.names = {script_uuid: info.get('display_name', info['name'])
+                      for script_uuid, info in app.saved_scripts.items()}
+        self.script_names = {SEARCH_ALL_SCRIPTS: None}
+        self.script_names.update((name, script_uuid) for script_uuid, name in self.names.items())
+
+        self.title("Поиск в выводе скриптов")
+        self.geometry("800x560")
+        self.resizable(True, True)
+        self.transient(parent)
+
+        self.setup_ui()
+        self.scope_var.set(self.names.get(script_uuid, SEARCH_ALL_SCRIPTS))
+        self.query_entry.focus_set()
+
+    def setup_ui(self):
+        main_frame = ttk.Frame(self, padding=10)
+        main_frame.pack(fill=tk.BOTH, expand=True)
+
+        query_frame = ttk.Frame(main_frame)
+        query_frame.pack(fill=tk.X, pady=(0, 5))
+        ttk.Label(query_frame, text="Найти:").pack(side=tk.LEFT, padx=(0, 5))
+        self.query_entry = ttk.Entry(query_frame)
+        self.query_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 5))
+        self.query_entry.bind('<Return>', lambda event: self.start_search())
+        ttk.Button(query_frame, text="Найти", command=self.start_search).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(query_frame, text="Остановить", command=self.cancel_search).pack(side=tk.LEFT)
+
+        options_frame = ttk.Frame(main_frame)
+        options_frame.pack(fill=tk.X, pady=(0, 5))
+        self.regex_var = tk.BooleanVar(value=False)
+        self.case_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(options_frame, text="Регулярное выражение",
+                        variable=self.regex_var).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Checkbutton(options_frame, text="Учитывать регистр",
+                        variable=self.case_var).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Label(options_frame, text="Где:").pack(side=tk.LEFT, padx=(0, 5))
+        self.scope_var = tk.StringVar()
+        ttk.Combobox(options_frame, textvariable=self.scope_var, values=list(self.script_names),
+                     state="readonly", width=30).pack(side=tk.LEFT)
+
+        self.status_label = ttk.Label(main_frame, text="")
+        self.status_label.pack(anchor=tk.W, pady=(0, 5))
+
+        # Найденные строки
+        tree_frame = ttk.Frame(main_frame)
+        tree_frame.pack(fill=tk.BOTH, expand=True)
+        self.tree = ttk.Treeview(tree_frame, columns=('script', 'line', 'text'), show='headings')
+        self.tree.heading('script', text='Скрипт')
+        self.tree.heading('line', text='Строка')
+        self.tree.heading('text', text='Текст')
+        self.tree.column('script', width=150, stretch=False)
+        self.tree.column('line', width=80, stretch=False, anchor=tk.E)
+        self.tree.column('text', width=520)
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.bind('<<TreeviewSelect>>', lambda event: self.show_preview())
+        self.tree.bind('<Double-1>', lambda event: self.open_in_console())
+
+        # Контекст выбранной строки
+        self.preview_text = tk.Text(main_frame, height=7, wrap=tk.NONE, font=("Consolas", 10),
+                                    bg=self.colors["console_bg"], fg=self.colors["console_fg"], state=tk.DISABLED)
+        self.preview_text.pack(fill=tk.X, pady=(5, 0))
+        self.preview_text.tag_configure('match', background=self.colors["progress_fg"], foreground="#ffffff")
+
+    def start_search(self):
+        """Запускает новый поиск (предыдущий останавливается)"""
+        self.cancel_search()
+        query = self.query_entry.get()
+        scope = self.script_names.get(self.scope_var.get())
+        try:
+            search = self.app.engine.search_output(
+                query, self._on_results, self._on_finished,
+                regex=self.regex_var.get(), ignore_case=not self.case_var.get(),
+                script_uuids=None if scope is None else [scope])
+        except ValueError as e:
+            messagebox.showerror("Ошибка", str(e), parent=self)
+            return
+
+        self.matches = []
+        with self._lock:
+            self._incoming = []
+            self._finished = None
+        self.tree.delete(*self.tree.get_children())
+        self.search = search
+        self.status_label.config(text="Поиск...")
+        self._poll_job = self.after(SEARCH_POLL_INTERVAL_MS, self._poll_results)
+
+    def cancel_search(self):
+        if self.search is not None:
+            self.search.cancel()
+
+    # Вызываются из потока поиска - только складывают результат
+    def _on_results(self, batch):
+        with self._lock:
+            self._incoming.append(batch)
+
+    def _on_finished(self, found, truncated):
+        with self._lock:
+            self._finished = (found, truncated)
+
+    def _poll_results(self):
+        """Переносит найденное в таблицу; после окончания поиска показывает итог"""
+        with self._lock:
+            batches, self._incoming = self._incoming, []
+            finished = self._finished
+        for batch in batches:
+            for match in batch:
+                self.tree.insert('', tk.END, iid=str(len(self.matches)),
+                                 values=(self.names.get(match.script_uuid, match.script_uuid), match.line + 1, match.text))
+                self.matches.append(match)
+
+        if finished is None:
+            self.status_label.config(text=f"Поиск... найдено: {len(self.matches)}")
+            self._poll_job = self.after(SEARCH_POLL_INTERVAL_MS, self._poll_results)
+            return
+        self._poll_job = None
+        found, truncated = finished
+        if truncated:
+            status = f"Найдено: {found} (показаны первые результаты, уточните запрос)"
+        elif self.search is not None and self.search.cancelled:
+            status = f"Поиск остановлен, найдено: {found}"
+        else:
+            status = f"Найдено: {found}"
+        self.status_label.config(text=status)
+
+    def _selected_match(self):
+        selection = self.tree.selection()
+        return self.matches[int(selection[0])] if selection else None
+
+    def show_preview(self):
+        """Показывает выбранную строку с контекстом и выделенным совпадением"""
+        match = self._selected_match()
+        if match is None:
+            return
+        self.preview_text.config(state=tk.NORMAL)
+        self.preview_text.delete(1.0, tk.END)
+        for line in match.before:
+            self.preview_text.insert(tk.END, line + "\n")
+        row = len(match.before) + 1
+        self.preview_text.insert(tk.END, match.text + "\n")
+        for line in match.after:
+            self.preview_text.insert(tk.END, line + "\n")
+        self.preview_text.tag_add('match', f"{row}.{match.start}", f"{row}.{max(match.end, match.start + 1)}")
+        self.preview_text.config(state=tk.DISABLED)
+
+    def open_in_console(self):
+        """Открывает консоль скрипта на найденной строке (если скрипт запущен)"""
+        match = self._selected_match()
+        if match is None:
+            return
+        if not self.app.show_output_line(match.script_uuid, match.line):
+            self.status_label.config(text="Скрипт не запущен - строка показана ниже с контекстом")
+
+    def destroy(self):
+        self.cancel_search()
+        if self._poll_job is not None:
+            try:
+                self.after_cancel(self._poll_job)
+            except tk.TclError:
+                pass
+            self._poll_job = None
+        super().destroy()
 
 
 class ErrorDialog(tk.Toplevel):
@@ -295,13 +1181,51 @@ class ErrorDialog(tk.Toplevel):
         messagebox.showinfo("Успех", "Ошибка скопирована в буфер обмена")
 
 
+class ShutdownDialog(tk.Toplevel):
+    """Окно прогресса остановки скриптов при выходе из программы"""
+
+    def __init__(self, parent, coordinator, theme="light"):
+        super().__init__(parent)
+        self.coordinator = coordinator
+        self.colors = THEMES.get(theme, THEMES["light"])
+
+        self.title("Завершение работы")
+        self.geometry("360x130")
+        self.resizable(False, False)
+        self.protocol("WM_DELETE_WINDOW", lambda: None)
+        self.configure(bg=self.colors["bg"])
+
+        main_frame = ttk.Frame(self, padding=10)
+        main_frame.pack(fill=tk.BOTH, expand=True)
+
+        self.status_label = ttk.Label(main_frame, text="Остановка скриптов...")
+        self.status_label.pack(anchor=tk.W)
+
+        self.progress = ttk.Progressbar(main_frame, maximum=max(1, coordinator.total), mode='determinate')
+        self.progress.pack(fill=tk.X, pady=(8, 8))
+
+        self.kill_btn = ttk.Button(main_frame, text="Завершить принудительно", command=coordinator.kill_now)
+        self.kill_btn.pack(anchor=tk.E)
+
+        self.update_progress()
+
+    def update_progress(self):
+        finished, total = self.coordinator.progress()
+        remaining = self.coordinator.remaining()
+        self.progress['value'] = finished
+        self.status_label.config(
+            text=f"Остановлено скриптов: {finished} из {total} (принудительно через {remaining:.0f} с)")
+
+
 class SettingsDialog(tk.Toplevel):
-    def __init__(self, parent, settings):
+    def __init__(self, parent, settings, package_inventory, backend):
         super().__init__(parent)
         self.settings = settings
+        self.package_inventory = package_inventory
+        self.backend = backend
         self.parent = parent
         self.title("Настройки Python Script Manager (PSM)")
-        self.geometry("500x450")
+        # Размер окна определяется содержимым вкладок
         self.resizable(False, False)
         self.transient(parent)
         self.grab_set()
@@ -314,22 +1238,68 @@ class SettingsDialog(tk.Toplevel):
         main_frame = ttk.Frame(self, padding=10)
         main_frame.pack(fill=tk.BOTH, expand=True)
 
+        # Кнопки размещаются первыми, чтобы всегда оставаться видимыми под вкладками
+        buttons_frame = ttk.Frame(main_frame)
+        buttons_frame.pack(side=tk.BOTTOM, fill=tk.X, pady=(10, 0))
+
+        ttk.Button(buttons_frame, text="Сохранить",
+                   command=self.save_settings).pack(side=tk.RIGHT, padx=(5, 0))
+        ttk.Button(buttons_frame, text="Отмена",
+                   command=self.destroy).pack(side=tk.RIGHT)
+
+        # Разделы настроек по вкладкам
+        notebook = ttk.Notebook(main_frame)
+        notebook.pack(fill=tk.BOTH, expand=True)
+        general_tab = ttk.Frame(notebook, padding=10)
+        interpreter_tab = ttk.Frame(notebook, padding=10)
+        output_tab = ttk.Frame(notebook, padding=10)
+        api_tab = ttk.Frame(notebook, padding=10)
+        notebook.add(general_tab, text="Общие")
+        notebook.add(interpreter_tab, text="Интерпретаторы")
+        notebook.add(output_tab, text="Вывод")
+        notebook.add(api_tab, text="API")
+
         # Autostart setting
-        autostart_frame = ttk.LabelFrame(main_frame, text="Настройки приложения", padding=10)
+        autostart_frame = ttk.LabelFrame(general_tab, text="Настройки приложения", padding=10)
         autostart_frame.pack(fill=tk.X, pady=(0, 10))
 
         self.autostart_var = tk.BooleanVar(value=self.settings.get('autostart', False))
         ttk.Checkbutton(autostart_frame, text="Запускать Python Script Manager (PSM) при старте системы",
                         variable=self.autostart_var,
-                        command=self.toggle_autostart).pack(anchor=tk.W)
+                        command=self.toggle_autostart,
+                        state=tk.NORMAL if self.backend.autostart_supported else tk.DISABLED).pack(anchor=tk.W)
 
         # НОВАЯ НАСТРОЙКА: Мониторинг производительности
         self.monitoring_var = tk.BooleanVar(value=self.settings.get('performance_monitoring', True))
         ttk.Checkbutton(autostart_frame, text="Включить мониторинг производительности",
                         variable=self.monitoring_var).pack(anchor=tk.W, pady=(5, 0))
+        self.metrics_history_var = tk.BooleanVar(value=self.settings.get('metrics_history', True))
+        ttk.Checkbutton(autostart_frame, text="Хранить историю метрик между запусками (после перезапуска PSM)",
+                        variable=self.metrics_history_var).pack(anchor=tk.W, pady=(5, 0))
+
+        # Автоматическое распределение тяжёлых скриптов по ядрам (по истории загрузки из мониторинга)
+        self.auto_placement_var = tk.BooleanVar(value=self.settings.get('auto_placement', False))
+        ttk.Checkbutton(autostart_frame, text="Распределять нагруженные скрипты по ядрам CPU автоматически",
+                        variable=self.auto_placement_var).pack(anchor=tk.W, pady=(5, 0))
+
+        # Autostart scheduler
+        scheduler_frame = ttk.LabelFrame(general_tab, text="Автозапуск скриптов", padding=10)
+        scheduler_frame.pack(fill=tk.X, pady=(0, 10))
+
+        self.max_concurrent_var = tk.IntVar(
+            value=self.settings.get('autostart_max_concurrent', AUTOSTART_MAX_CONCURRENT))
+        self.cpu_threshold_var = tk.IntVar(
+            value=self.settings.get('autostart_cpu_threshold', AUTOSTART_CPU_THRESHOLD))
+
+        ttk.Label(scheduler_frame, text="Одновременных запусков:").grid(row=0, column=0, sticky="w")
+        ttk.Spinbox(scheduler_frame, from_=1, to=64, width=8,
+                    textvariable=self.max_concurrent_var).grid(row=0, column=1, sticky="w", padx=5)
+        ttk.Label(scheduler_frame, text="Ждать, пока CPU выше (%):").grid(row=1, column=0, sticky="w", pady=(5, 0))
+        ttk.Spinbox(scheduler_frame, from_=10, to=100, increment=5, width=8,
+                    textvariable=self.cpu_threshold_var).grid(row=1, column=1, sticky="w", padx=5, pady=(5, 0))
 
         # Default interpreter
-        interpreter_frame = ttk.LabelFrame(main_frame, text="Интерпретатор по умолчанию", padding=10)
+        interpreter_frame = ttk.LabelFrame(interpreter_tab, text="Интерпретатор по умолчанию", padding=10)
         interpreter_frame.pack(fill=tk.X, pady=(0, 10))
 
         interpreter_subframe = ttk.Frame(interpreter_frame)
@@ -345,65 +1315,114 @@ class SettingsDialog(tk.Toplevel):
         ttk.Button(interpreter_frame, text="Показать установленные пакеты",
                    command=self.show_packages).pack(anchor=tk.W, pady=(5, 0))
 
-        # Buttons frame
-        buttons_frame = ttk.Frame(main_frame)
-        buttons_frame.pack(fill=tk.X, pady=10)
-
-        ttk.Button(buttons_frame, text="Сохранить",
-                   command=self.save_settings).pack(side=tk.RIGHT, padx=(5, 0))
-        ttk.Button(buttons_frame, text="Отмена",
-                   command=self.destroy).pack(side=tk.RIGHT)
+        # Output buffer limits
+        buffer_frame = ttk.LabelFrame(output_tab, text="Буфер вывода скриптов", padding=10)
+        buffer_frame.pack(fill=tk.X, pady=(0, 10))
+
+        self.buffer_lines_var = tk.IntVar(
+            value=self.settings.get('output_buffer_max_lines', DEFAULT_OUTPUT_MAX_LINES))
+        self.buffer_mb_var = tk.IntVar(
+            value=max(1, self.settings.get('output_buffer_max_bytes', DEFAULT_OUTPUT_MAX_BYTES) // (1024 * 1024)))
+
+        ttk.Label(buffer_frame, text="Максимум строк:").grid(row=0, column=0, sticky="w")
+        ttk.Spinbox(buffer_frame, from_=100, to=10000000, increment=1000, width=12,
+                    textvariable=self.buffer_lines_var).grid(row=0, column=1, sticky="w", padx=5)
+        ttk.Label(buffer_frame, text="Максимум МБ:").grid(row=1, column=0, sticky="w", pady=(5, 0))
+        ttk.Spinbox(buffer_frame, from_=1, to=4096, increment=1, width=12,
+                    textvariable=self.buffer_mb_var).grid(row=1, column=1, sticky="w", padx=5, pady=(5, 0))
+
+        # Output logs on disk
+        from psm.logstore import DEFAULT_LOG_RETENTION_MB, DEFAULT_LOG_RETENTION_DAYS
+
+        log_frame = ttk.LabelFrame(output_tab, text="Журналы вывода на диске", padding=10)
+        log_frame.pack(fill=tk.X, pady=(0, 10))
+
+        self.log_store_var = tk.BooleanVar(value=self.settings.get('log_store_enabled', True))
+        self.log_mb_var = tk.IntVar(value=self.settings.get('log_retention_mb', DEFAULT_LOG_RETENTION_MB))
+        self.log_days_var = tk.IntVar(value=self.settings.get('log_retention_days', DEFAULT_LOG_RETENTION_DAYS))
+
+        ttk.Checkbutton(log_frame, text="Сохранять вывод скриптов в журналы (logs/)",
+                        variable=self.log_store_var).grid(row=0, column=0, columnspan=2, sticky="w")
+        ttk.Label(log_frame, text="Хранить МБ на скрипт:").grid(row=1, column=0, sticky="w", pady=(5, 0))
+        ttk.Spinbox(log_frame, from_=1, to=100000, increment=10, width=8,
+                    textvariable=self.log_mb_var).grid(row=1, column=1, sticky="w", padx=5, pady=(5, 0))
+        ttk.Label(log_frame, text="Хранить дней (0 - без срока):").grid(row=2, column=0, sticky="w", pady=(5, 0))
+        ttk.Spinbox(log_frame, from_=0, to=3650, width=8,
+                    textvariable=self.log_days_var).grid(row=2, column=1, sticky="w", padx=5, pady=(5, 0))
+        self.search_index_var = tk.BooleanVar(value=self.settings.get('search_index', False))
+        ttk.Checkbutton(log_frame, text="Индексировать журналы для быстрого поиска",
+                        variable=self.search_index_var).grid(row=3, column=0, columnspan=2, sticky="w", pady=(5, 0))
+
+        # Warm interpreter pool
+        warm_pool_frame = ttk.LabelFrame(interpreter_tab, text="Прогретые интерпретаторы", padding=10)
+        warm_pool_frame.pack(fill=tk.X, pady=(0, 10))
+
+        self.warm_pool_var = tk.BooleanVar(value=self.settings.get('warm_pool_enabled', False))
+        self.warm_pool_size_var = tk.IntVar(value=self.settings.get('warm_pool_size', WARM_POOL_SIZE))
+        self.warm_pool_modules_var = tk.StringVar(value=", ".join(self.settings.get('warm_pool_modules', [])))
+
+        ttk.Checkbutton(warm_pool_frame, text="Держать интерпретаторы запущенными заранее",
+                        variable=self.warm_pool_var).grid(row=0, column=0, columnspan=2, sticky="w")
+        ttk.Label(warm_pool_frame, text="Процессов на интерпретатор:").grid(row=1, column=0, sticky="w", pady=(5, 0))
+        ttk.Spinbox(warm_pool_frame, from_=1, to=16, width=8,
+                    textvariable=self.warm_pool_size_var).grid(row=1, column=1, sticky="w", padx=5, pady=(5, 0))
+        ttk.Label(warm_pool_frame, text="Импортировать модули:").grid(row=2, column=0, sticky="w", pady=(5, 0))
+        ttk.Entry(warm_pool_frame, textvariable=self.warm_pool_modules_var,
+                  width=30).grid(row=2, column=1, sticky="we", padx=5, pady=(5, 0))
+
+        # Local control API
+        from psm.api import API_DEFAULT_PORT
+
+        api_frame = ttk.LabelFrame(api_tab, text="API управления (только этот компьютер)", padding=10)
+        api_frame.pack(fill=tk.X, pady=(0, 10))
+
+        self.api_enabled_var = tk.BooleanVar(value=self.settings.get('api_enabled', False))
+        self.api_port_var = tk.IntVar(value=self.settings.get('api_port', API_DEFAULT_PORT))
+        self.api_token_var = tk.StringVar(value=self.settings.get('api_token', ''))
+
+        ttk.Checkbutton(api_frame, text="Включить HTTP API на 127.0.0.1",
+                        variable=self.api_enabled_var).grid(row=0, column=0, columnspan=2, sticky="w")
+        ttk.Label(api_frame, text="Порт:").grid(row=1, column=0, sticky="w", pady=(5, 0))
+        ttk.Spinbox(api_frame, from_=1024, to=65535, width=8,
+                    textvariable=self.api_port_var).grid(row=1, column=1, sticky="w", padx=5, pady=(5, 0))
+        ttk.Label(api_frame, text="Токен (необязательно):").grid(row=2, column=0, sticky="w", pady=(5, 0))
+        ttk.Entry(api_frame, textvariable=self.api_token_var, show="*",
+                  width=30).grid(row=2, column=1, sticky="we", padx=5, pady=(5, 0))
 
     def save_settings(self):
         self.settings['autostart'] = self.autostart_var.get()
         self.settings['default_interpreter'] = self.interpreter_var.get()
         # СОХРАНЯЕМ НОВУЮ НАСТРОЙКУ
         self.settings['performance_monitoring'] = self.monitoring_var.get()
+        self.settings['auto_placement'] = self.auto_placement_var.get()
+        self.settings['metrics_history'] = self.metrics_history_var.get()
+        try:
+            self.settings['output_buffer_max_lines'] = max(100, int(self.buffer_lines_var.get()))
+            self.settings['output_buffer_max_bytes'] = max(1, int(self.buffer_mb_var.get())) * 1024 * 1024
+            self.settings['autostart_max_concurrent'] = max(1, int(self.max_concurrent_var.get()))
+            self.settings['autostart_cpu_threshold'] = min(100, max(10, int(self.cpu_threshold_var.get())))
+            self.settings['warm_pool_size'] = max(1, int(self.warm_pool_size_var.get()))
+            self.settings['api_port'] = min(65535, max(1024, int(self.api_port_var.get())))
+            self.settings['log_retention_mb'] = max(1, int(self.log_mb_var.get()))
+            self.settings['log_retention_days'] = max(0, int(self.log_days_var.get()))
+        except (tk.TclError, ValueError):
+            messagebox.showerror("Ошибка", "Некорректное числовое значение в настройках")
+            return
+        self.settings['warm_pool_enabled'] = self.warm_pool_var.get()
+        self.settings['warm_pool_modules'] = [name.strip() for name in self.warm_pool_modules_var.get().split(",")
+                                              if name.strip()]
+        self.settings['log_store_enabled'] = self.log_store_var.get()
+        self.settings['search_index'] = self.search_index_var.get()
+        self.settings['api_enabled'] = self.api_enabled_var.get()
+        self.settings['api_token'] = self.api_token_var.get().strip()
         self.destroy()
 
     def toggle_autostart(self):
         """Включение/выключение автозапуска"""
         try:
-            startup_folder = winshell.startup()
-            shortcut_path = os.path.join(startup_folder, "Python Script Manager (PSM).lnk")
-
-            if self.autostart_var.get():
-                # Определяем путь к исполняемому файлу
-                if getattr(sys, 'frozen', False):
-                    # Если программа собрана в .exe
-                    target_path = sys.executable
-                    working_dir = os.path.dirname(sys.executable)
-                    icon_path = sys.executable
-                    args = ""
-                else:
-                    # Если запущен как .py скрипт
-                    target_path = sys.executable
-                    script_path = os.path.abspath(sys.argv[0])
-                    working_dir = os.path.dirname(script_path)
-                    args = f'"{script_path}"'
-                    icon_path = sys.executable
-
-                shell = Dispatch('WScript.Shell')
-                shortcut = shell.CreateShortCut(shortcut_path)
-                shortcut.Targetpath = target_path
-                if args and not getattr(sys, 'frozen', False):
-                    shortcut.Arguments = args
-                shortcut.WorkingDirectory = working_dir
-                shortcut.IconLocation = icon_path
-                shortcut.save()
-
-                # Сохраняем настройку
-                self.settings['autostart'] = True
-            else:
-                # Удаляем ярлык из автозагрузки
-                if os.path.exists(shortcut_path):
-                    os.remove(shortcut_path)
-
-                # Сохраняем настройку
-                self.settings['autostart'] = False
-
-            # УБРАНО: self.parent.save_settings() - так как self.parent не является ScriptManagerTkinter
-
+            self.backend.set_autostart(self.autostart_var.get())
+            # Сохраняем настройку
+            self.settings['autostart'] = self.autostart_var.get()
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось настроить автозапуск: {str(e)}")
             # В случае ошибки сбрасываем переключатель
@@ -419,44 +1438,81 @@ class SettingsDialog(tk.Toplevel):
 
     def show_packages(self):
         interpreter = self.interpreter_var.get()
-        if not os.path.exists(interpreter):
+        if not self.package_inventory.interpreters.is_valid(interpreter):
             messagebox.showerror("Ошибка", "Указанный интерпретатор не найден")
             return
 
-        try:
-            # Get installed packages
-            result = subprocess.run([
-                interpreter, "-m", "pip", "list"
-            ], capture_output=True, text=True, timeout=30)
-
-            if result.returncode == 0:
-                # Show packages in a new window
-                packages_window = tk.Toplevel(self)
-                packages_window.title("Установленные пакеты")
-                packages_window.geometry("600x400")
-                packages_window.transient(self)
-                packages_window.grab_set()
-                packages_window.attributes('-topmost', True)
-
-                text_frame = ttk.Frame(packages_window, padding=10)
-                text_frame.pack(fill=tk.BOTH, expand=True)
-
-                text_widget = tk.Text(text_frame, wrap=tk.WORD)
-                scrollbar = ttk.Scrollbar(text_frame, orient=tk.VERTICAL, command=text_widget.yview)
-                text_widget.config(yscrollcommand=scrollbar.set)
-
-                text_widget.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-                scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-
-                text_widget.insert(tk.END, result.stdout)
-                text_widget.config(state=tk.DISABLED)
-            else:
-                messagebox.showerror("Ошибка", f"Не удалось получить список пакетов:\n{result.stderr}")
+        PackagesWindow(self, self.package_inventory, interpreter)
 
-        except subprocess.TimeoutExpired:
-            messagebox.showerror("Ошибка", "Таймаут при получении списка пакетов")
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Ошибка при получении списка пакетов: {str(e)}")
+
+class PackagesWindow(tk.Toplevel):
+    """Окно со списком установленных пакетов и поиском; список загружается в фоне"""
+
+    def __init__(self, parent, package_inventory, interpreter):
+        super().__init__(parent)
+        self.interpreter = interpreter
+        self.packages = []
+
+        info = package_inventory.interpreters.get(interpreter)
+        version = f" (Python {info.version})" if info is not None else ""
+        self.title(f"Установленные пакеты{version}")
+        self.geometry("700x450")
+        self.transient(parent)
+        self.grab_set()
+        self.attributes('-topmost', True)
+        self.focus_force()
+
+        main_frame = ttk.Frame(self, padding=10)
+        main_frame.pack(fill=tk.BOTH, expand=True)
+
+        search_frame = ttk.Frame(main_frame)
+        search_frame.pack(fill=tk.X, pady=(0, 5))
+        ttk.Label(search_frame, text="Поиск:").pack(side=tk.LEFT)
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add('write', lambda *args: self.apply_filter())
+        search_entry = ttk.Entry(search_frame, textvariable=self.search_var)
+        search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(5, 0))
+        search_entry.focus_set()
+
+        self.status_label = ttk.Label(main_frame, text="Загрузка списка пакетов...")
+        self.status_label.pack(anchor=tk.W, pady=(0, 5))
+
+        tree_frame = ttk.Frame(main_frame)
+        tree_frame.pack(fill=tk.BOTH, expand=True)
+
+        self.tree = ttk.Treeview(tree_frame, columns=('version', 'summary'), show='tree headings')
+        self.tree.heading('#0', text='Пакет')
+        self.tree.heading('version', text='Версия')
+        self.tree.heading('summary', text='Описание')
+        self.tree.column('#0', width=200)
+        self.tree.column('version', width=90, stretch=False)
+        self.tree.column('summary', width=360)
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        # Результат приходит из фонового потока - передаём его в поток интерфейса
+        package_inventory.load(interpreter, lambda packages, error: self.after(0, self.on_loaded, packages, error))
+
+    def on_loaded(self, packages, error):
+        if not self.winfo_exists():
+            return
+        if error is not None:
+            self.status_label.config(text=f"Ошибка при получении списка пакетов: {error}")
+            return
+        self.packages = packages
+        self.apply_filter()
+
+    def apply_filter(self):
+        query = self.search_var.get().strip().lower()
+        matched = [package for package in self.packages
+                   if query in package.name.lower() or query in package.summary.lower()]
+
+        self.tree.delete(*self.tree.get_children())
+        for package in matched:
+            self.tree.insert('', tk.END, text=package.name, values=(package.version, package.summary))
+        self.status_label.config(text=f"Пакетов: {len(matched)} из {len(self.packages)}")
 
 
 class RenameDialog(tk.Toplevel):
@@ -502,22 +1558,50 @@ class RenameDialog(tk.Toplevel):
             self.destroy()
 
 
+# Подписи уровней приоритета процесса и ввода-вывода в настройках скрипта ('' - не менять)
+PRIORITY_LABELS = dict(zip(('',) + PRIORITY_LEVELS, (
+    "По умолчанию", "Низкий (фоновый)", "Ниже среднего", "Обычный", "Выше среднего", "Высокий")))
+IO_PRIORITY_LABELS = dict(zip(('',) + IO_PRIORITY_LEVELS, (
+    "По умолчанию", "Низкий", "Обычный", "Высокий")))
+
+
 class ScriptManagerTkinter:
     def __init__(self, root):
+        # Профиль запуска: этапы до первой отрисовки окна и до завершения автозапуска
+        self.startup_profile = StartupProfile(STARTUP_STARTED)
+        self.startup_profile.mark("импорт модулей и создание Tk")
+
         self.root = root
         self.root.title("Python Script Manager (PSM)")
         self.root.geometry("1200x800")
 
         # Текущая тема
         self.current_theme = "light"
-
-        # Инициализация переменных до setup_ui
-        self.active_scripts = []  # UUID скриптов с активными панелями
-        self.saved_scripts = {}  # Все сохраненные скрипты по UUID
-        self.script_frames = []
-        self.scripts_file = os.path.join(BASE_PATH, "scripts.json")
-        self.settings_file = os.path.join(BASE_PATH, "settings.json")
-        self.settings = {}
+        self.sparkline_range = '5m'  # диапазон мини-графиков истории (ключ SPARKLINE_RANGES)
+
+        # Движок управления скриптами; окно - один из его клиентов.
+        # События движка приходят из фоновых потоков и передаются в поток интерфейса через root.after
+        self.engine = SupervisorEngine(
+            runtime_factory=ScriptPanel,
+            schedule_fn=self.root.after,
+            on_state_change=lambda script_uuid: self.call_in_ui(self.refresh_script_state, script_uuid),
+            on_error=lambda script_uuid, message: self.call_in_ui(self.show_error_dialog, script_uuid, message)
+        )
+        # Запуск и остановка из фоновых потоков (API) выполняются в потоке интерфейса
+        self.engine.dispatch_fn = lambda job: self.root.after(0, job)
+
+        # Общие с движком контейнеры (движок изменяет их на месте и никогда не подменяет)
+        self.active_scripts = self.engine.active_scripts  # UUID скриптов с активными панелями
+        self.saved_scripts = self.engine.saved_scripts  # Все сохраненные скрипты по UUID
+        self.runtimes = self.engine.runtimes  # Состояние и виджеты активных скриптов по UUID
+        self.settings = self.engine.settings
+        self.process_output_buffers = self.engine.process_output_buffers  # script_uuid -> OutputBuffer
+
+        # Дерево каталога: строки с iid = UUID и отложенные пакетные обновления
+        self._tree_rows = {}  # script_uuid -> (text, values), как сейчас показано в дереве
+        self._tree_dirty = set()
+        self._tree_full_sync = False
+        self._tree_update_job = None
 
         # Для отслеживания ошибок
         self.error_messages = {}  # script_uuid -> error_message
@@ -525,8 +1609,8 @@ class ScriptManagerTkinter:
         # Словарь для хранения открытых консолей
         self.open_consoles = {}
 
-        # Словарь для хранения буферов вывода каждого процесса
-        self.process_output_buffers = {}
+        # Координатор остановки скриптов при выходе
+        self.shutdown_coordinator = None
 
         # Флаг для отслеживания состояния трея
         self.tray_icon = None
@@ -535,13 +1619,43 @@ class ScriptManagerTkinter:
         # Переопределяем закрытие окна - скрываем в трей
         self.root.protocol('WM_DELETE_WINDOW', self.hide_to_tray)
 
+        self.startup_profile.mark("движок")
         self.setup_ui()
+        self.startup_profile.mark("интерфейс")
         self.load_settings()
+        self.startup_profile.mark("настройки и тема")
+
+        # Каталог скриптов и фоновые подсистемы загружаются после первой отрисовки окна:
+        # after_idle срабатывает после отложенных отрисовок, after(0) - после обработки событий показа
+        self.root.after_idle(lambda: self.root.after(0, self.finish_startup))
+
+    def finish_startup(self):
+        """Вторая часть запуска, после показа окна: каталог, автозапуск и фоновые подсистемы"""
+        profile = self.startup_profile
+        profile.mark("первая отрисовка окна")
+
         self.load_scripts()
+        profile.mark("каталог скриптов")
+
+        self.engine.sync_autostart()
+        self.engine.refresh_interpreters()
+        self.engine.configure_warm_pool()
+        self.configure_control_api()
         self.start_monitoring()
+        self.engine.configure_placement()
+        self.engine.configure_log_store()
+        profile.mark("фоновые подсистемы")
 
-        # Настраиваем иконку в трее после создания основного интерфейса
-        self.root.after(100, self.setup_tray_icon)
+        # Иконка в трее создаётся в своём потоке вместе с импортом pystray и PIL
+        self.setup_tray_icon()
+
+    def report_startup(self):
+        """Печатает профиль запуска после завершения автозапуска скриптов"""
+        if self.startup_profile is None:
+            return
+        self.startup_profile.mark("автозапуск скриптов")
+        print(self.startup_profile.report())
+        self.startup_profile = None
 
     def apply_theme(self, theme_name):
         """Применяет выбранную тему"""
@@ -581,9 +1695,9 @@ class ScriptManagerTkinter:
         # Применяем цвета к основному окну
         self.root.configure(bg=colors["bg"])
 
-        # Обновляем цвет фона canvas
-        if hasattr(self, 'canvas'):
-            self.canvas.configure(bg=colors["bg"])
+        # Обновляем цвет фона панели активных скриптов
+        if getattr(self, 'scripts_view', None) is not None:
+            self.scripts_view.apply_theme(colors)
 
     def setup_ui(self):
         # Main menu
@@ -593,6 +1707,7 @@ class ScriptManagerTkinter:
         file_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="ФАЙЛ", menu=file_menu)
         file_menu.add_command(label="Настройки", command=self.open_settings)
+        file_menu.add_command(label="Поиск в выводе", command=self.open_search)
         file_menu.add_separator()
         file_menu.add_command(label="Свернуть в трей", command=self.hide_to_tray)
         file_menu.add_command(label="Закрыть", command=self.quit_application)
@@ -602,6 +1717,19 @@ class ScriptManagerTkinter:
         menubar.add_cascade(label="ВИД", menu=view_menu)
         view_menu.add_command(label="Светлая тема", command=lambda: self.change_theme("light"))
         view_menu.add_command(label="Тёмная тема", command=lambda: self.change_theme("dark"))
+        view_menu.add_separator()
+        self.scripts_view_mode_var = tk.StringVar(value=SCRIPT_VIEW_MODES[0])
+        view_menu.add_radiobutton(label="Активные скрипты: карточки", value='cards',
+                                  variable=self.scripts_view_mode_var,
+                                  command=lambda: self.change_scripts_view_mode('cards'))
+        view_menu.add_radiobutton(label="Активные скрипты: компактная таблица", value='compact',
+                                  variable=self.scripts_view_mode_var,
+                                  command=lambda: self.change_scripts_view_mode('compact'))
+        view_menu.add_separator()
+        self.sparkline_range_var = tk.StringVar(value=self.sparkline_range)
+        for range_key, label in (('5m', "История: 5 минут"), ('1h', "История: 1 час"), ('24h', "История: 24 часа")):
+            view_menu.add_radiobutton(label=label, value=range_key, variable=self.sparkline_range_var,
+                                      command=lambda key=range_key: self.change_sparkline_range(key))
 
         # НОВОЕ МЕНЮ: СПРАВКА
         help_menu = tk.Menu(menubar, tearoff=0)
@@ -634,37 +1762,11 @@ class ScriptManagerTkinter:
         scripts_label = ttk.Label(self.root, text="Активные скрипты:", font=("Arial", 12, "bold"))
         scripts_label.pack(anchor="w", padx=10, pady=(10, 0))
 
-        # Frame for active scripts with scrollbar - ИЗМЕНЕНО: создаем отдельный фрейм для области с прокруткой
-        active_scripts_frame = ttk.Frame(self.root)
-        active_scripts_frame.pack(side="left", fill="both", expand=True, padx=10, pady=5)
-
-        # Canvas and scrollbar for active script frames - ИЗМЕНЕНО: переносим в active_scripts_frame
-        self.canvas = tk.Canvas(active_scripts_frame, bg=THEMES[self.current_theme]["bg"])
-        self.scrollbar = ttk.Scrollbar(active_scripts_frame, orient="vertical", command=self.canvas.yview)
-        self.scrollable_frame = ttk.Frame(self.canvas)
-
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-        )
-
-        self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        self.canvas.configure(yscrollcommand=self.scrollbar.set)
-
-        # Упаковка canvas и scrollbar в active_scripts_frame
-        self.canvas.pack(side="left", fill="both", expand=True)
-        self.scrollbar.pack(side="right", fill="y")
-
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-        )
-
-        self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        self.canvas.configure(yscrollcommand=self.scrollbar.set)
-
-        self.canvas.pack(side="left", fill="both", expand=True, padx=10, pady=5)
-        self.scrollbar.pack(side="right", fill="y")
+        # Область активных скриптов: виртуализированный список карточек или компактная таблица
+        self.scripts_container = ttk.Frame(self.root)
+        self.scripts_container.pack(side="left", fill="both", expand=True, padx=10, pady=5)
+        self.scripts_view = None
+        self.set_scripts_view_mode(SCRIPT_VIEW_MODES[0])
 
         # Right panel for saved scripts catalog - УВЕЛИЧЕНА ШИРИНА в 1.3 раза
         right_frame = ttk.Frame(self.root, width=585)  # Было 450, стало 450 * 1.3 = 585
@@ -790,8 +1892,17 @@ class ScriptManagerTkinter:
             messagebox.showerror("Ошибка", f"Не удалось открыть браузер: {str(e)}")
 
     def setup_tray_icon(self):
-        """Создает иконку в системном трее"""
+        """Создает иконку в системном трее (в отдельном потоке, не задерживая окно)"""
+        self.tray_thread = threading.Thread(target=self.run_tray_icon, daemon=True)
+        self.tray_thread.start()
+
+    def run_tray_icon(self):
+        """Создает и обслуживает иконку в трее; выполняется в потоке трея"""
         try:
+            # pystray и PIL нужны только иконке в трее - импортируем их здесь, а не при запуске
+            import pystray
+            from PIL import Image, ImageDraw
+
             # Создаем изображение для иконки
             image = Image.new('RGB', (64, 64), color='white')
             dc = ImageDraw.Draw(image)
@@ -809,14 +1920,14 @@ class ScriptManagerTkinter:
             )
 
             # Создаем иконку в трее
-            self.tray_icon = pystray.Icon("script_manager", image, "Python Script Manager (PSM)", menu)
+            tray_icon = pystray.Icon("script_manager", image, "Python Script Manager (PSM)", menu)
 
             # Устанавливаем обработчик для левого клика
-            self.tray_icon.on_click = show_window
+            tray_icon.on_click = show_window
 
-            # Запускаем иконку в трее в отдельном потоке
-            self.tray_thread = threading.Thread(target=self.tray_icon.run, daemon=True)
-            self.tray_thread.start()
+            # Иконка становится доступна окну только полностью настроенной
+            self.tray_icon = tray_icon
+            tray_icon.run()
         except Exception as e:
             print(f"Ошибка создания иконки в трее: {e}")
 
@@ -838,14 +1949,41 @@ class ScriptManagerTkinter:
 
     def quit_application(self, icon=None, item=None):
         """Полностью выключает программу"""
-        # Сохраняем все данные
-        self.save_scripts()
-        self.save_settings()
+        # Вызов из меню трея приходит из его потока
+        if threading.current_thread() is not threading.main_thread():
+            self.root.after(0, self.quit_application)
+            return
+        if self.shutdown_coordinator is not None:
+            return
+
+        # Сохраняем все данные и дожидаемся записи на диск
+        self.engine.flush()
+
+        # Команды через API больше не принимаются
+        self.engine.stop_control_api()
+
+        # Останавливаем все скрипты одновременно, не блокируя интерфейс
+        self.shutdown_coordinator = self.engine.stop_all()
+        if not self.shutdown_coordinator.total:
+            self.finish_quit()
+            return
+
+        self.root.deiconify()
+        shutdown_dialog = ShutdownDialog(self.root, self.shutdown_coordinator, self.settings.get('theme', 'light'))
+
+        def wait_for_shutdown():
+            if self.shutdown_coordinator.done.is_set():
+                self.finish_quit()
+                return
+            shutdown_dialog.update_progress()
+            self.root.after(SHUTDOWN_PROGRESS_MS, wait_for_shutdown)
+
+        wait_for_shutdown()
 
-        # Останавливаем все скрипты
-        for script_data in self.script_frames:
-            if script_data['is_running']:
-                self.stop_script(script_data['script_uuid'])
+    def finish_quit(self):
+        """Завершает выход после остановки всех скриптов"""
+        coordinator = self.shutdown_coordinator
+        print(f"Остановлено скриптов: {coordinator.total}, из них принудительно: {coordinator.killed}")
 
         # Закрываем все открытые консоли
         for console in self.open_consoles.values():
@@ -854,6 +1992,9 @@ class ScriptManagerTkinter:
             except:
                 pass
 
+        # Останавливаем сбор метрик и пул интерпретаторов, дописываем кэши
+        self.engine.close()
+
         # Останавливаем иконку в трее
         if hasattr(self, 'tray_icon') and self.tray_icon:
             self.tray_icon.stop()
@@ -884,49 +2025,77 @@ class ScriptManagerTkinter:
 
     def open_console(self, script_uuid):
         """Открывает консоль для скрипта"""
-        for script_data in self.script_frames:
-            if script_data['script_uuid'] == script_uuid and script_data['is_running']:
-                script_info = self.saved_scripts.get(script_uuid)
-                if not script_info:
-                    return
-
-                script_name = script_info.get('display_name', script_info['name'])
-
-                # Если консоль уже открыта, фокусируемся на ней
-                if script_uuid in self.open_consoles:
-                    try:
-                        self.open_consoles[script_uuid].lift()
-                        self.open_consoles[script_uuid].focus_force()
-                        return
-                    except:
-                        # Если окно было закрыто, удаляем из словаря
-                        del self.open_consoles[script_uuid]
-
-                # Создаем новую консоль
-                console = ConsoleDialog(
-                    self.root,
-                    script_name,
-                    script_data['process'],
-                    self.current_theme
-                )
-
-                # Восстанавливаем предыдущий вывод если он есть
-                if script_uuid in self.process_output_buffers:
-                    console.load_historical_output(self.process_output_buffers[script_uuid])
-
-                # Сохраняем ссылку на консоль
-                self.open_consoles[script_uuid] = console
-
-                # Обработка закрытия консоли
-                def on_close(console=console, script_uuid=script_uuid):
-                    if script_uuid in self.open_consoles:
-                        del self.open_consoles[script_uuid]
-                    console.destroy()
-
-                console.protocol("WM_DELETE_WINDOW", on_close)
-                break
-        else:
+        runtime = self.runtimes.get(script_uuid)
+        if runtime is None or not runtime.is_running:
             messagebox.showwarning("Предупреждение", "Скрипт не запущен")
+            return
+
+        script_info = self.saved_scripts.get(script_uuid)
+        if not script_info:
+            return
+
+        script_name = script_info.get('display_name', script_info['name'])
+
+        # Если консоль уже открыта, фокусируемся на ней
+        if script_uuid in self.open_consoles:
+            try:
+                self.open_consoles[script_uuid].lift()
+                self.open_consoles[script_uuid].focus_force()
+                return
+            except:
+                # Если окно было закрыто, удаляем из словаря
+                del self.open_consoles[script_uuid]
+
+        # Создаем новую консоль
+        console = ConsoleDialog(
+            self.root,
+            script_name,
+            runtime.process,
+            self.current_theme,
+            on_search=lambda: self.open_search(script_uuid)
+        )
+
+        # Подключаем журнал (или буфер) вывода: консоль показывает его окном вокруг видимой области
+        output_source = self.engine.output_source(script_uuid)
+        if output_source is not None:
+            console.load_historical_output(output_source)
+
+        # Сохраняем ссылку на консоль
+        self.open_consoles[script_uuid] = console
+
+        # Обработка закрытия консоли
+        def on_close(console=console, script_uuid=script_uuid):
+            if script_uuid in self.open_consoles:
+                del self.open_consoles[script_uuid]
+            console.destroy()
+
+        console.protocol("WM_DELETE_WINDOW", on_close)
+
+    def set_scripts_view_mode(self, mode):
+        """Создаёт панель активных скриптов в режиме mode ('cards' или 'compact')"""
+        if mode not in SCRIPT_VIEW_MODES:
+            mode = SCRIPT_VIEW_MODES[0]
+        if self.scripts_view is not None:
+            self.scripts_view.destroy()
+        view_class = ScriptCardList if mode == 'cards' else ScriptTable
+        self.scripts_view = view_class(self.scripts_container, self, THEMES[self.current_theme])
+        self.scripts_view.pack(fill="both", expand=True)
+        self.scripts_view.sync()
+        self.scripts_view_mode_var.set(mode)
+
+    def change_scripts_view_mode(self, mode):
+        """Переключает режим панели активных скриптов и сохраняет выбор"""
+        self.set_scripts_view_mode(mode)
+        self.settings['scripts_view_mode'] = mode
+        self.save_settings()
+
+    def change_sparkline_range(self, range_key):
+        """Меняет диапазон мини-графиков истории в карточках и сохраняет выбор"""
+        self.sparkline_range = range_key if range_key in SPARKLINE_RANGES else '5m'
+        self.sparkline_range_var.set(self.sparkline_range)
+        self.settings['sparkline_range'] = self.sparkline_range
+        self.save_settings()
+        self.scripts_view.update_metrics()
 
     def change_theme(self, theme_name):
         """Изменяет тему приложения"""
@@ -935,215 +2104,189 @@ class ScriptManagerTkinter:
         self.settings['theme'] = theme_name
         self.save_settings()
 
-    def on_tree_double_click(self, event):
-        """Обработчик двойного клика по дереву скриптов"""
+    def selected_script_uuid(self):
+        """Возвращает UUID выбранного в каталоге скрипта (строки дерева имеют iid = UUID)"""
         selection = self.saved_tree.selection()
         if not selection:
-            return
+            return None
 
         item = selection[0]
-        parent = self.saved_tree.parent(item)
-
-        # Если есть родитель, то это скрипт (а не группа)
-        if parent:
-            item_text = self.saved_tree.item(item)["text"]
-            parent_text = self.saved_tree.item(parent)["text"]
-
-            # Находим скрипт по имени
-            script_uuid = None
-            for uuid, info in self.saved_scripts.items():
-                if info.get('display_name', info['name']) == item_text:
-                    script_uuid = uuid
-                    break
-
-            if script_uuid:
-                if parent_text == "Активные скрипты":
-                    # Перемещаем в неактивные с подтверждением
-                    if messagebox.askyesno("Подтверждение",
-                                           f"Вы уверены, что хотите переместить скрипт '{item_text}' в неактивные?"):
-                        self.remove_from_active(script_uuid)
-                elif parent_text == "Неактивные скрипты":
-                    # Перемещаем в активные
-                    self.add_to_active(script_uuid)
-
-    def update_saved_tree(self):
-        """Обновляет дерево сохраненных скриптов"""
-        self.saved_tree.delete(*self.saved_tree.get_children())
-
-        # Активные скрипты
-        active_node = self.saved_tree.insert("", "end", text="Активные скрипты", values=("", ""))
-        for script_uuid in self.active_scripts:
+        return item if item in self.saved_scripts else None
+
+    def on_tree_double_click(self, event):
+        """Обработчик двойного клика по дереву скриптов"""
+        script_uuid = self.selected_script_uuid()
+        if not script_uuid:
+            return
+
+        parent = self.saved_tree.parent(script_uuid)
+        if parent == TREE_ACTIVE_NODE:
+            script_info = self.saved_scripts[script_uuid]
+            script_name = script_info.get('display_name', script_info['name'])
+            # Перемещаем в неактивные с подтверждением
+            if messagebox.askyesno("Подтверждение",
+                                   f"Вы уверены, что хотите переместить скрипт '{script_name}' в неактивные?"):
+                self.remove_from_active(script_uuid)
+        elif parent == TREE_INACTIVE_NODE:
+            # Перемещаем в активные
+            self.add_to_active(script_uuid)
+
+    def update_saved_tree(self, script_uuid=None):
+        """
+        Планирует обновление дерева сохраненных скриптов.
+        С script_uuid обновляется только строка этого скрипта (смена статуса), без него -
+        структура всего дерева. Все вызовы за TREE_UPDATE_DELAY_MS сливаются в одно обновление.
+        """
+        if script_uuid is None:
+            self._tree_full_sync = True
+        else:
+            self._tree_dirty.add(script_uuid)
+
+        if self._tree_update_job is None:
+            self._tree_update_job = self.root.after(TREE_UPDATE_DELAY_MS, self._flush_tree_update)
+
+    def _tree_row(self, script_uuid, script_info, is_active):
+        """Текст и значения строки дерева для скрипта"""
+        display_name = script_info.get('display_name', script_info['name'])
+        if is_active:
+            # Определяем статус скрипта
+            status = "Запущен" if self.is_script_running(script_uuid) else "Остановлен"
+        else:
+            status = "Неактивен"
+        autostart_status = "Автозапуск" if script_info.get('autostart', False) else ""
+        return display_name, (status, autostart_status)
+
+    def _set_tree_row(self, script_uuid, text, values):
+        """Меняет строку дерева, только если её содержимое действительно изменилось"""
+        if self._tree_rows.get(script_uuid) != (text, values):
+            self.saved_tree.item(script_uuid, text=text, values=values)
+            self._tree_rows[script_uuid] = (text, values)
+
+    def _flush_tree_update(self):
+        self._tree_update_job = None
+        dirty, self._tree_dirty = self._tree_dirty, set()
+
+        if self._tree_full_sync:
+            self._tree_full_sync = False
+            self._sync_tree_structure()
+            return
+
+        active = set(self.active_scripts)
+        for script_uuid in dirty:
             script_info = self.saved_scripts.get(script_uuid)
-            if script_info:
-                display_name = script_info.get('display_name', script_info['name'])
-                # Определяем статус скрипта
-                status = "Запущен" if self.is_script_running(script_uuid) else "Остановлен"
-                # ОБНОВЛЕНО: Добавляем информацию об автозапуске
-                autostart_status = "Автозапуск" if script_info.get('autostart', False) else ""
-                self.saved_tree.insert(active_node, "end", text=display_name, values=(status, autostart_status))
-
-        # Неактивные скрипты
-        inactive_node = self.saved_tree.insert("", "end", text="Неактивные скрипты", values=("", ""))
-        for script_uuid, script_info in self.saved_scripts.items():
-            if script_uuid not in self.active_scripts:
-                display_name = script_info.get('display_name', script_info['name'])
-                # ОБНОВЛЕНО: Добавляем информацию об автозапуске
-                autostart_status = "Автозапуск" if script_info.get('autostart', False) else ""
-                self.saved_tree.insert(inactive_node, "end", text=display_name, values=("Неактивен", autostart_status))
-
-        # Всегда разворачиваем узлы
-        self.saved_tree.item(active_node, open=True)
-        self.saved_tree.item(inactive_node, open=True)
+            if script_info and self.saved_tree.exists(script_uuid):
+                text, values = self._tree_row(script_uuid, script_info, script_uuid in active)
+                self._set_tree_row(script_uuid, text, values)
+
+    def _sync_tree_structure(self):
+        """Приводит дерево к текущему каталогу, трогая только изменившиеся строки"""
+        tree = self.saved_tree
+        if not tree.exists(TREE_ACTIVE_NODE):
+            tree.insert("", "end", iid=TREE_ACTIVE_NODE, text="Активные скрипты", values=("", ""), open=True)
+            tree.insert("", "end", iid=TREE_INACTIVE_NODE, text="Неактивные скрипты", values=("", ""), open=True)
+
+        active = set(self.active_scripts)
+        desired = {
+            TREE_ACTIVE_NODE: [s for s in self.active_scripts if s in self.saved_scripts],
+            TREE_INACTIVE_NODE: [s for s in self.saved_scripts if s not in active]
+        }
+
+        # Удаляем строки скриптов, которых больше нет в каталоге
+        removed = [s for s in self._tree_rows if s not in self.saved_scripts]
+        if removed:
+            tree.delete(*removed)
+            for script_uuid in removed:
+                del self._tree_rows[script_uuid]
+
+        # Отцепляем строки, сменившие группу, - они вернутся на место при обходе своей группы
+        for node, wanted in desired.items():
+            wanted_set = set(wanted)
+            strays = [s for s in tree.get_children(node) if s not in wanted_set]
+            if strays:
+                tree.detach(*strays)
+
+        for node, wanted in desired.items():
+            current = list(tree.get_children(node))
+            for index, script_uuid in enumerate(wanted):
+                script_info = self.saved_scripts[script_uuid]
+                text, values = self._tree_row(script_uuid, script_info, node == TREE_ACTIVE_NODE)
+
+                if script_uuid not in self._tree_rows:
+                    tree.insert(node, index, iid=script_uuid, text=text, values=values)
+                    self._tree_rows[script_uuid] = (text, values)
+                    current.insert(index, script_uuid)
+                    continue
+
+                # Переносим строку только если она не на своём месте
+                if index >= len(current) or current[index] != script_uuid:
+                    tree.move(script_uuid, node, index)
+                    if script_uuid in current:
+                        current.remove(script_uuid)
+                    current.insert(index, script_uuid)
+
+                self._set_tree_row(script_uuid, text, values)
 
     def is_script_running(self, script_uuid):
         """Проверяет, запущен ли скрипт"""
-        for script_data in self.script_frames:
-            if script_data['script_uuid'] == script_uuid:
-                return script_data['is_running']
-        return False
+        runtime = self.runtimes.get(script_uuid)
+        return runtime is not None and runtime.is_running
 
     def open_settings(self):
         # ДОБАВЛЕНО: Обновляем состояние автозапуска перед открытием диалога
-        startup_folder = winshell.startup()
-        shortcut_path = os.path.join(startup_folder, "Python Script Manager (PSM).lnk")
-        actual_autostart = os.path.exists(shortcut_path)
-        self.settings['autostart'] = actual_autostart
+        backend = self.engine.backend
+        if backend.autostart_supported:
+            self.settings['autostart'] = backend.is_autostart_enabled()
 
-        dialog = SettingsDialog(self.root, self.settings)
+        dialog = SettingsDialog(self.root, self.settings, self.engine.packages, backend)
         self.root.wait_window(dialog)
         # Сохраняем настройки после закрытия диалога
         self.save_settings()
+        self.engine.configure_warm_pool()
+        self.configure_control_api()
+        self.engine.configure_placement()
+        self.engine.configure_log_store()
 
-    def load_settings(self):
-        """Загружает настройки из JSON файла"""
+    def configure_control_api(self):
+        """Включает, перезапускает или выключает локальный API управления по настройкам"""
         try:
-            settings_path = os.path.join(BASE_PATH, "settings.json")
-            if os.path.exists(settings_path):
-                with open(settings_path, 'r', encoding='utf-8') as f:
-                    self.settings = json.load(f)
-
-                # Применяем сохраненную тему
-                saved_theme = self.settings.get('theme', 'light')
-                self.change_theme(saved_theme)
-
-                # ДОБАВЛЕНО: Устанавливаем настройку мониторинга производительности по умолчанию в True
-                if 'performance_monitoring' not in self.settings:
-                    self.settings['performance_monitoring'] = True
-
-                # ОБНОВЛЕНО: Если default_interpreter не установлен, ищем системный Python
-                if 'default_interpreter' not in self.settings or not self.settings['default_interpreter']:
-                    self.settings['default_interpreter'] = find_system_python()
-                    self.save_settings()
-
-            else:
-                # ОБНОВЛЕНО: При первом запуске используем системный Python
-                self.settings = {
-                    'theme': 'light',
-                    'performance_monitoring': True,
-                    'autostart': False,
-                    'default_interpreter': find_system_python()  # Ищем системный Python
-                }
-                self.save_settings()
-
-            # Проверяем актуальность состояния автозапуска
-            startup_folder = winshell.startup()
-            shortcut_path = os.path.join(startup_folder, "Python Script Manager (PSM).lnk")
-            actual_autostart = os.path.exists(shortcut_path)
-
-            # Синхронизируем настройку с фактическим состоянием
-            if self.settings.get('autostart', False) != actual_autostart:
-                self.settings['autostart'] = actual_autostart
-                self.save_settings()
+            self.engine.configure_control_api()
+        except OSError as e:
+            messagebox.showerror("Ошибка", f"Не удалось запустить API управления: {str(e)}")
 
-        except Exception as e:
-            print(f"Ошибка загрузки настроек: {str(e)}")
-            self.settings = {
-                'theme': 'light',
-                'performance_monitoring': True,
-                'autostart': False,
-                'default_interpreter': find_system_python()  # Ищем системный Python даже при ошибке
-            }
+    def load_settings(self):
+        """Загружает настройки из JSON файла и применяет сохраненную тему"""
+        self.engine.load_settings()
+        self.change_theme(self.settings.get('theme', 'light'))
+        mode = self.settings.get('scripts_view_mode', SCRIPT_VIEW_MODES[0])
+        if mode != self.scripts_view_mode_var.get():
+            self.set_scripts_view_mode(mode)
+        sparkline_range = self.settings.get('sparkline_range', '5m')
+        self.sparkline_range = sparkline_range if sparkline_range in SPARKLINE_RANGES else '5m'
+        self.sparkline_range_var.set(self.sparkline_range)
 
     def save_settings(self):
-        """Сохраняет настройки в JSON файл"""
-        try:
-            with open(self.settings_file, 'w', encoding='utf-8') as f:
-                json.dump(self.settings, f, indent=4, ensure_ascii=False)
-        except Exception as e:
-            print(f"Ошибка сохранения настроек: {str(e)}")
+        """Планирует сохранение настроек в JSON файл (запись выполняется в фоне)"""
+        self.engine.save_settings()
 
     def save_scripts(self):
-        """Сохраняет все скрипты в JSON файл"""
-        try:
-            # Сохраняем информацию о состоянии скриптов (активные/неактивные)
-            scripts_to_save = {}
-            for script_uuid, script_info in self.saved_scripts.items():
-                script_copy = script_info.copy()
-                # Добавляем информацию о том, активен ли скрипт
-                script_copy['is_active'] = script_uuid in self.active_scripts
-                # Добавляем информацию о состоянии выполнения
-                for script_data in self.script_frames:
-                    if script_data['script_uuid'] == script_uuid:
-                        script_copy['is_running'] = script_data['is_running']
-                        script_copy['pid'] = script_data.get('pid')
-                        break
-                scripts_to_save[script_uuid] = script_copy
-
-            with open(self.scripts_file, 'w', encoding='utf-8') as f:
-                json.dump(scripts_to_save, f, indent=4, ensure_ascii=False)
-
-            # Сохраняем настройки
-            self.save_settings()
-        except Exception as e:
-            print(f"Ошибка сохранения скриптов: {str(e)}")
+        """Планирует сохранение всех скриптов в JSON файл"""
+        self.engine.save_scripts()
 
     def load_scripts(self):
-        """Загружает скрипты из JSON файла"""
+        """Загружает скрипты из JSON файла и строит панели активных скриптов"""
         try:
-            if os.path.exists(self.scripts_file):
-                with open(self.scripts_file, 'r', encoding='utf-8') as f:
-                    loaded_scripts = json.load(f)
-
-                # Очищаем текущие скрипты
-                for script_data in self.script_frames:
-                    if script_data['is_running']:
-                        self.stop_script(script_data['script_uuid'])
+            scripts_to_start = self.engine.load_scripts()
 
-                self.saved_scripts.clear()
-                self.active_scripts.clear()
-                self.script_frames.clear()
+            # Показываем активные скрипты (включая скрипты с автозапуском)
+            self.scripts_view.sync()
 
-                # Очищаем интерфейс
-                for widget in self.scrollable_frame.winfo_children():
-                    widget.destroy()
-
-                self.update_saved_tree()
-
-                # Загружаем скрипты из файла
-                scripts_to_start = []  # Список скриптов для автозапуска
-
-                for script_uuid, script_info in loaded_scripts.items():
-                    self.saved_scripts[script_uuid] = script_info
-
-                    # Восстанавливаем активные скрипты
-                    if script_info.get('is_active', False):
-                        self.active_scripts.append(script_uuid)
-                        self.create_script_frame(script_uuid)
-
-                    # Собираем скрипты для автозапуска (только те, у которых autostart=True)
-                    if script_info.get('autostart', False):
-                        # Если скрипт еще не в активных, добавляем его
-                        if script_uuid not in self.active_scripts:
-                            self.active_scripts.append(script_uuid)
-                            self.create_script_frame(script_uuid)
-                        scripts_to_start.append(script_uuid)
-
-                # Обновляем дерево
-                self.update_saved_tree()
+            # Обновляем дерево
+            self.update_saved_tree()
 
-                # Запускаем только скрипты с autostart=True
-                for script_uuid in scripts_to_start:
-                    self.root.after(1000, lambda s=script_uuid: self.start_script(s))
+            # Запускаем только скрипты с autostart=True - поочерёдно, с ограничением числа
+            # одновременных запусков и с учётом загрузки CPU
+            self.engine.schedule_autostart(scripts_to_start, start_fn=self.start_script,
+                                           on_finished=self.report_startup)
 
         except Exception as e:
             print(f"Ошибка загрузки скриптов: {str(e)}")
@@ -1152,23 +2295,7 @@ class ScriptManagerTkinter:
         """Добавляет выбранный скрипт из сохраненных в активные"""
         if script_uuid is None:
             # Старый метод для обратной совместимости
-            selection = self.saved_tree.selection()
-            if not selection:
-                return
-
-            item = selection[0]
-            parent = self.saved_tree.parent(item)
-
-            if not parent:
-                return
-
-            item_text = self.saved_tree.item(item)["text"]
-
-            # Находим скрипт по имени
-            for uuid, info in self.saved_scripts.items():
-                if info.get('display_name', info['name']) == item_text:
-                    script_uuid = uuid
-                    break
+            script_uuid = self.selected_script_uuid()
 
         if script_uuid:
             # Проверяем, не добавлен ли уже скрипт в активные
@@ -1176,33 +2303,17 @@ class ScriptManagerTkinter:
                 return
 
             # Добавляем в активные
-            self.active_scripts.append(script_uuid)
-            self.create_script_frame(script_uuid)
+            self.activate_script(script_uuid)
             self.update_saved_tree()
             self.save_scripts()
 
     def delete_script(self):
         """Удаляет выбранный скрипт из сохраненных"""
-        selection = self.saved_tree.selection()
-        if not selection:
+        if not self.saved_tree.selection():
             messagebox.showwarning("Предупреждение", "Выберите скрипт для удаления")
             return
 
-        item = selection[0]
-        parent = self.saved_tree.parent(item)
-
-        if not parent:
-            return
-
-        item_text = self.saved_tree.item(item)["text"]
-
-        # Находим скрипт по имени
-        script_uuid = None
-        for uuid, info in self.saved_scripts.items():
-            if info.get('display_name', info['name']) == item_text:
-                script_uuid = uuid
-                break
-
+        script_uuid = self.selected_script_uuid()
         if not script_uuid:
             return
 
@@ -1217,13 +2328,10 @@ class ScriptManagerTkinter:
             if script_uuid in self.active_scripts:
                 self.remove_from_active(script_uuid)
 
-            # Удаляем из сохраненных
-            if script_uuid in self.saved_scripts:
-                del self.saved_scripts[script_uuid]
+            # Удаляем из сохраненных вместе с буфером вывода
+            self.engine.delete_script(script_uuid)
 
             # Удаляем связанные данные
-            if script_uuid in self.process_output_buffers:
-                del self.process_output_buffers[script_uuid]
             if script_uuid in self.open_consoles:
                 try:
                     self.open_consoles[script_uuid].destroy()
@@ -1235,30 +2343,14 @@ class ScriptManagerTkinter:
 
             # Обновляем интерфейс
             self.update_saved_tree()
-            self.save_scripts()
 
     def rename_script(self):
         """Переименовывает выбранный скрипт"""
-        selection = self.saved_tree.selection()
-        if not selection:
+        if not self.saved_tree.selection():
             messagebox.showwarning("Предупреждение", "Выберите скрипт для переименования")
             return
 
-        item = selection[0]
-        parent = self.saved_tree.parent(item)
-
-        if not parent:
-            return
-
-        item_text = self.saved_tree.item(item)["text"]
-
-        # Находим скрипт по имени
-        script_uuid = None
-        for uuid, info in self.saved_scripts.items():
-            if info.get('display_name', info['name']) == item_text:
-                script_uuid = uuid
-                break
-
+        script_uuid = self.selected_script_uuid()
         if not script_uuid:
             return
 
@@ -1274,33 +2366,18 @@ class ScriptManagerTkinter:
         if dialog.result:
             new_name = dialog.result
             script_info['display_name'] = new_name
-            self.update_saved_tree()
-            # ИСПРАВЛЕНО: Обновляем только конкретный фрейм вместо всех
-            self.update_single_script_frame(script_uuid)
+            self.update_saved_tree(script_uuid)
+            # Обновляем только строку этого скрипта в панели
+            self.scripts_view.update_script(script_uuid)
             self.save_scripts()
 
     def show_script_file(self):
         """Показывает файл скрипта в проводнике"""
-        selection = self.saved_tree.selection()
-        if not selection:
+        if not self.saved_tree.selection():
             messagebox.showwarning("Предупреждение", "Выберите скрипт для показа файла")
             return
 
-        item = selection[0]
-        parent = self.saved_tree.parent(item)
-
-        if not parent:
-            return
-
-        item_text = self.saved_tree.item(item)["text"]
-
-        # Находим скрипт по имени
-        script_uuid = None
-        for uuid, info in self.saved_scripts.items():
-            if info.get('display_name', info['name']) == item_text:
-                script_uuid = uuid
-                break
-
+        script_uuid = self.selected_script_uuid()
         if not script_uuid:
             return
 
@@ -1313,200 +2390,47 @@ class ScriptManagerTkinter:
 
         if os.path.exists(folder_path):
             try:
-                # Открываем папку в проводнике Windows
-                os.startfile(folder_path)
+                # Открываем папку в проводнике системы
+                self.engine.backend.open_folder(folder_path)
             except Exception as e:
                 messagebox.showerror("Ошибка", f"Не удалось открыть папку: {str(e)}")
         else:
             messagebox.showerror("Ошибка", f"Папка {folder_path} не найдена")
 
-    def update_single_script_frame(self, script_uuid):
-        """Обновляет только один фрейм скрипта"""
-        for script_data in self.script_frames:
-            if script_data['script_uuid'] == script_uuid:
-                script_info = self.saved_scripts.get(script_uuid)
-                if not script_info:
-                    return
-
-                display_name = script_info.get('display_name', script_info['name'])
-                # Обновляем заголовок фрейма
-                script_data['frame'].configure(text=display_name)
-                break
-
-    def update_script_frames(self):
-        """Обновляет фреймы активных скриптов"""
-        # Очищаем текущие фреймы
-        for widget in self.scrollable_frame.winfo_children():
-            widget.destroy()
-
-        # Создаем фреймы заново
-        self.script_frames.clear()
-        for script_uuid in self.active_scripts:
-            self.create_script_frame(script_uuid)
-
     def add_script(self):
         """Добавляет новый скрипт в оба каталога"""
         script_path = filedialog.askopenfilename(filetypes=[("Python files", "*.py")])
         if script_path:
-            script_name = os.path.basename(script_path).replace('.py', '')
-
-            # ОБНОВЛЕНО: Используем интерпретатор из настроек (уже должен быть системный Python)
-            default_interpreter = self.settings.get('default_interpreter', find_system_python())
-
-            # Создаем уникальный идентификатор для скрипта
-            script_uuid = str(uuid.uuid4())
-
-            script_info = {
-                'uuid': script_uuid,
-                'name': script_name,
-                'display_name': script_name,
-                'path': script_path,
-                'interpreter': default_interpreter,
-                'autostart': False
-            }
-
-            # Добавляем в сохраненные
-            self.saved_scripts[script_uuid] = script_info
-
-            # Добавляем в активные
-            self.active_scripts.append(script_uuid)
+            # Скрипт добавляется в сохраненные и в активные с интерпретатором из настроек
+            script_uuid = self.engine.add_script(script_path)
 
             # Обновляем интерфейс
-            self.create_script_frame(script_uuid)
+            self.activate_script(script_uuid)
             self.update_saved_tree()
 
-            # Сохраняем
-            self.save_scripts()
-
-    def create_script_frame(self, script_uuid):
-        """Создает фрейм для активного скрипта"""
-        script_info = self.saved_scripts.get(script_uuid)
-        if not script_info:
+    def activate_script(self, script_uuid):
+        """Делает скрипт активным и показывает его в панели активных скриптов"""
+        if self.engine.activate(script_uuid) is None:
             return
-
-        display_name = script_info.get('display_name', script_info['name'])
-
-        # Создаем кастомный фрейм с увеличенной высотой
-        frame = ttk.LabelFrame(self.scrollable_frame, text=display_name, padding=10)
-        frame.pack(fill="x", pady=8, padx=5)
-
-        # Устанавливаем минимальную высоту фрейма
-        frame.configure(height=140)
-
-        # Controls
-        controls_frame = ttk.Frame(frame)
-        controls_frame.pack(fill="x", pady=(0, 8))
-
-        # Кнопка консоли - изначально отключена
-        console_btn = ttk.Button(controls_frame, text="Консоль",
-                                 state=tk.DISABLED,
-                                 command=lambda: self.open_console(script_uuid))
-        console_btn.pack(side="right", padx=2)
-
-        ttk.Button(controls_frame, text="Настройки",
-                   command=lambda: self.configure_script(script_uuid)).pack(side="right", padx=2)
-        ttk.Button(controls_frame, text="Удалить из активных",
-                   command=lambda: self.remove_from_active(script_uuid)).pack(side="right", padx=2)
-
-        # Объединенная кнопка запуска/остановки
-        toggle_btn = ttk.Button(controls_frame, text="Запуск", style="Start.TButton",
-                                command=lambda: self.toggle_script(script_uuid))
-        toggle_btn.pack(side="right", padx=2)
-
-        # Resource monitoring
-        resources_frame = ttk.Frame(frame)
-        resources_frame.pack(fill="x", pady=8)
-
-        cpu_var = tk.IntVar()
-        memory_var = tk.IntVar()
-
-        ttk.Label(resources_frame, text="CPU:").grid(row=0, column=0, sticky="w")
-        cpu_bar = ttk.Progressbar(resources_frame, variable=cpu_var, maximum=100)
-        cpu_bar.grid(row=0, column=1, sticky="ew", padx=5)
-        cpu_label = ttk.Label(resources_frame, text="0%")
-        cpu_label.grid(row=0, column=2, padx=5)
-
-        ttk.Label(resources_frame, text="Память:").grid(row=1, column=0, sticky="w")
-        memory_bar = ttk.Progressbar(resources_frame, variable=memory_var, maximum=100)
-        memory_bar.grid(row=1, column=1, sticky="ew", padx=5)
-        memory_label = ttk.Label(resources_frame, text="0%")
-        memory_label.grid(row=1, column=2, padx=5)
-
-        resources_frame.columnconfigure(1, weight=1)
-
-        script_frame_data = {
-            'frame': frame,
-            'script_uuid': script_uuid,
-            'script_info': script_info,
-            'process': None,
-            'pid': None,
-            'cpu_var': cpu_var,
-            'memory_var': memory_var,
-            'cpu_label': cpu_label,
-            'memory_label': memory_label,
-            'toggle_btn': toggle_btn,
-            'console_btn': console_btn,
-            'is_running': False,
-            'last_cpu_times': (0, 0),
-            'last_check_time': time.time()
-        }
-
-        self.script_frames.append(script_frame_data)
-
-        # Явно устанавливаем начальное состояние кнопок
-        self.update_toggle_button(script_frame_data)
-
-        # Обновляем область прокрутки после добавления нового фрейма
-        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+        self.scripts_view.sync()
+        self.scripts_view.see(script_uuid)
 
     def toggle_script(self, script_uuid):
         """Переключает состояние скрипта (запуск/остановка)"""
-        for script_data in self.script_frames:
-            if script_data['script_uuid'] == script_uuid:
-                if script_data['is_running']:
-                    self.stop_script(script_uuid)
-                else:
-                    self.start_script(script_uuid)
-                break
-
-    def update_toggle_button(self, script_data):
-        """Обновляет вид кнопки запуска/остановки"""
-        # Проверяем, существуют ли еще виджеты
-        if not script_data['frame'].winfo_exists():
+        runtime = self.runtimes.get(script_uuid)
+        if runtime is None:
             return
 
-        try:
-            if script_data['is_running']:
-                script_data['toggle_btn'].config(text="Остановить", style="Stop.TButton")
-                script_data['console_btn'].config(state=tk.NORMAL)
-            else:
-                script_data['toggle_btn'].config(text="Запуск", style="Start.TButton")
-                script_data['console_btn'].config(state=tk.DISABLED)
-        except tk.TclError:
-            # Игнорируем ошибки, если виджеты уже уничтожены
-            pass
+        if runtime.is_running:
+            self.stop_script(script_uuid)
+        else:
+            self.start_script(script_uuid)
 
     def remove_from_active(self, script_uuid):
         """Удаляет скрипт из активных (но оставляет в сохраненных)"""
-        # Останавливаем скрипт если запущен
-        for script_data in self.script_frames:
-            if script_data['script_uuid'] == script_uuid:
-                if script_data['is_running']:
-                    self.stop_script(script_uuid)
-                break
-
-        # Удаляем из активных
-        if script_uuid in self.active_scripts:
-            self.active_scripts.remove(script_uuid)
-
-        # ИСПРАВЛЕНО: Удаляем только конкретный фрейм вместо пересоздания всех
-        for i, script_data in enumerate(self.script_frames):
-            if script_data['script_uuid'] == script_uuid:
-                # Уничтожаем фрейм
-                script_data['frame'].destroy()
-                # Удаляем из списка фреймов
-                self.script_frames.pop(i)
-                break
+        # Останавливаем скрипт если запущен и удаляем из активных
+        self.engine.deactivate(script_uuid)
+        self.scripts_view.sync()
 
         self.update_saved_tree()
         self.save_scripts()
@@ -1520,7 +2444,7 @@ class ScriptManagerTkinter:
 
         config_window = tk.Toplevel(self.root)
         config_window.title(f"Настройки: {display_name}")
-        config_window.geometry("500x350")
+        config_window.geometry("500x640")
         config_window.resizable(False, False)
         config_window.transient(self.root)
         config_window.grab_set()
@@ -1562,6 +2486,16 @@ class ScriptManagerTkinter:
 
         ttk.Button(interpreter_subframe, text="Обзор", command=browse_interpreter).pack(side=tk.RIGHT)
 
+        # Group (для пакетных операций через API)
+        group_frame = ttk.Frame(main_frame)
+        group_frame.pack(fill=tk.X, pady=5)
+
+        ttk.Label(group_frame, text="Группа:").pack(side=tk.LEFT)
+        group_var = tk.StringVar(value=script_info.get('group', ''))
+        existing_groups = sorted({info['group'] for info in self.saved_scripts.values() if info.get('group')})
+        ttk.Combobox(group_frame, textvariable=group_var, values=existing_groups,
+                     width=30).pack(side=tk.LEFT, padx=(5, 0))
+
         # ИЗМЕНЕНО: Сначала кнопка пакетов, потом автозапуск
         # Packages button - ПЕРЕМЕЩЕН ВВЕРХ
         ttk.Button(main_frame, text="Показать установленные пакеты",
@@ -1575,28 +2509,127 @@ class ScriptManagerTkinter:
         ttk.Checkbutton(autostart_frame, text="Запускать скрипт при старте программы",
                         variable=autostart_var).pack(anchor=tk.W)
 
+        autostart_order_frame = ttk.Frame(autostart_frame)
+        autostart_order_frame.pack(fill=tk.X, pady=(5, 0))
+
+        priority_var = tk.IntVar(value=script_info.get('autostart_priority', 0))
+        delay_var = tk.DoubleVar(value=script_info.get('autostart_delay', 0))
+        ttk.Label(autostart_order_frame, text="Приоритет:").pack(side=tk.LEFT)
+        ttk.Spinbox(autostart_order_frame, from_=-100, to=100, width=6,
+                    textvariable=priority_var).pack(side=tk.LEFT, padx=(5, 15))
+        ttk.Label(autostart_order_frame, text="Задержка (с):").pack(side=tk.LEFT)
+        ttk.Spinbox(autostart_order_frame, from_=0, to=3600, increment=1, width=6,
+                    textvariable=delay_var).pack(side=tk.LEFT, padx=(5, 0))
+
+        warm_start_var = tk.BooleanVar(value=script_info.get('warm_start', False))
+        ttk.Checkbutton(main_frame, text="Запускать в прогретом интерпретаторе (если пул включён)",
+                        variable=warm_start_var).pack(anchor=tk.W, pady=5)
+
+        # Output encoding
+        encoding_frame = ttk.Frame(main_frame)
+        encoding_frame.pack(fill=tk.X, pady=5)
+
+        ttk.Label(encoding_frame, text="Кодировка вывода:").pack(side=tk.LEFT)
+        encoding_var = tk.StringVar(value=script_info.get('encoding') or 'auto')
+        ttk.Combobox(encoding_frame, textvariable=encoding_var, values=OUTPUT_ENCODING_CHOICES,
+                     width=12).pack(side=tk.LEFT, padx=(5, 0))
+
+        # Process resources: priority, I/O priority and CPU affinity
+        resources_frame = ttk.LabelFrame(main_frame, text="Ресурсы процесса", padding=5)
+        resources_frame.pack(fill=tk.X, pady=5)
+        resources_frame.columnconfigure(1, weight=1)
+
+        priority_labels = {label: level for level, label in PRIORITY_LABELS.items()}
+        io_priority_labels = {label: level for level, label in IO_PRIORITY_LABELS.items()}
+        process_priority_var = tk.StringVar(value=PRIORITY_LABELS.get(script_info.get('priority') or '', ''))
+        io_priority_var = tk.StringVar(value=IO_PRIORITY_LABELS.get(script_info.get('io_priority') or '', ''))
+        affinity_var = tk.StringVar(value=format_cpu_list(script_info.get('cpu_affinity')))
+
+        ttk.Label(resources_frame, text="Приоритет процесса:").grid(row=0, column=0, sticky=tk.W, pady=2)
+        ttk.Combobox(resources_frame, textvariable=process_priority_var, values=list(priority_labels),
+                     state="readonly", width=20).grid(row=0, column=1, sticky=tk.W, padx=(5, 0), pady=2)
+        ttk.Label(resources_frame, text="Приоритет ввода-вывода:").grid(row=1, column=0, sticky=tk.W, pady=2)
+        ttk.Combobox(resources_frame, textvariable=io_priority_var, values=list(io_priority_labels),
+                     state="readonly", width=20).grid(row=1, column=1, sticky=tk.W, padx=(5, 0), pady=2)
+        ttk.Label(resources_frame, text="Ядра CPU:").grid(row=2, column=0, sticky=tk.W, pady=2)
+        ttk.Entry(resources_frame, textvariable=affinity_var, width=22).grid(row=2, column=1, sticky=tk.W,
+                                                                             padx=(5, 0), pady=2)
+        ttk.Label(resources_frame, text=f"Например: 0-3,6 (всего ядер: {os.cpu_count() or 1}); пусто - все ядра",
+                  font=("Arial", 8)).grid(row=3, column=0, columnspan=2, sticky=tk.W)
+
         # Buttons
         buttons_frame = ttk.Frame(main_frame)
         buttons_frame.pack(fill=tk.X, pady=10)
 
         def save_config():
+            try:
+                cpu_affinity = parse_cpu_list(affinity_var.get())
+            except ValueError as e:
+                messagebox.showerror("Ошибка", str(e), parent=config_window)
+                return
+            if cpu_affinity and cpu_affinity[-1] >= (os.cpu_count() or 1):
+                messagebox.showerror("Ошибка", f"В системе нет ядра {cpu_affinity[-1]}", parent=config_window)
+                return
+
+            encoding = encoding_var.get().strip().lower()
+            if encoding and encoding != 'auto':
+                try:
+                    codecs.lookup(encoding)
+                except LookupError:
+                    messagebox.showerror("Ошибка", f"Неизвестная кодировка: {encoding}", parent=config_window)
+                    return
+
+            try:
+                autostart_priority = int(priority_var.get())
+                autostart_delay = max(0.0, float(delay_var.get()))
+            except (tk.TclError, ValueError):
+                messagebox.showerror("Ошибка", "Некорректный приоритет или задержка автозапуска",
+                                     parent=config_window)
+                return
+
+            previous_info = dict(script_info)
             script_info['display_name'] = name_var.get()
             script_info['interpreter'] = interpreter_var.get()
             script_info['autostart'] = autostart_var.get()
+            script_info['autostart_priority'] = autostart_priority
+            script_info['autostart_delay'] = autostart_delay
+            script_info['warm_start'] = warm_start_var.get()
+            if group_var.get().strip():
+                script_info['group'] = group_var.get().strip()
+            else:
+                script_info.pop('group', None)
+            if encoding and encoding != 'auto':
+                script_info['encoding'] = encoding
+            else:
+                script_info.pop('encoding', None)
+            for key, value in (('priority', priority_labels.get(process_priority_var.get())),
+                               ('io_priority', io_priority_labels.get(io_priority_var.get())),
+                               ('cpu_affinity', cpu_affinity)):
+                if value:
+                    script_info[key] = value
+                else:
+                    script_info.pop(key, None)
 
             config_window.destroy()
-            self.update_saved_tree()
-            self.update_single_script_frame(script_uuid)
+            self.update_saved_tree(script_uuid)
+            self.scripts_view.update_script(script_uuid)
             self.save_scripts()
+            self.engine.configure_warm_pool()
+
+            # Запущенный скрипт получает новый приоритет и ядра сразу, без перезапуска
+            errors = self.engine.apply_process_settings(script_uuid, previous_info)
+            if errors:
+                messagebox.showwarning("Предупреждение",
+                                       "Не все настройки процесса применены:\n" + "\n".join(errors))
 
         ttk.Button(buttons_frame, text="Сохранить", command=save_config).pack(side=tk.RIGHT, padx=(5, 0))
         ttk.Button(buttons_frame, text="Отмена", command=config_window.destroy).pack(side=tk.RIGHT)
 
     def show_script_packages(self, interpreter):
         # ОБНОВЛЕНО: Добавляем проверку интерпретатора
-        if not interpreter or not os.path.exists(interpreter):
+        if not self.engine.validate_interpreter(interpreter):
             # Пытаемся найти системный Python
-            system_python = find_system_python()
+            system_python = self.engine.interpreters.default()
             if system_python and os.path.exists(system_python):
                 interpreter = system_python
                 # Обновляем настройки
@@ -1607,340 +2640,138 @@ class ScriptManagerTkinter:
                                      "Интерпретатор Python не найден. Пожалуйста, укажите путь к Python в настройках.")
                 return
 
-        try:
-            # Get installed packages
-            result = subprocess.run([
-                interpreter, "-m", "pip", "list"
-            ], capture_output=True, text=True, timeout=30)
-
-            if result.returncode == 0:
-                # Show packages in a new window
-                packages_window = tk.Toplevel(self.root)
-                packages_window.title("Установленные пакеты")
-                packages_window.geometry("600x400")
-                packages_window.transient(self.root)
-                packages_window.grab_set()
-                packages_window.attributes('-topmost', True)
-                packages_window.focus_force()
-
-                text_frame = ttk.Frame(packages_window, padding=10)
-                text_frame.pack(fill=tk.BOTH, expand=True)
-
-                text_widget = tk.Text(text_frame, wrap=tk.WORD)
-                scrollbar = ttk.Scrollbar(text_frame, orient=tk.VERTICAL, command=text_widget.yview)
-                text_widget.config(yscrollcommand=scrollbar.set)
-
-                text_widget.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-                scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-
-                text_widget.insert(tk.END, result.stdout)
-                text_widget.config(state=tk.DISABLED)
-            else:
-                messagebox.showerror("Ошибка", f"Не удалось получить список пакетов:\n{result.stderr}")
-
-        except subprocess.TimeoutExpired:
-            messagebox.showerror("Ошибка", "Таймаут при получении списка пакетов")
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Ошибка при получении списка пакетов: {str(e)}")
+        PackagesWindow(self.root, self.engine.packages, interpreter)
 
-    def validate_interpreter(self, interpreter_path):
-        """Проверяет, существует ли интерпретатор и является ли он валидным Python"""
-        if not interpreter_path or not os.path.exists(interpreter_path):
+    def start_script(self, script_uuid):
+        """Запускает скрипт; возвращает True, если процесс создан"""
+        runtime = self.runtimes.get(script_uuid)
+        if runtime is None:
             return False
 
-        # Проверяем, что это исполняемый файл Python
-        filename = os.path.basename(interpreter_path).lower()
-        if not (filename.startswith('python') and filename.endswith('.exe')):
+        try:
+            self.engine.start_script(script_uuid)
+        except ScriptLaunchError as e:
+            messagebox.showerror("Ошибка", str(e))
+            return False
+        except Exception as e:
+            error_msg = f"Не удалось запустить скрипт: {str(e)}"
+            # ИСПРАВЛЕНИЕ: Правильный вызов show_error_dialog
+            self.show_error_dialog(script_uuid, error_msg)
+            # Сбрасываем состояние кнопки при ошибке запуска
+            self.scripts_view.update_script(script_uuid)
+            # Обновляем статус в дереве при ошибке
+            self.update_saved_tree(script_uuid)
             return False
 
         return True
 
-    def start_script(self, script_uuid):
-        for script_data in self.script_frames:
-            if script_data['script_uuid'] == script_uuid:
-                script_info = script_data['script_info']
-                try:
-                    if not os.path.exists(script_info['path']):
-                        messagebox.showerror("Ошибка", f"Файл {script_info['path']} не найден")
-                        return
-
-                    # ОБНОВЛЕНО: Проверяем интерпретатор
-                    interpreter = script_info['interpreter']
-                    if not interpreter or not os.path.exists(interpreter):
-                        # Пытаемся использовать системный Python
-                        system_python = find_system_python()
-                        if system_python and os.path.exists(system_python):
-                            interpreter = system_python
-                            script_info['interpreter'] = interpreter  # Обновляем настройки скрипта
-                        else:
-                            messagebox.showerror("Ошибка", f"Интерпретатор Python не найден: {interpreter}")
-                            return
-
-                    # Запускаем процесс с правильной кодировкой
-                    script_data['process'] = subprocess.Popen([
-                        interpreter,
-                        script_info['path']
-                    ],
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        stdin=subprocess.PIPE,
-                        bufsize=0,
-                        universal_newlines=False)
-
-                    # ... остальной код без изменений ...
-
-                    script_data['pid'] = script_data['process'].pid
-                    script_data['is_running'] = True
-                    self.update_toggle_button(script_data)
-
-                    # Обновляем статус в дереве
-                    self.update_saved_tree()
-
-                    # Инициализируем буфер вывода для этого процесса
-                    self.process_output_buffers[script_uuid] = ""
-
-                    # Запускаем мониторинг вывода в отдельном потоке
-                    threading.Thread(target=self.monitor_script_output,
-                                     args=(script_data,), daemon=True).start()
-
-                    # Инициализация отслеживания CPU
-                    try:
-                        process = psutil.Process(script_data['pid'])
-                        cpu_times = process.cpu_times()
-                        script_data['last_cpu_times'] = (cpu_times.user, cpu_times.system)
-                        script_data['last_check_time'] = time.time()
-                    except:
-                        pass
-
-                except Exception as e:
-                    error_msg = f"Не удалось запустить скрипт: {str(e)}"
-                    # ИСПРАВЛЕНИЕ: Правильный вызов show_error_dialog
-                    self.show_error_dialog(script_uuid, error_msg)
-                    # Сбрасываем состояние кнопки при ошибке запуска
-                    script_data['is_running'] = False
-                    self.update_toggle_button(script_data)
-                    # Обновляем статус в дереве при ошибке
-                    self.update_saved_tree()
-                break
-
-    def monitor_script_output(self, script_data):
-        """Мониторинг вывода скрипта для перехвата ошибок и вывода в консоль"""
-        process = script_data['process']
-        script_uuid = script_data['script_uuid']
-        script_info = script_data['script_info']
-
-        # Обновляем время для корректного расчета CPU
-        script_data['last_check_time'] = time.time()
-
-        # Функция для проверки, существует ли еще скрипт
-        def script_still_exists():
-            return any(sd for sd in self.script_frames if sd['script_uuid'] == script_uuid)
-
-        # Функция для безопасного добавления текста в консоль
-        def safe_append_text(text, console):
-            if console and console.winfo_exists() and script_still_exists():
-                console.after(0, lambda: console.append_text(text))
-
-        # Функция для декодирования байтов с обработкой ошибок
-        def decode_bytes(byte_data):
-            try:
-                return byte_data.decode('utf-8')
-            except UnicodeDecodeError:
-                try:
-                    # Пробуем другие распространенные кодировки
-                    return byte_data.decode('cp1251')
-                except UnicodeDecodeError:
-                    try:
-                        return byte_data.decode('cp866')
-                    except UnicodeDecodeError:
-                        # Если все кодировки не подходят, заменяем нечитаемые символы
-                        return byte_data.decode('utf-8', errors='replace')
-
-        # Читаем stdout и stderr в реальном времени
-        def read_stream(stream, is_stderr=False):
-            while script_still_exists() and script_data['is_running'] and process.poll() is None:
-                try:
-                    # Читаем байты вместо текста
-                    raw_line = stream.readline()
-                    if raw_line:
-                        # Декодируем с правильной кодировкой
-                        decoded_line = decode_bytes(raw_line)
-
-                        # УБРАНО: Добавление префикса "ERROR: " для stderr
-                        output_line = decoded_line  # Теперь и stderr и stdout выводятся как есть
-
-                        # Сохраняем в буфер
-                        if script_uuid in self.process_output_buffers:
-                            self.process_output_buffers[script_uuid] += output_line
-                        else:
-                            self.process_output_buffers[script_uuid] = output_line
-
-                        # Отправляем в открытую консоль
-                        if script_uuid in self.open_consoles:
-                            console = self.open_consoles[script_uuid]
-                            safe_append_text(output_line, console)
-                    else:
-                        # Если строка пустая, возможно процесс завершился
-                        time.sleep(0.1)
-                except Exception as e:
-                    if script_still_exists():
-                        print(f"Ошибка чтения {'stderr' if is_stderr else 'stdout'}: {e}")
-                    break
+    def stop_script(self, script_uuid):
+        # Ожидание завершения (и kill по истечении срока) идёт в фоне
+        self.engine.stop_script(script_uuid)
 
-        # Запускаем потоки для чтения stdout и stderr
-        stdout_thread = threading.Thread(target=read_stream, args=(process.stdout, False), daemon=True)
-        stderr_thread = threading.Thread(target=read_stream, args=(process.stderr, True), daemon=True)
+    def open_search(self, script_uuid=None):
+        """Открывает поиск по выводу скриптов (по умолчанию - по всем)"""
+        OutputSearchDialog(self.root, self, script_uuid, self.current_theme)
 
-        stdout_thread.start()
-        stderr_thread.start()
+    def show_output_line(self, script_uuid, line):
+        """Открывает консоль запущенного скрипта на строке вывода; False, если скрипт не запущен"""
+        runtime = self.runtimes.get(script_uuid)
+        if runtime is None or not runtime.is_running:
+            return False
+        self.open_console(script_uuid)
+        console = self.open_consoles.get(script_uuid)
+        if console is None:
+            return False
+        console.go_to_line(line)
+        return True
 
-        # Ждем завершения процесса
-        process.wait()
+    def call_in_ui(self, callback, *args):
+        """Выполняет callback в потоке интерфейса (события движка приходят из фоновых потоков)"""
+        try:
+            self.root.after(0, callback, *args)
+        except (RuntimeError, tk.TclError):
+            # Окно уже закрыто
+            pass
 
-        # Читаем оставшиеся данные после завершения, только если скрипт еще существует
-        if script_still_exists():
+    def refresh_script_state(self, script_uuid):
+        """Обновляет кнопки, метрики и строку дерева после запуска или остановки скрипта"""
+        runtime = self.runtimes.get(script_uuid)
+        if runtime is not None and script_uuid not in self.scripts_view:
+            # Скрипт активирован не из окна (например, через API) - добавляем его в панель
+            self.scripts_view.sync()
+            self.update_saved_tree()
+            self.save_scripts()
+        if runtime is not None:
+            if not runtime.is_running:
+                self.reset_script_metrics(runtime)
+            self.scripts_view.update_script(script_uuid)
+        self.update_saved_tree(script_uuid)
+
+        # Открытая консоль переключается на новый запуск
+        console = self.open_consoles.get(script_uuid)
+        if console is not None and runtime is not None and runtime.process is not None \
+                and console.process is not runtime.process:
             try:
-                remaining_stdout, remaining_stderr = process.communicate(timeout=2)
-
-                if remaining_stdout:
-                    decoded_stdout = decode_bytes(remaining_stdout)
-                    if script_uuid in self.process_output_buffers:
-                        self.process_output_buffers[script_uuid] += decoded_stdout
-                    else:
-                        self.process_output_buffers[script_uuid] = decoded_stdout
-
-                    if script_uuid in self.open_consoles:
-                        console = self.open_consoles[script_uuid]
-                        safe_append_text(decoded_stdout, console)
-
-                if remaining_stderr:
-                    decoded_stderr = decode_bytes(remaining_stderr)
-                    # УБРАНО: Добавление префикса "ERROR: " для stderr
-                    error_output = decoded_stderr
-                    if script_uuid in self.process_output_buffers:
-                        self.process_output_buffers[script_uuid] += error_output
-                    else:
-                        self.process_output_buffers[script_uuid] = error_output
-
-                    if script_uuid in self.open_consoles:
-                        console = self.open_consoles[script_uuid]
-                        safe_append_text(error_output, console)
-
-            except subprocess.TimeoutExpired:
-                pass
+                console.attach(runtime.process, self.engine.output_source(script_uuid))
+            except tk.TclError:
+                del self.open_consoles[script_uuid]
 
-            # Обновляем состояние после завершения процесса, только если скрипт еще существует
-            if script_still_exists():
-                script_data['is_running'] = False
-                script_data['process'] = None
-                script_data['pid'] = None
-                self.root.after(0, lambda: self.update_toggle_button(script_data))
-
-                # Если процесс завершился с ошибкой, показываем диалог
-                if process.returncode != 0:
-                    error_output = self.process_output_buffers.get(script_uuid, "")
-                    if error_output:  # Показываем диалог если есть любой вывод ошибки
-                        self.root.after(0, lambda: self.show_error_dialog(
-                            script_uuid,
-                            f"Скрипт завершился с ошибкой (код возврата: {process.returncode})\n\n{error_output}"
-                        ))
-
-    def stop_script(self, script_uuid):
-        for script_data in self.script_frames:
-            if script_data['script_uuid'] == script_uuid and script_data['process']:
-                try:
-                    script_data['process'].terminate()
-                    script_data['process'].wait(timeout=5)
-                except:
-                    try:
-                        script_data['process'].kill()
-                    except:
-                        pass
-                finally:
-                    script_data['process'] = None
-                    script_data['pid'] = None
-                    script_data['is_running'] = False
-
-                    # Безопасное обновление интерфейса
-                    if script_data['frame'].winfo_exists():
-                        script_data['cpu_var'].set(0)
-                        script_data['memory_var'].set(0)
-                        script_data['cpu_label'].config(text="0%")
-                        script_data['memory_label'].config(text="0%")
-                        self.update_toggle_button(script_data)
-
-                    # Обновляем статус в дереве
-                    self.update_saved_tree()
-                break
+    def reset_script_metrics(self, runtime):
+        """Обнуляет показатели ресурсов скрипта (панель применит их при следующем обновлении)"""
+        runtime.cpu = 0.0
+        runtime.memory = 0.0
+        runtime.children = ()
 
     def start_monitoring(self):
+        # Метрики собираются в фоновом потоке движка, здесь только применяется готовый снимок
+        self.engine.start_monitoring()
+        sampler = self.engine.resource_sampler
+
         def monitor():
             # ПРОВЕРЯЕМ ВКЛЮЧЕН ЛИ МОНИТОРИНГ
-            if not self.settings.get('performance_monitoring', True):
+            monitoring_enabled = self.settings.get('performance_monitoring', True)
+            sampler.enabled = monitoring_enabled
+
+            if not monitoring_enabled:
                 # Если мониторинг отключен, обнуляем все показатели
                 self.total_cpu_var.set(0)
                 self.total_memory_var.set(0)
                 self.total_cpu_label.config(text="0%")
                 self.total_memory_label.config(text="0%")
 
-                for script_data in self.script_frames[:]:
-                    if script_data['frame'].winfo_exists():
-                        script_data['cpu_var'].set(0)
-                        script_data['memory_var'].set(0)
-                        script_data['cpu_label'].config(text="0%")
-                        script_data['memory_label'].config(text="0%")
+                for runtime in self.runtimes:
+                    self.reset_script_metrics(runtime)
+                self.scripts_view.update_metrics()
 
                 # Планируем следующую проверку (на случай если мониторинг включат)
                 self.root.after(1000, monitor)
                 return
 
-            total_cpu = 0
+            snapshot = sampler.snapshot
             total_memory = 0
 
-            # Получаем общую загрузку системы (включая нашу программу и все процессы)
-            system_cpu = psutil.cpu_percent(interval=0.1)
-
-            # Мониторинг индивидуальных скриптов
-            for script_data in self.script_frames[:]:
-                # Проверяем, существует ли еще фрейм
-                if not script_data['frame'].winfo_exists():
-                    continue
-
-                if script_data['is_running'] and script_data['pid']:
-                    try:
-                        process = psutil.Process(script_data['pid'])
-
-                        # Правильный расчет CPU использования для процесса
-                        cpu_usage = process.cpu_percent(interval=0.1)
-
-                        # Использование памяти
-                        memory_usage = process.memory_percent()
-
-                        # Обновляем интерфейс
-                        script_data['cpu_var'].set(int(cpu_usage))
-                        script_data['memory_var'].set(int(memory_usage))
-                        script_data['cpu_label'].config(text=f"{cpu_usage:.1f}%")
-                        script_data['memory_label'].config(text=f"{memory_usage:.1f}%")
-
-                        total_cpu += cpu_usage
-                        total_memory += memory_usage
-
-                    except (psutil.NoSuchProcess, psutil.AccessDenied):
-                        script_data['is_running'] = False
-                        script_data['process'] = None
-                        script_data['cpu_var'].set(0)
-                        script_data['memory_var'].set(0)
-                        script_data['cpu_label'].config(text="0%")
-                        script_data['memory_label'].config(text="0%")
-                else:
-                    script_data['cpu_var'].set(0)
-                    script_data['memory_var'].set(0)
-                    script_data['cpu_label'].config(text="0%")
-                    script_data['memory_label'].config(text="0%")
+            # Запоминаем метрики всех скриптов из снимка; виджеты обновляются только для видимых строк
+            for runtime in self.runtimes:
+                metrics = snapshot.scripts.get(runtime.script_uuid)
+                # Снимок мог быть снят для предыдущего запуска скрипта
+                if (runtime.is_running and runtime.pid
+                        and metrics and metrics.pid == runtime.pid):
+                    if metrics.alive:
+                        runtime.cpu = metrics.cpu
+                        runtime.memory = metrics.memory
+                        runtime.children = metrics.children
+                        total_memory += metrics.memory
+                    else:
+                        # Процесс уже завершился, но состояние меняет обработчик выхода движка:
+                        # он сохранит код возврата и покажет отчёт об ошибке. Здесь только сбрасываем метрики
+                        self.reset_script_metrics(runtime)
+                elif not runtime.is_running:
+                    self.reset_script_metrics(runtime)
+            self.scripts_view.update_metrics()
 
             # Общая нагрузка (системная + все субпроцессы)
             # Ограничиваем максимальное значение 100%
-            total_cpu = min(system_cpu, 100)
+            total_cpu = min(snapshot.system_cpu, 100)
             total_memory = min(total_memory, 100)
 
             self.total_cpu_var.set(int(total_cpu))
@@ -1954,7 +2785,6 @@ class ScriptManagerTkinter:
         # Запускаем мониторинг
         self.root.after(1000, monitor)
 
-
 if __name__ == "__main__":
     root = tk.Tk()
     app = ScriptManagerTkinter(root)
@@ -0,0 +1,44 @@
+"""
+Python Script Manager (PSM): движок управления скриптами, не зависящий от графического интерфейса.
+Окно Tk (main.py) и командная строка (python -m psm) - его клиенты.
+
+Классы пакета загружаются при первом обращении (`psm.SupervisorEngine` импортирует только psm.engine),
+поэтому импорт пакета не тянет за собой psutil, http.server и другие необязательные подсистемы.
+"""
+
+# Имя экспортируемого класса -> модуль пакета, в котором он определён
+_EXPORTS = {
+    'SupervisorEngine': 'engine', 'ScriptRuntime': 'engine', 'RuntimeRegistry': 'engine',
+    'ScriptLaunchError': 'engine',
+    'InterpreterInventory': 'interpreters', 'InterpreterInfo': 'interpreters',
+    'PackageInventory': 'interpreters', 'PackageInfo': 'interpreters',
+    'ResourceSampler': 'monitoring', 'MetricsSnapshot': 'monitoring', 'ScriptMetrics': 'monitoring',
+    'ProcessMetrics': 'monitoring', 'ProcessTree': 'proctree',
+    'OutputBuffer': 'output', 'OutputReactor': 'output', 'StreamDecoder': 'output',
+    'BASE_PATH': 'persistence', 'JsonFileWriter': 'persistence', 'BinaryFileWriter': 'persistence',
+    'MetricsHistory': 'timeseries', 'RingSeries': 'timeseries',
+    'LogStore': 'logstore', 'ScriptLog': 'logstore',
+    'OutputSearch': 'search', 'SearchMatch': 'search', 'TrigramIndex': 'search',
+    'TracebackDetector': 'tracebacks',
+    'WarmInterpreterPool': 'pool',
+    'AutostartScheduler': 'scheduling', 'ShutdownCoordinator': 'scheduling',
+    'ControlServer': 'api',
+    'StartupProfile': 'profiling',
+    'AutoPlacer': 'placement',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module 'psm' has no attribute '{name}'")
+    from importlib import import_module
+    value = getattr(import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
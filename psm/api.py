@@ -0,0 +1,405 @@
+"""
+Локальный HTTP API управления скриптами (слушает только 127.0.0.1).
+
+    GET  /scripts[?group=ГРУППА]                  состояние и метрики скриптов каталога
+    GET  /scripts/<uuid>                          состояние одного скрипта
+    GET  /scripts/<uuid>/output?since=N           вывод текущего запуска начиная с абсолютной строки N (JSON)
+    GET  /scripts/<uuid>/output?since=N&follow=1  поток вывода (text/plain, chunked) до отключения клиента
+    GET  /scripts/<uuid>/history?step=S           история метрик с шагом S секунд (1, 10 или 60)
+    POST /start | /stop | /restart                тело {"uuids": [...], "group": "...", "grace": секунды}
+
+Пакетные операции выполняются в потоке клиента движка (SupervisorEngine.call_in_main), как и действия
+из окна: остановка - одним координатором с общим сроком ожидания, завершения которого поток запроса
+ждёт сам, не задерживая клиента. Если в настройках задан api_token, каждый запрос должен содержать
+заголовок "Authorization: Bearer <api_token>".
+
+Защита от запросов со страниц в браузере: заголовок Host должен указывать на этот компьютер
+(иначе это DNS rebinding), а POST принимается только с "Content-Type: application/json" -
+такой запрос с чужой страницы требует предварительного CORS-запроса, который сервер не одобряет.
+"""
+import hmac
+import json
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from .scheduling import SHUTDOWN_GRACE_PERIOD
+from .timeseries import HISTORY_FIELDS
+
+# API доступен только с этого компьютера
+API_HOST = "127.0.0.1"
+# Допустимые имена в заголовке Host
+API_ALLOWED_HOSTS = ("127.0.0.1", "localhost", "[::1]")
+API_DEFAULT_PORT = 8765
+
+# Период проверки нового вывода при потоковой передаче (секунды)
+API_STREAM_POLL = 0.2
+
+# Максимальный размер тела запроса (байт)
+API_MAX_BODY = 1024 * 1024
+
+
+class ApiError(Exception):
+    """Ошибка запроса, которая возвращается клиенту с указанным HTTP статусом"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ControlRequestHandler(BaseHTTPRequestHandler):
+    """Разбор HTTP запросов; вся работа выполняется методами ControlServer"""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "PSM"
+    control = None  # ControlServer, задаётся в подклассе при создании сервера
+
+    def log_message(self, format, *args):
+        # Журнал каждого запроса в stderr не нужен
+        pass
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def _dispatch(self, method):
+        try:
+            self._check_host()
+            self._check_token()
+            if method == 'POST':
+                self._check_content_type()
+            url = urlsplit(self.path)
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            parts = [part for part in url.path.split('/') if part]
+
+            if method == 'GET' and parts == ['scripts']:
+                self._send_json(self.control.list_status(query.get('group')))
+            elif method == 'GET' and len(parts) == 2 and parts[0] == 'scripts':
+                self._send_json(self.control.script_status(self._script(parts[1])))
+            elif method == 'GET' and len(parts) == 3 and parts[0] == 'scripts' and parts[2] == 'output':
+                script_uuid = self._script(parts[1])
+                since = self._int_param(query, 'since')
+                if query.get('follow') in ('1', 'true', 'yes'):
+                    self._stream_output(script_uuid, since)
+                else:
+                    self._send_json(self.control.read_output(script_uuid, since))
+            elif method == 'GET' and len(parts) == 3 and parts[0] == 'scripts' and parts[2] == 'history':
+                step = self._int_param(query, 'step')
+                self._send_json(self.control.read_history(self._script(parts[1]), step))
+            elif method == 'POST' and len(parts) == 1 and parts[0] in ControlServer.ACTIONS:
+                self._send_json(self.control.bulk(parts[0], self._read_json()))
+            else:
+                raise ApiError(HTTPStatus.NOT_FOUND, f"Неизвестный запрос: {method} {url.path}")
+        except ApiError as e:
+            # Тело отклонённого запроса могло остаться непрочитанным - соединение дальше не используется
+            self.close_connection = True
+            self._send_json({'error': str(e)}, e.status)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+        except Exception as e:
+            print(f"Ошибка обработки запроса API: {e}")
+            self._send_json({'error': str(e)}, HTTPStatus.INTERNAL_SERVER_ERROR)
+
+    def _check_host(self):
+        host = (self.headers.get('Host') or '').strip().lower()
+        name, _, port = host.rpartition(':') if not host.endswith(']') else (host, '', '')
+        if not name:
+            name, port = host, ''
+        if name not in API_ALLOWED_HOSTS or (port and port != str(self.control.port)):
+            raise ApiError(HTTPStatus.FORBIDDEN, "Запросы принимаются только с адресом этого компьютера в Host")
+
+    def _check_content_type(self):
+        content_type = (self.headers.get('Content-Type') or '').split(';')[0].strip().lower()
+        if content_type != 'application/json':
+            raise ApiError(HTTPStatus.UNSUPPORTED_MEDIA_TYPE, "Тело POST запроса должно иметь тип application/json")
+
+    def _check_token(self):
+        token = self.control.token
+        if not token:
+            return
+        header = self.headers.get('Authorization', '')
+        if not hmac.compare_digest(header.encode('utf-8'), f"Bearer {token}".encode('utf-8')):
+            raise ApiError(HTTPStatus.UNAUTHORIZED, "Неверный или отсутствующий токен API")
+
+    def _script(self, script_uuid):
+        if script_uuid not in self.control.engine.saved_scripts:
+            raise ApiError(HTTPStatus.NOT_FOUND, f"Скрипт не найден: {script_uuid}")
+        return script_uuid
+
+    @staticmethod
+    def _int_param(query, name):
+        value = query.get(name)
+        if value is None:
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"Параметр {name} должен быть целым числом")
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > API_MAX_BODY:
+            raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Слишком большое тело запроса")
+        if not length:
+            return {}
+        try:
+            body = json.loads(self.rfile.read(length))
+        except (ValueError, UnicodeDecodeError):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Тело запроса должно быть JSON объектом")
+        if not isinstance(body, dict):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Тело запроса должно быть JSON объектом")
+        return body
+
+    def _send_json(self, data, status=HTTPStatus.OK):
+        payload = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def _stream_output(self, script_uuid, since):
+        """Передаёт вывод скрипта по мере появления, в том числе после перезапусков"""
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        self.close_connection = True
+
+        for lines in self.control.follow_output(script_uuid, since):
+            text = ''.join(line if line.endswith('\n') else line + '\n' for line in lines)
+            self._write_chunk(text.encode('utf-8'))
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class ControlServer:
+    """
+    Локальный HTTP API поверх SupervisorEngine.
+    Каждый запрос обслуживается в своём потоке; запуск и остановка передаются в поток клиента движка,
+    а повторный запуск уже запущенного скрипта движок пропускает.
+    """
+
+    ACTIONS = ('start', 'stop', 'restart')
+
+    def __init__(self, engine, port=API_DEFAULT_PORT, token=None, host=API_HOST):
+        self.engine = engine
+        self.token = token or None
+        self._closing = threading.Event()
+        handler = type('BoundControlRequestHandler', (ControlRequestHandler,), {'control': self})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="ControlAPI", daemon=True)
+        self._thread.start()
+        print(f"API управления: http://{API_HOST}:{self.port}")
+        return self
+
+    def stop(self):
+        """Останавливает приём запросов и завершает потоковые ответы"""
+        self._closing.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    # --- Состояние ---
+
+    def script_status(self, script_uuid):
+        """Состояние и последние метрики скрипта"""
+        engine = self.engine
+        script_info = engine.saved_scripts[script_uuid]
+        runtime = engine.runtimes.get(script_uuid)
+        output_buffer = engine.process_output_buffers.get(script_uuid)
+        status = {
+            'uuid': script_uuid,
+            'name': engine.script_name(script_uuid),
+            'group': script_info.get('group'),
+            'path': script_info['path'],
+            'interpreter': script_info.get('interpreter'),
+            'active': runtime is not None,
+            'running': False,
+            'pid': None,
+            'returncode': None,
+            'uptime': None,
+            'warm': False,
+            'first_output_latency': None,
+            'output_lines': output_buffer.end_index if output_buffer is not None else 0,
+            'metrics': None
+        }
+        if runtime is None:
+            return status
+
+        pid = runtime.pid
+        status.update({
+            'running': runtime.is_running,
+            'pid': pid,
+            'returncode': runtime.returncode,
+            'warm': runtime.warm,
+            'first_output_latency': runtime.first_output_latency
+        })
+        if runtime.is_running and runtime.started_at is not None:
+            status['uptime'] = round(time.monotonic() - runtime.started_at, 3)
+
+        sampler = engine.resource_sampler
+        if sampler is not None and pid:
+            metrics = sampler.snapshot.scripts.get(script_uuid)
+            if metrics is not None and metrics.pid == pid:
+                # Сумма по дереву процессов скрипта и показатели каждого потомка
+                status['metrics'] = {
+                    'cpu': round(metrics.cpu, 2),
+                    'memory': round(metrics.memory, 2),
+                    'processes': [
+                        {'pid': child.pid, 'name': child.name,
+                         'cpu': round(child.cpu, 2), 'memory': round(child.memory, 2)}
+                        for child in metrics.children
+                    ]
+                }
+        return status
+
+    def list_status(self, group=None):
+        """Состояние всех скриптов каталога (или одной группы) и загрузка системы"""
+        engine = self.engine
+        if group:
+            script_uuids, _ = engine.select_scripts(group=group)
+        else:
+            script_uuids = list(engine.saved_scripts)
+        return {
+            'system_cpu': engine.system_cpu_load(),
+            'scripts': [self.script_status(script_uuid) for script_uuid in script_uuids]
+        }
+
+    def read_history(self, script_uuid, step=None):
+        """История метрик скрипта в одном разрешении: время начала каждой точки и значения полей (null - нет данных)"""
+        history = self.engine.metrics_history
+        if history is None:
+            raise ApiError(HTTPStatus.CONFLICT, "История метрик выключена")
+        steps = {s: capacity for s, capacity in history.resolutions}
+        step = step or min(steps)
+        if step not in steps:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"Шаг истории должен быть одним из: {sorted(steps)}")
+        now = time.time()
+        count = steps[step]
+        result = {
+            'step': step,
+            'start': (int(now // step) - count + 1) * step,
+        }
+        for field in HISTORY_FIELDS:
+            result[field] = history.window(script_uuid, field, step, count, now) or [None] * count
+        return result
+
+    # --- Вывод ---
+
+    def read_output(self, script_uuid, since=None):
+        """Строки текущего запуска с абсолютного номера since; next - номер для следующего запроса"""
+        output_buffer = self.engine.process_output_buffers.get(script_uuid)
+        if output_buffer is None:
+            return {'first': 0, 'next': 0, 'lines': []}
+        end = output_buffer.end_index
+        start = end if since is None else since
+        start = min(max(start, output_buffer.first_index), end)
+        lines = output_buffer.get_lines(start, end)
+        return {
+            'first': output_buffer.first_index,
+            'next': start + len(lines),
+            'lines': lines
+        }
+
+    def follow_output(self, script_uuid, since=None):
+        """
+        Генератор пачек новых строк вывода скрипта.
+        При перезапуске скрипта продолжает с начала буфера нового запуска;
+        заканчивается при остановке сервера или удалении скрипта из каталога.
+        """
+        engine = self.engine
+        output_buffer = None
+        position = since
+        while not self._closing.is_set() and script_uuid in engine.saved_scripts:
+            current = engine.process_output_buffers.get(script_uuid)
+            if current is not output_buffer:
+                if output_buffer is not None:
+                    position = current.first_index if current is not None else None
+                output_buffer = current
+            if output_buffer is not None:
+                end = output_buffer.end_index
+                start = end if position is None else min(max(position, output_buffer.first_index), end)
+                if start < end:
+                    lines = output_buffer.get_lines(start, end)
+                    position = start + len(lines)
+                    yield lines
+                else:
+                    position = start
+            self._closing.wait(API_STREAM_POLL)
+
+    # --- Пакетные операции ---
+
+    def bulk(self, action, request):
+        """Выполняет start/stop/restart над скриптами, выбранными по UUID и/или группе"""
+        script_uuids = request.get('uuids') or []
+        group = request.get('group')
+        if isinstance(script_uuids, str):
+            script_uuids = [script_uuids]
+        if not isinstance(script_uuids, list) or not all(isinstance(u, str) for u in script_uuids):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "uuids должен быть списком строк")
+        if group is not None and not isinstance(group, str):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "group должен быть строкой")
+        if not script_uuids and not group:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Укажите uuids и/или group")
+        try:
+            grace_period = float(request.get('grace', SHUTDOWN_GRACE_PERIOD))
+        except (TypeError, ValueError):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "grace должен быть числом секунд")
+
+        engine = self.engine
+        selected, missing = engine.call_in_main(engine.select_scripts, script_uuids, group)
+        started = time.monotonic()
+        results = {script_uuid: {'ok': False, 'error': "Скрипт не найден"} for script_uuid in missing}
+
+        if action in ('stop', 'restart'):
+            was_running, coordinator = engine.call_in_main(self._stop, selected, grace_period)
+            # Завершения процессов ждёт поток запроса, клиент тем временем продолжает работу
+            coordinator.done.wait()
+            results.update({script_uuid: {'ok': True, 'was_running': running}
+                            for script_uuid, running in was_running.items()})
+        if action in ('start', 'restart'):
+            for script_uuid, result in engine.call_in_main(self._start, selected).items():
+                results[script_uuid] = {**results.get(script_uuid, {}), **result}
+
+        return {
+            'action': action,
+            'elapsed': round(time.monotonic() - started, 3),
+            'results': results
+        }
+
+    def _stop(self, script_uuids, grace_period):
+        """Начинает одновременную остановку скриптов; возвращает (были ли запущены, координатор остановки)"""
+        was_running = {}
+        for script_uuid in script_uuids:
+            runtime = self.engine.runtimes.get(script_uuid)
+            was_running[script_uuid] = runtime is not None and runtime.is_running
+        return was_running, self.engine.stop_scripts(script_uuids, grace_period)
+
+    def _start(self, script_uuids):
+        """Запускает скрипты (в потоке клиента движка); процессы создаются без ожидания их вывода"""
+        return {script_uuid: self._start_one(script_uuid) for script_uuid in script_uuids}
+
+    def _start_one(self, script_uuid):
+        engine = self.engine
+        runtime = engine.runtimes.get(script_uuid)
+        if runtime is not None and runtime.is_running:
+            return {'ok': True, 'pid': runtime.pid, 'already_running': True}
+        try:
+            # Неактивный скрипт сначала становится активным (клиент создаст для него панель)
+            engine.activate(script_uuid)
+            runtime = engine.start_script(script_uuid)
+        except Exception as e:
+            return {'ok': False, 'error': str(e)}
+        return {'ok': True, 'pid': runtime.pid}
@@ -0,0 +1,56 @@
+"""
+Платформенные возможности: поиск интерпретаторов в реестре, автозапуск программы
+при входе в систему и открытие папок. Модули Windows (winreg, winshell, pywin32)
+загружаются только в Windows, а winshell и pywin32 - только при первом обращении к автозапуску.
+"""
+import os
+import sys
+import subprocess
+
+# Имя ярлыка/файла автозапуска программы
+AUTOSTART_NAME = "Python Script Manager (PSM)"
+
+
+class PlatformBackend:
+    """Базовая платформа: реестра нет, автозапуск не поддерживается"""
+
+    name = 'generic'
+    autostart_supported = False
+
+    def find_registered_interpreters(self):
+        """Интерпретаторы, зарегистрированные в системе (реестр Windows)"""
+        return []
+
+    def is_autostart_enabled(self):
+        return False
+
+    def set_autostart(self, enabled):
+        raise NotImplementedError("Автозапуск не поддерживается на этой платформе")
+
+    def open_folder(self, path):
+        # В macOS нет xdg-open, папки открывает Finder через open
+        subprocess.Popen(['open' if sys.platform == 'darwin' else 'xdg-open', path])
+
+    @staticmethod
+    def autostart_command():
+        """Команда запуска программы: (исполняемый файл, аргументы, рабочий каталог)"""
+        if getattr(sys, 'frozen', False):
+            # Если программа собрана в .exe
+            return sys.executable, [], os.path.dirname(sys.executable)
+        # Если запущен как .py скрипт
+        script_path = os.path.abspath(sys.argv[0])
+        return sys.executable, [script_path], os.path.dirname(script_path)
+
+
+def get_backend():
+    """Возвращает реализацию для текущей платформы"""
+    if sys.platform == 'win32':
+        try:
+            from .windows import WindowsBackend
+        except ImportError as e:
+            print(f"Ошибка загрузки модулей Windows: {e}. Автозапуск и поиск в реестре недоступны")
+            return PlatformBackend()
+        return WindowsBackend()
+
+    from .posix import PosixBackend
+    return PosixBackend()
@@ -0,0 +1,48 @@
+"""Linux и другие POSIX-системы: автозапуск через XDG autostart (~/.config/autostart)"""
+import os
+
+from . import AUTOSTART_NAME, PlatformBackend
+
+# Символы, из-за которых аргумент в строке Exec= заключается в кавычки (спецификация Desktop Entry)
+DESKTOP_EXEC_RESERVED = frozenset(' \t\n"\'\\><~|&;$*?#()`')
+
+
+def desktop_exec_quote(arg):
+    """
+    Аргумент для строки Exec= по спецификации Desktop Entry: двойные кавычки, обратная косая черта
+    перед " ` $ \\ внутри них и %% вместо %. Кавычки shlex (одинарные) спецификация не понимает.
+    """
+    if not arg or any(char in DESKTOP_EXEC_RESERVED for char in arg):
+        arg = '"' + ''.join('\\' + char if char in '"`$\\' else char for char in arg) + '"'
+    # Значение ключа - строка, её экранирование применяется поверх кавычек: обратная косая черта удваивается
+    return arg.replace('\\', '\\\\').replace('%', '%%')
+
+
+class PosixBackend(PlatformBackend):
+    name = 'posix'
+    autostart_supported = True
+
+    @staticmethod
+    def _desktop_file_path():
+        config_home = os.environ.get('XDG_CONFIG_HOME') or os.path.join(os.path.expanduser('~'), '.config')
+        return os.path.join(config_home, 'autostart', 'psm.desktop')
+
+    def is_autostart_enabled(self):
+        return os.path.exists(self._desktop_file_path())
+
+    def set_autostart(self, enabled):
+        desktop_path = self._desktop_file_path()
+        if not enabled:
+            if os.path.exists(desktop_path):
+                os.remove(desktop_path)
+            return
+
+        target_path, args, working_dir = self.autostart_command()
+        os.makedirs(os.path.dirname(desktop_path), exist_ok=True)
+        with open(desktop_path, 'w', encoding='utf-8') as f:
+            f.write("[Desktop Entry]\n"
+                    "Type=Application\n"
+                    f"Name={AUTOSTART_NAME}\n"
+                    f"Exec={' '.join(desktop_exec_quote(arg) for arg in [target_path, *args])}\n"
+                    f"Path={working_dir}\n"
+                    "X-GNOME-Autostart-enabled=true\n")
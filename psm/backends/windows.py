@@ -0,0 +1,79 @@
+"""
+Windows: интерпретаторы из реестра и ярлык автозапуска в папке автозагрузки.
+winshell и pywin32 загружаются при первом обращении к автозапуску: их импорт
+занимает заметное время и не нужен до показа окна.
+"""
+import os
+import winreg
+
+from . import AUTOSTART_NAME, PlatformBackend
+
+
+class WindowsBackend(PlatformBackend):
+    name = 'windows'
+    autostart_supported = True
+
+    def find_registered_interpreters(self):
+        paths = []
+        registry_paths = [
+            (winreg.HKEY_CURRENT_USER, r"Software\Python\PythonCore"),
+            (winreg.HKEY_LOCAL_MACHINE, r"Software\Python\PythonCore"),
+            (winreg.HKEY_LOCAL_MACHINE, r"Software\Wow6432Node\Python\PythonCore")
+        ]
+        for hive, path in registry_paths:
+            try:
+                with winreg.OpenKey(hive, path) as key:
+                    i = 0
+                    while True:
+                        try:
+                            version = winreg.EnumKey(key, i)
+                        except OSError:
+                            break
+                        i += 1
+                        try:
+                            with winreg.OpenKey(hive, f"{path}\\{version}\\InstallPath") as install_key:
+                                install_path, _ = winreg.QueryValueEx(install_key, "")
+                        except OSError:
+                            continue
+                        python_exe = os.path.join(install_path, "python.exe")
+                        if os.path.isfile(python_exe):
+                            paths.append(python_exe)
+            except OSError:
+                pass
+        return paths
+
+    @staticmethod
+    def _shortcut_path():
+        import winshell
+        return os.path.join(winshell.startup(), f"{AUTOSTART_NAME}.lnk")
+
+    def is_autostart_enabled(self):
+        try:
+            return os.path.exists(self._shortcut_path())
+        except ImportError as e:
+            print(f"Ошибка загрузки модулей Windows: {e}. Состояние автозапуска неизвестно")
+            return False
+
+    def set_autostart(self, enabled):
+        shortcut_path = self._shortcut_path()
+        if not enabled:
+            # Удаляем ярлык из автозагрузки
+            if os.path.exists(shortcut_path):
+                os.remove(shortcut_path)
+            return
+
+        from win32com.client import Dispatch
+
+        target_path, args, working_dir = self.autostart_command()
+        shell = Dispatch('WScript.Shell')
+        shortcut = shell.CreateShortCut(shortcut_path)
+        shortcut.Targetpath = target_path
+        if args:
+            shortcut.Arguments = " ".join(f'"{arg}"' for arg in args)
+        shortcut.WorkingDirectory = working_dir
+        shortcut.IconLocation = target_path
+        shortcut.save()
+
+    def open_folder(self, path):
+        # Открываем папку в проводнике Windows
+        os.startfile(path)
@@ -0,0 +1,195 @@
+"""
+Командная строка PSM и работа без графического интерфейса.
+
+    python -m psm list                      список скриптов каталога
+    python -m psm run [СКРИПТ ...]          запуск скриптов с автозапуском (и указанных) без окна
+    python -m psm run --api ПОРТ            то же с локальным HTTP API управления (см. psm.api)
+    python -m psm interpreters [--refresh]  найденные интерпретаторы Python
+    python -m psm packages [ИНТЕРПРЕТАТОР]  установленные пакеты
+
+Скрипт можно указать по UUID, началу UUID или отображаемому имени.
+"""
+import argparse
+import queue
+import signal
+import sys
+import threading
+import time
+
+from .engine import SupervisorEngine, timer_schedule
+from .persistence import BASE_PATH
+
+
+def resolve_script(engine, ref):
+    """Находит UUID скрипта по UUID, его началу или отображаемому имени"""
+    if ref in engine.saved_scripts:
+        return ref
+    matches = [script_uuid for script_uuid, script_info in engine.saved_scripts.items()
+               if script_uuid.startswith(ref) or engine.script_name(script_uuid) == ref]
+    if len(matches) != 1:
+        raise SystemExit(f"Скрипт не найден или указан неоднозначно: {ref}")
+    return matches[0]
+
+
+def cmd_list(engine, args):
+    engine.load_scripts()
+    for script_uuid, script_info in engine.saved_scripts.items():
+        autostart = "автозапуск" if script_info.get('autostart', False) else "-"
+        group = script_info.get('group') or "-"
+        print(f"{script_uuid}  {autostart:<10}  {group:<12}  {engine.script_name(script_uuid)}  {script_info['path']}")
+    return 0
+
+
+def cmd_run(engine, args):
+    print_lock = threading.Lock()
+
+    def emit(text):
+        with print_lock:
+            sys.stdout.write(text)
+            sys.stdout.flush()
+
+    def on_output(script_uuid, line):
+        if not line.endswith('\n'):
+            line += '\n'
+        emit(f"[{engine.script_name(script_uuid)}] {line}")
+
+    def on_state_change(script_uuid):
+        runtime = engine.runtimes.get(script_uuid)
+        if runtime is None:
+            return
+        if runtime.is_running:
+            emit(f"* '{engine.script_name(script_uuid)}' запущен (PID {runtime.pid})\n")
+        elif runtime.returncode is not None:
+            emit(f"* '{engine.script_name(script_uuid)}' завершился с кодом {runtime.returncode}\n")
+
+    engine.on_output = on_output
+    engine.on_state_change = on_state_change
+    # Запуск и остановка (из API и по таймерам автозапуска) выполняются в главном потоке по очереди
+    jobs = queue.Queue()
+    engine.dispatch_fn = jobs.put
+    engine.schedule_fn = lambda delay_ms, callback: timer_schedule(delay_ms, lambda: jobs.put(callback))
+
+    scripts_to_start = engine.load_scripts()
+    requested = [resolve_script(engine, ref) for ref in args.scripts]
+    engine.refresh_interpreters()
+    engine.configure_warm_pool()
+    # Локальный API: порт из командной строки или из настроек
+    try:
+        if args.api:
+            from .api import ControlServer
+            engine.control_server = ControlServer(engine, args.api, engine.settings.get('api_token')).start()
+        else:
+            engine.configure_control_api()
+    except OSError as e:
+        print(f"Не удалось запустить API управления: {e}", file=sys.stderr)
+        return 1
+    if args.metrics or engine.control_server is not None:
+        engine.start_monitoring()
+    engine.configure_placement()
+    engine.configure_log_store()
+
+    stop_event = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop_event.set())
+
+    for script_uuid in requested:
+        engine.activate(script_uuid)
+        engine.try_start(script_uuid)
+    if not args.no_autostart:
+        engine.schedule_autostart([s for s in scripts_to_start if s not in requested])
+
+    next_report = time.monotonic() + (args.metrics or 0)
+    while not stop_event.is_set():
+        try:
+            jobs.get(timeout=0.2)()
+        except queue.Empty:
+            pass
+        except Exception as e:
+            print(f"Ошибка выполнения задачи: {e}", file=sys.stderr)
+        if args.metrics and time.monotonic() >= next_report:
+            next_report = time.monotonic() + args.metrics
+            snapshot = engine.resource_sampler.snapshot
+            for runtime in engine.runtimes.running():
+                metrics = snapshot.scripts.get(runtime.script_uuid)
+                if metrics and metrics.pid == runtime.pid:
+                    emit(f"* '{engine.script_name(runtime.script_uuid)}': "
+                         f"CPU {metrics.cpu:.1f}%, память {metrics.memory:.1f}%, "
+                         f"процессов {1 + len(metrics.children)}\n")
+                    for child in metrics.children:
+                        emit(f"    {child.pid} {child.name}: CPU {child.cpu:.1f}%, память {child.memory:.1f}%\n")
+
+    emit("* Остановка скриптов...\n")
+    engine.stop_control_api()
+    coordinator = engine.stop_all()
+    coordinator.done.wait()
+    emit(f"* Остановлено скриптов: {coordinator.total}, из них принудительно: {coordinator.killed}\n")
+    return 0
+
+
+def cmd_interpreters(engine, args):
+    engine.load_scripts()
+    found = engine.interpreters.interpreters()
+    if args.refresh or not found:
+        # Поиск с окружениями рядом со скриптами каталога; дожидаемся его завершения
+        engine.refresh_interpreters()
+        engine.interpreters.refresh(wait=True)
+        found = engine.interpreters.interpreters()
+    for info in found:
+        venv = " venv" if info.venv else ""
+        print(f"{info.version:<8} {info.abi:<12} {info.bits}-bit{venv}  {info.path}  ({', '.join(info.sources)})")
+    return 0
+
+
+def cmd_packages(engine, args):
+    interpreter = args.interpreter or engine.settings.get('default_interpreter') or engine.interpreters.default()
+    packages = engine.packages.get_cached(interpreter)
+    if packages is None:
+        try:
+            packages = engine.packages.scan(interpreter)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 1
+
+    query = (args.search or "").lower()
+    for package in packages:
+        if query in package.name.lower() or query in package.summary.lower():
+            print(f"{package.name:<30} {package.version:<15} {package.summary}")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="psm", description="Python Script Manager (PSM) без графического интерфейса")
+    parser.add_argument("--data-dir", default=BASE_PATH,
+                        help="каталог с scripts.json и settings.json (по умолчанию - каталог программы)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("list", help="список скриптов каталога").set_defaults(handler=cmd_list)
+
+    run_parser = commands.add_parser("run", help="запустить скрипты и работать до Ctrl+C / SIGTERM")
+    run_parser.add_argument("scripts", nargs="*", help="дополнительно запустить эти скрипты")
+    run_parser.add_argument("--no-autostart", action="store_true", help="не запускать скрипты с автозапуском")
+    run_parser.add_argument("--metrics", type=float, default=0, metavar="СЕКУНДЫ",
+                            help="собирать метрики CPU и памяти и печатать их с этим периодом")
+    run_parser.add_argument("--api", type=int, metavar="ПОРТ",
+                            help="включить локальный HTTP API управления на этом порту (только 127.0.0.1)")
+    run_parser.set_defaults(handler=cmd_run)
+
+    interpreters_parser = commands.add_parser("interpreters", help="найденные интерпретаторы Python")
+    interpreters_parser.add_argument("--refresh", action="store_true", help="выполнить поиск заново")
+    interpreters_parser.set_defaults(handler=cmd_interpreters)
+
+    packages_parser = commands.add_parser("packages", help="пакеты, установленные в интерпретаторе")
+    packages_parser.add_argument("interpreter", nargs="?", help="по умолчанию - интерпретатор из настроек")
+    packages_parser.add_argument("--search", help="показать только пакеты с этой подстрокой")
+    packages_parser.set_defaults(handler=cmd_packages)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    engine = SupervisorEngine(args.data_dir)
+    engine.load_settings()
+    try:
+        return args.handler(engine, args)
+    finally:
+        engine.close()
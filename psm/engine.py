@@ -0,0 +1,879 @@
+"""
+Движок управления скриптами без графического интерфейса: каталог и настройки, запуск и остановка
+процессов, перехват вывода, метрики, автозапуск. Окно Tk и командная строка - клиенты этого движка.
+Необязательные подсистемы (метрики через psutil, пул интерпретаторов, HTTP API) импортируются
+при первом включении, чтобы не замедлять запуск программы.
+"""
+import os
+import json
+import subprocess
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from .backends import get_backend
+from .interpreters import InterpreterInventory, PackageInventory, INTERPRETER_CACHE_FILE, PACKAGE_CACHE_FILE
+from .output import OutputBuffer, OutputReactor, StreamDecoder, DEFAULT_OUTPUT_MAX_LINES, DEFAULT_OUTPUT_MAX_BYTES
+from .persistence import BASE_PATH, JsonFileWriter, quarantine_corrupt_file
+from .proctree import PROCESS_GROUP_OPTIONS, ProcessTree, process_children_map
+from .tracebacks import TracebackDetector
+from .scheduling import (AutostartScheduler, ShutdownCoordinator,
+                         AUTOSTART_MAX_CONCURRENT, AUTOSTART_CPU_THRESHOLD, SHUTDOWN_GRACE_PERIOD)
+
+SCRIPTS_FILE = "scripts.json"
+SETTINGS_FILE = "settings.json"
+
+# Пауза между загрузкой каталога и началом автозапуска скриптов (мс)
+AUTOSTART_INITIAL_DELAY_MS = 1000
+# Сколько фоновый поток ждёт выполнения операции в потоке клиента (секунды)
+CALL_IN_MAIN_TIMEOUT = 60.0
+
+
+class ScriptLaunchError(Exception):
+    """Скрипт нельзя запустить: нет файла скрипта или интерпретатора"""
+
+
+class ScriptRuntime:
+    """Состояние выполнения одного активного скрипта"""
+
+    __slots__ = (
+        'script_uuid', 'script_info', 'process', 'pid', 'is_running', 'returncode',
+        'started_at', 'first_output_latency', 'warm'
+    )
+
+    def __init__(self, script_uuid, script_info):
+        self.script_uuid = script_uuid
+        self.script_info = script_info
+        self.process = None
+        self.pid = None
+        self.is_running = False
+        self.returncode = None  # код возврата последнего завершившегося запуска
+        self.started_at = None  # time.monotonic() момента запуска процесса
+        self.first_output_latency = None  # секунды от запуска до первой строки вывода
+        self.warm = False  # запущен в прогретом интерпретаторе из пула
+
+
+class RuntimeRegistry:
+    """
+    Реестр активных скриптов, индексированный по UUID.
+    Поиск, добавление и удаление выполняются за O(1). Проверка `script_uuid in registry`
+    и get() - атомарные операции со словарём, поэтому безопасны из потоков чтения вывода.
+    Перебор идёт по копии списка, так что реестр можно менять во время обхода.
+    """
+
+    def __init__(self):
+        self._runtimes = {}
+
+    def add(self, runtime):
+        self._runtimes[runtime.script_uuid] = runtime
+
+    def get(self, script_uuid):
+        return self._runtimes.get(script_uuid)
+
+    def remove(self, script_uuid):
+        """Удаляет запись и возвращает её (или None)"""
+        return self._runtimes.pop(script_uuid, None)
+
+    def clear(self):
+        self._runtimes.clear()
+
+    def running(self):
+        """Список запущенных скриптов"""
+        return [runtime for runtime in list(self._runtimes.values()) if runtime.is_running]
+
+    def __contains__(self, script_uuid):
+        return script_uuid in self._runtimes
+
+    def __iter__(self):
+        return iter(list(self._runtimes.values()))
+
+    def __len__(self):
+        return len(self._runtimes)
+
+
+def timer_schedule(delay_ms, callback):
+    """Замена root.after для работы без Tk: вызывает callback через delay_ms в отдельном потоке"""
+    timer = threading.Timer(delay_ms / 1000, callback)
+    timer.daemon = True
+    timer.start()
+    return timer
+
+
+class SupervisorEngine:
+    """
+    Управление каталогом скриптов и их процессами без привязки к интерфейсу.
+    Клиент получает события через колбэки, которые могут вызываться из фоновых потоков:
+    on_state_change(script_uuid) - скрипт запущен или остановлен,
+    on_error(script_uuid, message) - скрипт завершился с ошибкой,
+    on_output(script_uuid, line) - новая строка вывода.
+    runtime_factory позволяет клиенту хранить вместе с состоянием скрипта свои данные (например, виджеты).
+    Каталог и состояние скриптов меняются в одном потоке клиента: фоновые потоки (HTTP API) передают
+    туда операции через call_in_main, а dispatch_fn клиента ставит их в его очередь событий.
+    """
+
+    def __init__(self, data_dir=BASE_PATH, runtime_factory=ScriptRuntime, schedule_fn=timer_schedule,
+                 on_state_change=None, on_error=None, on_output=None, backend=None):
+        self.data_dir = data_dir
+        self.runtime_factory = runtime_factory
+        self.schedule_fn = schedule_fn
+        self.on_state_change = on_state_change
+        self.on_error = on_error
+        self.on_output = on_output
+        self.backend = backend or get_backend()
+        # Передача операции в поток клиента: dispatch_fn(job); None - выполнять на месте по очереди
+        self.dispatch_fn = None
+        self.main_thread = threading.current_thread()
+        self._call_lock = threading.RLock()
+        self._script_locks = {}  # script_uuid -> threading.RLock
+
+        self.scripts_file = os.path.join(data_dir, SCRIPTS_FILE)
+        self.settings_file = os.path.join(data_dir, SETTINGS_FILE)
+        self.settings = {}
+        self.saved_scripts = {}  # Все сохраненные скрипты по UUID
+        self.active_scripts = []  # UUID активных скриптов в порядке добавления
+        self.runtimes = RuntimeRegistry()  # Состояние активных скриптов по UUID
+
+        # Отложенная атомарная запись каталога и настроек в фоне
+        self.scripts_writer = JsonFileWriter(self.scripts_file)
+        self.settings_writer = JsonFileWriter(self.settings_file)
+
+        # Найденные интерпретаторы Python с кэшем проверок и списки их пакетов
+        self.interpreters = InterpreterInventory(os.path.join(data_dir, INTERPRETER_CACHE_FILE), self.backend)
+        self.packages = PackageInventory(self.interpreters, os.path.join(data_dir, PACKAGE_CACHE_FILE))
+
+        # Буферы вывода каждого процесса (script_uuid -> OutputBuffer) и общий движок чтения
+        self.process_output_buffers = {}
+        self.output_reactor = OutputReactor()
+        # Журналы вывода на диске (LogStore), если включены
+        self.log_store = None
+        # Трассировки и хвост вывода текущего запуска для отчёта об ошибке (script_uuid -> TracebackDetector)
+        self.crash_detectors = {}
+        self.search_index = None  # триграммный индекс для поиска по журналам (TrigramIndex), если включён
+
+        self.resource_sampler = None
+        self.metrics_history = None  # история метрик скриптов (MetricsHistory), если включена
+        self.auto_placer = None  # автоматическое распределение тяжёлых скриптов по ядрам, если включено
+        self.autostart_scheduler = None
+        self.warm_pool = None
+        self.control_server = None  # локальный HTTP API, если включён
+        self.launch_latency = {}  # script_uuid -> {'cold': секунды, 'warm': секунды} до первого вывода
+
+    def script_name(self, script_uuid):
+        script_info = self.saved_scripts.get(script_uuid)
+        if not script_info:
+            return script_uuid
+        return script_info.get('display_name', script_info['name'])
+
+    def script_lock(self, script_uuid):
+        """Блокировка запуска и остановки одного скрипта"""
+        # setdefault атомарен, поэтому два потока получат одну и ту же блокировку
+        return self._script_locks.setdefault(script_uuid, threading.RLock())
+
+    def call_in_main(self, fn, *args):
+        """
+        Выполняет fn(*args) в потоке клиента и возвращает результат (исключение передаётся вызывающему).
+        Для фоновых потоков: каталог и состояние скриптов клиент перебирает без блокировок.
+        """
+        if self.dispatch_fn is None:
+            with self._call_lock:
+                return fn(*args)
+        if threading.current_thread() is self.main_thread:
+            return fn(*args)
+
+        done = threading.Event()
+        result = {}
+
+        def job():
+            try:
+                result['value'] = fn(*args)
+            except BaseException as e:
+                result['error'] = e
+            finally:
+                done.set()
+
+        self.dispatch_fn(job)
+        if not done.wait(CALL_IN_MAIN_TIMEOUT):
+            raise TimeoutError("Поток управления скриптами не ответил вовремя")
+        if 'error' in result:
+            raise result['error']
+        return result['value']
+
+    def _notify_state(self, script_uuid):
+        if self.on_state_change is not None:
+            self.on_state_change(script_uuid)
+
+    # --- Настройки и каталог ---
+
+    def default_settings(self):
+        return {
+            'theme': 'light',
+            'performance_monitoring': True,
+            'autostart': False,
+            'default_interpreter': self.interpreters.default()  # Ищем системный Python
+        }
+
+    def load_settings(self):
+        """Загружает настройки из JSON файла (словарь settings обновляется на месте)"""
+        try:
+            if os.path.exists(self.settings_file):
+                try:
+                    with open(self.settings_file, 'r', encoding='utf-8') as f:
+                        loaded = json.load(f)
+                except json.JSONDecodeError:
+                    quarantine_corrupt_file(self.settings_file)
+                    raise
+                self.settings.clear()
+                self.settings.update(loaded)
+                self.settings_writer.mark_written(loaded)
+
+                if 'performance_monitoring' not in self.settings:
+                    self.settings['performance_monitoring'] = True
+
+                # Если default_interpreter не установлен, ищем системный Python
+                if not self.settings.get('default_interpreter'):
+                    self.settings['default_interpreter'] = self.interpreters.default()
+                    self.save_settings()
+            else:
+                # При первом запуске используем системный Python
+                self.settings.clear()
+                self.settings.update(self.default_settings())
+                self.save_settings()
+
+        except Exception as e:
+            print(f"Ошибка загрузки настроек: {str(e)}")
+            self.settings.clear()
+            self.settings.update(self.default_settings())
+
+    def sync_autostart(self):
+        """Синхронизирует настройку автозапуска программы с фактическим состоянием в системе"""
+        if not self.backend.autostart_supported:
+            return
+        try:
+            actual_autostart = self.backend.is_autostart_enabled()
+        except Exception as e:
+            print(f"Ошибка проверки автозапуска: {str(e)}")
+            return
+        if self.settings.get('autostart', False) != actual_autostart:
+            self.settings['autostart'] = actual_autostart
+            self.save_settings()
+
+    def save_settings(self):
+        """Планирует сохранение настроек в JSON файл (запись выполняется в фоне)"""
+        self.settings_writer.schedule(dict(self.settings))
+
+    def save_scripts(self):
+        """Планирует сохранение всех скриптов в JSON файл"""
+        try:
+            # Сохраняем информацию о состоянии скриптов (активные/неактивные)
+            scripts_to_save = {}
+            active = set(self.active_scripts)
+            for script_uuid, script_info in self.saved_scripts.items():
+                script_copy = script_info.copy()
+                script_copy['is_active'] = script_uuid in active
+                runtime = self.runtimes.get(script_uuid)
+                if runtime is not None:
+                    script_copy['is_running'] = runtime.is_running
+                    script_copy['pid'] = runtime.pid
+                scripts_to_save[script_uuid] = script_copy
+
+            # Запись выполняется в фоне и объединяется с другими изменениями за PERSIST_DELAY
+            self.scripts_writer.schedule(scripts_to_save)
+        except Exception as e:
+            print(f"Ошибка сохранения скриптов: {str(e)}")
+
+    def load_scripts(self):
+        """Загружает каталог из JSON файла; возвращает UUID скриптов с автозапуском"""
+        if not os.path.exists(self.scripts_file):
+            return []
+        try:
+            try:
+                with open(self.scripts_file, 'r', encoding='utf-8') as f:
+                    loaded_scripts = json.load(f)
+            except json.JSONDecodeError:
+                # Не даём следующему сохранению молча затереть повреждённый каталог
+                quarantine_corrupt_file(self.scripts_file)
+                raise
+        except Exception as e:
+            print(f"Ошибка загрузки скриптов: {str(e)}")
+            return []
+        self.scripts_writer.mark_written(loaded_scripts)
+
+        # Очищаем текущие скрипты
+        for runtime in self.runtimes.running():
+            self.stop_script(runtime.script_uuid)
+        self.saved_scripts.clear()
+        self.active_scripts.clear()
+        self.runtimes.clear()
+
+        scripts_to_start = []
+        for script_uuid, script_info in loaded_scripts.items():
+            self.saved_scripts[script_uuid] = script_info
+
+            # Восстанавливаем активные скрипты; скрипты с автозапуском тоже становятся активными
+            if script_info.get('is_active', False) or script_info.get('autostart', False):
+                self.activate(script_uuid)
+            if script_info.get('autostart', False):
+                scripts_to_start.append(script_uuid)
+        return scripts_to_start
+
+    def select_scripts(self, script_uuids=(), group=None):
+        """
+        Выбирает скрипты каталога по UUID и/или группе.
+        Возвращает (найденные UUID без повторов в порядке указания, не найденные UUID).
+        """
+        selected = []
+        missing = []
+        for script_uuid in script_uuids:
+            if script_uuid in self.saved_scripts:
+                if script_uuid not in selected:
+                    selected.append(script_uuid)
+            else:
+                missing.append(script_uuid)
+        if group:
+            for script_uuid, script_info in list(self.saved_scripts.items()):
+                if script_info.get('group') == group and script_uuid not in selected:
+                    selected.append(script_uuid)
+        return selected, missing
+
+    def add_script(self, script_path, interpreter=None):
+        """Добавляет скрипт в каталог и в активные; возвращает его UUID"""
+        script_name = os.path.basename(script_path).replace('.py', '')
+        script_uuid = str(uuid.uuid4())
+        self.saved_scripts[script_uuid] = {
+            'uuid': script_uuid,
+            'name': script_name,
+            'display_name': script_name,
+            'path': script_path,
+            'interpreter': interpreter or self.settings.get('default_interpreter') or self.interpreters.default(),
+            'autostart': False
+        }
+        self.activate(script_uuid)
+        self.save_scripts()
+        return script_uuid
+
+    def activate(self, script_uuid):
+        """Делает скрипт активным; возвращает его состояние выполнения (или None, если скрипта нет)"""
+        runtime = self.runtimes.get(script_uuid)
+        if runtime is not None:
+            return runtime
+        script_info = self.saved_scripts.get(script_uuid)
+        if not script_info:
+            return None
+
+        runtime = self.runtime_factory(script_uuid, script_info)
+        self.runtimes.add(runtime)
+        if script_uuid not in self.active_scripts:
+            self.active_scripts.append(script_uuid)
+        return runtime
+
+    def deactivate(self, script_uuid):
+        """Останавливает скрипт и убирает его из активных; возвращает удалённое состояние"""
+        self.stop_script(script_uuid)
+        if script_uuid in self.active_scripts:
+            self.active_scripts.remove(script_uuid)
+        return self.runtimes.remove(script_uuid)
+
+    def delete_script(self, script_uuid):
+        """Удаляет скрипт из каталога"""
+        self.deactivate(script_uuid)
+        self.saved_scripts.pop(script_uuid, None)
+        self.process_output_buffers.pop(script_uuid, None)
+        self.crash_detectors.pop(script_uuid, None)
+        if self.metrics_history is not None:
+            self.metrics_history.forget(script_uuid)
+        if self.search_index is not None:
+            self.search_index.forget(script_uuid)
+        if self.log_store is not None:
+            self.log_store.delete(script_uuid)
+        self.save_scripts()
+
+    # --- Интерпретаторы ---
+
+    def validate_interpreter(self, interpreter_path):
+        """Проверяет, существует ли интерпретатор и является ли он валидным Python"""
+        return self.interpreters.is_valid(interpreter_path)
+
+    def refresh_interpreters(self):
+        """Обновляет каталог интерпретаторов в фоне, включая окружения рядом со скриптами"""
+        venv_roots = set()
+        for script_info in self.saved_scripts.values():
+            script_dir = os.path.dirname(script_info['path'])
+            venv_roots.add(script_dir)
+            venv_roots.add(os.path.dirname(script_dir))
+        self.interpreters.refresh(sorted(venv_roots))
+
+    def configure_warm_pool(self):
+        """Создаёт, перенастраивает или останавливает пул прогретых интерпретаторов по настройкам"""
+        from .pool import WarmInterpreterPool, WARM_POOL_SIZE
+
+        if not self.settings.get('warm_pool_enabled', False):
+            if self.warm_pool is not None:
+                self.warm_pool.shutdown()
+                self.warm_pool = None
+            return
+
+        interpreters = {info['interpreter'] for info in self.saved_scripts.values()
+                        if info.get('warm_start', False) and info.get('interpreter')}
+        size = self.settings.get('warm_pool_size', WARM_POOL_SIZE)
+        modules = self.settings.get('warm_pool_modules', [])
+        if self.warm_pool is None:
+            self.warm_pool = WarmInterpreterPool(size, modules)
+        self.warm_pool.configure(interpreters, size, modules)
+
+    def configure_control_api(self):
+        """Запускает, перезапускает или останавливает локальный HTTP API по настройкам (OSError, если порт занят)"""
+        from .api import ControlServer, API_DEFAULT_PORT
+
+        enabled = self.settings.get('api_enabled', False)
+        port = self.settings.get('api_port', API_DEFAULT_PORT)
+        token = self.settings.get('api_token') or None
+        server = self.control_server
+        if server is not None:
+            if enabled and server.port == port and server.token == token:
+                return server
+            self.stop_control_api()
+        if enabled:
+            self.control_server = ControlServer(self, port, token).start()
+        return self.control_server
+
+    def stop_control_api(self):
+        """Останавливает локальный HTTP API (перед остановкой скриптов при выходе)"""
+        server, self.control_server = self.control_server, None
+        if server is not None:
+            server.stop()
+
+    def configure_placement(self):
+        """Запускает или останавливает автоматическое распределение скриптов по ядрам по настройкам"""
+        if not self.settings.get('auto_placement', False):
+            if self.auto_placer is not None:
+                self.auto_placer.stop()
+                self.auto_placer = None
+            return
+        if self.auto_placer is not None:
+            return
+        from .placement import AutoPlacer, affinity_supported
+
+        if not affinity_supported():
+            print("Ошибка распределения скриптов по ядрам: привязка к ядрам не поддерживается на этой платформе")
+            return
+        # Распределение опирается на историю загрузки из потока сбора метрик
+        self.start_monitoring()
+        self.auto_placer = AutoPlacer(self.resource_sampler)
+        self.auto_placer.start()
+        self._update_monitor_targets()
+
+    def configure_log_store(self):
+        """Включает, перенастраивает или выключает журналы вывода на диске по настройкам"""
+        from .logstore import LogStore, LOG_DIR, DEFAULT_LOG_RETENTION_MB, DEFAULT_LOG_RETENTION_DAYS
+
+        if not self.settings.get('log_store_enabled', True):
+            if self.log_store is not None:
+                self.log_store.close()
+                self.log_store = None
+            self.configure_search_index()
+            return
+        retention_mb = self.settings.get('log_retention_mb', DEFAULT_LOG_RETENTION_MB)
+        retention_days = self.settings.get('log_retention_days', DEFAULT_LOG_RETENTION_DAYS)
+        if self.log_store is None:
+            self.log_store = LogStore(os.path.join(self.data_dir, LOG_DIR))
+            self.log_store.retain(set(self.saved_scripts))
+        self.log_store.configure(retention_mb, retention_days)
+        self.configure_search_index()
+
+    def configure_search_index(self):
+        """Запускает или останавливает фоновую индексацию журналов для поиска (нужны журналы на диске)"""
+        if not (self.settings.get('search_index', False) and self.log_store is not None):
+            if self.search_index is not None:
+                self.search_index.stop()
+                self.search_index = None
+            return
+        if self.search_index is not None:
+            return
+        from .search import TrigramIndex
+
+        self.search_index = TrigramIndex(self.output_sources)
+        self.search_index.start()
+
+    def apply_process_settings(self, script_uuid, previous_info=None):
+        """
+        Применяет к запущенному скрипту приоритет, приоритет ввода-вывода и привязку к ядрам.
+        previous_info - настройки до изменения (снятые с тех пор значения сбрасываются). Возвращает список ошибок.
+        """
+        runtime = self.runtimes.get(script_uuid)
+        if runtime is None or not runtime.is_running or not runtime.pid:
+            return []
+        from .placement import apply_process_settings
+
+        errors = apply_process_settings(runtime.pid, runtime.script_info, previous_info)
+        self._update_monitor_targets()
+        return errors
+
+    # --- Запуск и остановка ---
+
+    def start_script(self, script_uuid):
+        """
+        Запускает активный скрипт; при невозможности запуска выбрасывает ScriptLaunchError.
+        Уже запущенный скрипт не запускается второй раз (иначе первый процесс остался бы без присмотра).
+        """
+        with self.script_lock(script_uuid):
+            runtime = self.runtimes.get(script_uuid)
+            if runtime is None:
+                raise ScriptLaunchError(f"Скрипт не активен: {self.script_name(script_uuid)}")
+            if runtime.is_running and runtime.process is not None:
+                return runtime
+            return self._launch(runtime)
+
+    def _launch(self, runtime):
+        script_uuid = runtime.script_uuid
+        script_info = runtime.script_info
+        if not os.path.exists(script_info['path']):
+            raise ScriptLaunchError(f"Файл {script_info['path']} не найден")
+
+        interpreter = script_info['interpreter']
+        if not self.validate_interpreter(interpreter):
+            # Пытаемся использовать системный Python
+            system_python = self.interpreters.default()
+            if system_python and os.path.exists(system_python):
+                interpreter = system_python
+                script_info['interpreter'] = interpreter  # Обновляем настройки скрипта
+            else:
+                raise ScriptLaunchError(f"Интерпретатор Python не найден: {interpreter}")
+
+        # Прогретый интерпретатор из пула, если он включён для скрипта
+        process = None
+        if self.warm_pool is not None and script_info.get('warm_start', False):
+            process = self.warm_pool.acquire(interpreter, script_info['path'])
+        runtime.warm = process is not None
+
+        # Иначе - обычный запуск нового процесса
+        if process is None:
+            process = subprocess.Popen([
+                interpreter,
+                script_info['path']
+            ],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                stdin=subprocess.PIPE,
+                bufsize=0,
+                universal_newlines=False,
+                **PROCESS_GROUP_OPTIONS)
+
+        runtime.process = process
+        runtime.pid = process.pid
+        runtime.started_at = time.monotonic()
+        runtime.first_output_latency = None
+        runtime.returncode = None
+        runtime.is_running = True
+
+        # Приоритет и привязка к ядрам (в том числе для процесса из пула, созданного с настройками по умолчанию)
+        for error in self.apply_process_settings(script_uuid):
+            print(f"Ошибка настройки процесса {self.script_name(script_uuid)}: {error}")
+
+        # Новый буфер вывода для этого запуска; журнал на диске продолжается с отметкой о запуске
+        self.process_output_buffers[script_uuid] = self.create_output_buffer()
+        if self.log_store is not None:
+            script_log = self.log_store.open(script_uuid)
+            script_log.finish_line()
+            script_log.append(f"--- Запуск {datetime.now():%Y-%m-%d %H:%M:%S} ---\n")
+
+        # Подключаем вывод процесса к общему движку чтения
+        self.monitor_script_output(runtime)
+        self._update_monitor_targets()
+        self._notify_state(script_uuid)
+        return runtime
+
+    def try_start(self, script_uuid):
+        """Запускает скрипт, печатая ошибку вместо исключения; возвращает True, если процесс создан"""
+        try:
+            self.start_script(script_uuid)
+            return True
+        except Exception as e:
+            print(f"Не удалось запустить скрипт '{self.script_name(script_uuid)}': {e}")
+            return False
+
+    def stop_script(self, script_uuid, grace_period=SHUTDOWN_GRACE_PERIOD):
+        """Останавливает скрипт со всеми его потомками; ожидание завершения (и kill по истечении срока) идёт в фоне"""
+        runtime = self.runtimes.get(script_uuid)
+        if runtime is None or not runtime.process:
+            return None
+        return ShutdownCoordinator([self.detach_process_tree(runtime)], grace_period).start()
+
+    def stop_scripts(self, script_uuids, grace_period=SHUTDOWN_GRACE_PERIOD):
+        """Останавливает несколько скриптов с общим сроком ожидания; возвращает запущенный координатор"""
+        runtimes = [self.runtimes.get(script_uuid) for script_uuid in script_uuids]
+        runtimes = [runtime for runtime in runtimes if runtime is not None and runtime.process]
+        # Один обход списка процессов системы на все останавливаемые деревья
+        children_map = process_children_map([runtime.pid for runtime in runtimes]) if runtimes else {}
+        processes = [self.detach_process_tree(runtime, children_map) for runtime in runtimes]
+        return ShutdownCoordinator([p for p in processes if p is not None], grace_period).start()
+
+    def stop_all(self, grace_period=SHUTDOWN_GRACE_PERIOD):
+        """Останавливает все скрипты одновременно; возвращает запущенный координатор остановки"""
+        return self.stop_scripts([runtime.script_uuid for runtime in self.runtimes.running()], grace_period)
+
+    def detach_process(self, runtime):
+        """Отвязывает процесс от скрипта и возвращает его; вывод и код выхода этого процесса больше не обрабатываются"""
+        with self.script_lock(runtime.script_uuid):
+            process = runtime.process
+            runtime.process = None
+            runtime.pid = None
+            runtime.is_running = False
+        self._update_monitor_targets()
+        self._notify_state(runtime.script_uuid)
+        return process
+
+    def detach_process_tree(self, runtime, children_map=None):
+        """Отвязывает процесс от скрипта и возвращает его дерево процессов для остановки (или None)"""
+        # Потомки, которых уже видел сбор метрик (в том числе потерявшие родителя), тоже входят в дерево
+        known = {}
+        if self.resource_sampler is not None:
+            metrics = self.resource_sampler.snapshot.scripts.get(runtime.script_uuid)
+            if metrics is not None and metrics.pid == runtime.pid:
+                known = {child.pid: child.create_time for child in metrics.children}
+        process = self.detach_process(runtime)
+        if process is None:
+            return None
+        return ProcessTree(process, known, children_map)
+
+    # --- Вывод ---
+
+    def create_output_buffer(self):
+        """Создаёт буфер вывода с лимитами из настроек"""
+        return OutputBuffer(
+            max_lines=self.settings.get('output_buffer_max_lines', DEFAULT_OUTPUT_MAX_LINES),
+            max_bytes=self.settings.get('output_buffer_max_bytes', DEFAULT_OUTPUT_MAX_BYTES)
+        )
+
+    def append_output(self, script_uuid, text):
+        """Добавляет вывод скрипта в его буфер и журнал на диске"""
+        output_buffer = self.process_output_buffers.get(script_uuid)
+        if output_buffer is None:
+            output_buffer = self.create_output_buffer()
+            self.process_output_buffers[script_uuid] = output_buffer
+        output_buffer.append(text)
+        if self.log_store is not None:
+            self.log_store.open(script_uuid).append(text)
+
+    def output_source(self, script_uuid):
+        """
+        Источник вывода скрипта для консоли: журнал на диске со всеми сохранёнными запусками (ScriptLog)
+        или, если журналы выключены, буфер текущего запуска (OutputBuffer). None, если вывода нет.
+        """
+        if self.log_store is not None:
+            return self.log_store.open(script_uuid)
+        return self.process_output_buffers.get(script_uuid)
+
+    def output_sources(self, script_uuids=None):
+        """Источники вывода скриптов (по умолчанию - всех скриптов каталога): словарь script_uuid -> источник"""
+        if script_uuids is None:
+            script_uuids = list(self.saved_scripts)
+        sources = {}
+        for script_uuid in script_uuids:
+            source = self.output_source(script_uuid)
+            if source is not None:
+                sources[script_uuid] = source
+        return sources
+
+    def search_output(self, query, on_results, on_finished=None, regex=False, ignore_case=True, script_uuids=None):
+        """
+        Запускает фоновый поиск по выводу скриптов (по умолчанию - всех) и возвращает его (OutputSearch).
+        Результаты приходят пачками в on_results из фонового потока; ValueError, если запрос некорректен.
+        """
+        from .search import OutputSearch, compile_query
+
+        pattern = compile_query(query, regex, ignore_case)
+        search = OutputSearch(self.output_sources(script_uuids).items(), pattern, on_results, on_finished,
+                              literal=None if regex else query, index=self.search_index)
+        search.start()
+        return search
+
+    def get_crash_output(self, script_uuid):
+        """Возвращает отчёт об ошибке последнего запуска: последние трассировки и короткий хвост вывода"""
+        crash_detector = self.crash_detectors.get(script_uuid)
+        if crash_detector is None:
+            return ""
+        return crash_detector.report()
+
+    def monitor_script_output(self, runtime):
+        """Подключает вывод скрипта к общему движку чтения для перехвата ошибок и вывода в консоль"""
+        process = runtime.process
+        script_uuid = runtime.script_uuid
+
+        # Функция для проверки, существует ли еще скрипт (O(1), безопасно из потока чтения)
+        def script_still_exists():
+            return self.runtimes.get(script_uuid) is runtime
+
+        # Отдельный декодер на каждый поток: кодировка определяется один раз и закрепляется
+        encoding = runtime.script_info.get('encoding')
+        decoders = {'stdout': StreamDecoder(encoding), 'stderr': StreamDecoder(encoding)}
+
+        # Трассировки распознаются по мере вывода - отчёт об ошибке не требует перечитывать буфер
+        crash_detector = TracebackDetector()
+        self.crash_detectors[script_uuid] = crash_detector
+
+        # stdout и stderr выводятся как есть, без префиксов
+        def on_line(stream_name, raw_line):
+            if not script_still_exists():
+                return
+
+            output_line = decoders[stream_name].decode(raw_line)
+
+            if runtime.first_output_latency is None and runtime.started_at is not None:
+                runtime.first_output_latency = time.monotonic() - runtime.started_at
+                self.report_launch_latency(runtime)
+                if self.autostart_scheduler is not None:
+                    self.autostart_scheduler.notify_first_output(script_uuid)
+
+            # Сохраняем в буфер; открытая консоль сама подхватит новые строки
+            self.append_output(script_uuid, output_line)
+            crash_detector.feed(output_line, stream_name)
+            if self.on_output is not None:
+                self.on_output(script_uuid, output_line)
+
+        def on_exit(returncode):
+            if self.autostart_scheduler is not None:
+                self.autostart_scheduler.notify_exit(script_uuid)
+
+            # Обновляем состояние, только если скрипт еще существует и не был остановлен или перезапущен
+            with self.script_lock(script_uuid):
+                if not script_still_exists() or runtime.process is not process:
+                    return
+
+                runtime.is_running = False
+                runtime.process = None
+                runtime.pid = None
+                runtime.returncode = returncode
+            if self.log_store is not None:
+                self.log_store.open(script_uuid).finish_line()
+            self._update_monitor_targets()
+            self._notify_state(script_uuid)
+
+            # Если процесс завершился с ошибкой, сообщаем клиенту
+            if returncode != 0 and self.on_error is not None:
+                error_output = self.get_crash_output(script_uuid)
+                if error_output:
+                    self.on_error(script_uuid,
+                                  f"Скрипт завершился с ошибкой (код возврата: {returncode})\n\n{error_output}")
+
+        self.output_reactor.register(process, on_line, on_exit)
+
+    def report_launch_latency(self, runtime):
+        """Запоминает время до первого вывода и сравнивает тёплый запуск с холодным"""
+        mode = 'warm' if runtime.warm else 'cold'
+        latency = self.launch_latency.setdefault(runtime.script_uuid, {})
+        latency[mode] = runtime.first_output_latency
+
+        message = f"'{self.script_name(runtime.script_uuid)}': первый вывод через {runtime.first_output_latency:.2f} с"
+        if runtime.warm:
+            message += " (прогретый интерпретатор"
+            if 'cold' in latency:
+                message += f", обычный запуск: {latency['cold']:.2f} с"
+            message += ")"
+        print(message)
+
+    # --- Метрики ---
+
+    def start_monitoring(self):
+        """Запускает фоновый сбор метрик CPU и памяти"""
+        if self.resource_sampler is not None:
+            return
+        from .monitoring import ResourceSampler
+
+        # История метрик продолжается с прошлого запуска программы
+        if self.settings.get('metrics_history', True):
+            from .timeseries import MetricsHistory, HISTORY_FILE
+            self.metrics_history = MetricsHistory(os.path.join(self.data_dir, HISTORY_FILE))
+            self.metrics_history.load()
+            self.metrics_history.retain(set(self.saved_scripts))
+
+        self.resource_sampler = ResourceSampler(history=self.metrics_history)
+        self.resource_sampler.enabled = self.settings.get('performance_monitoring', True)
+        self.resource_sampler.start()
+        self._update_monitor_targets()
+
+    def _update_monitor_targets(self):
+        """Передаёт потоку сбора актуальный список процессов"""
+        if self.resource_sampler is None:
+            return
+        targets = {
+            runtime.script_uuid: runtime.pid
+            for runtime in self.runtimes
+            if runtime.is_running and runtime.pid
+        }
+        self.resource_sampler.set_targets(targets)
+        if self.auto_placer is not None:
+            # Скрипты с явно заданными ядрами автоматически не перемещаются
+            self.auto_placer.set_targets({
+                script_uuid: pid for script_uuid, pid in targets.items()
+                if not self.runtimes.get(script_uuid).script_info.get('cpu_affinity')
+            })
+
+    def system_cpu_load(self):
+        """Последняя измеренная загрузка CPU системы или None, если мониторинг выключен"""
+        if self.resource_sampler is None or not self.settings.get('performance_monitoring', True):
+            return None
+        return self.resource_sampler.snapshot.system_cpu
+
+    # --- Автозапуск ---
+
+    def schedule_autostart(self, script_uuids, start_fn=None, on_finished=None):
+        """
+        Запускает скрипты по приоритету и задержке с ограничением числа одновременных запусков.
+        on_finished() вызывается через schedule_fn, когда все скрипты запущены (или сразу, если запускать нечего).
+        """
+        if not script_uuids:
+            if on_finished is not None:
+                self.schedule_fn(0, on_finished)
+            return None
+        self.autostart_scheduler = AutostartScheduler(
+            start_fn=start_fn or self.try_start,
+            schedule_fn=self.schedule_fn,
+            cpu_load_fn=self.system_cpu_load,
+            name_fn=self.script_name,
+            max_concurrent=self.settings.get('autostart_max_concurrent', AUTOSTART_MAX_CONCURRENT),
+            cpu_threshold=self.settings.get('autostart_cpu_threshold', AUTOSTART_CPU_THRESHOLD),
+            on_finished=on_finished
+        )
+        for script_uuid in script_uuids:
+            script_info = self.saved_scripts[script_uuid]
+            self.autostart_scheduler.add(script_uuid,
+                                         priority=script_info.get('autostart_priority', 0),
+                                         delay=script_info.get('autostart_delay', 0))
+        self.schedule_fn(AUTOSTART_INITIAL_DELAY_MS, self.autostart_scheduler.start)
+        return self.autostart_scheduler
+
+    # --- Завершение ---
+
+    def flush(self):
+        """Сохраняет каталог и настройки и дожидается записи на диск"""
+        self.save_scripts()
+        self.save_settings()
+        self.scripts_writer.flush()
+        self.settings_writer.flush()
+
+    def close(self):
+        """Освобождает фоновые ресурсы движка (процессы скриптов должны быть уже остановлены)"""
+        # Дописываем на диск отложенные изменения
+        self.scripts_writer.flush()
+        self.settings_writer.flush()
+        self.interpreters.writer.flush()
+        self.packages.writer.flush()
+
+        self.stop_control_api()
+
+        if self.auto_placer is not None:
+            self.auto_placer.stop()
+        if self.resource_sampler is not None:
+            self.resource_sampler.stop()
+        if self.metrics_history is not None:
+            self.metrics_history.save()
+            self.metrics_history.writer.flush()
+        if self.search_index is not None:
+            self.search_index.stop()
+        if self.log_store is not None:
+            self.log_store.close()
+
+        # Останавливаем свободные прогретые интерпретаторы
+        if self.warm_pool is not None:
+            self.warm_pool.shutdown()
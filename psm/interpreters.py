@@ -0,0 +1,408 @@
+"""Каталог интерпретаторов Python и списки установленных в них пакетов"""
+import os
+import sys
+import json
+import glob
+import subprocess
+import threading
+from collections import namedtuple
+
+from .backends import PlatformBackend
+from .persistence import JsonFileWriter, quarantine_corrupt_file
+
+
+# Кэш найденных интерпретаторов: результаты проверки хранятся, пока не изменился исполняемый файл
+INTERPRETER_CACHE_FILE = "interpreters.json"
+INTERPRETER_PROBE_TIMEOUT = 10
+INTERPRETER_DISCOVERY_WORKERS = 8
+
+# Имена исполняемых файлов интерпретатора и каталогов виртуальных окружений
+PYTHON_EXE_NAMES = ('python.exe',) if sys.platform == 'win32' else ('python3', 'python')
+VENV_DIR_NAMES = ('.venv', 'venv', 'env')
+VENV_BIN_DIR = 'Scripts' if sys.platform == 'win32' else 'bin'
+
+# Порядок предпочтения источников при выборе интерпретатора по умолчанию
+INTERPRETER_SOURCES = ('registry', 'standard', 'path', 'venv')
+
+# Версия формата записи кэша: при изменении набора полей проверки старые записи перепроверяются
+INTERPRETER_PROBE_VERSION = 3
+
+# Печатает сведения об интерпретаторе одной строкой JSON.
+# Каталоги пакетов берутся из sys.path самого интерпретатора: пользовательский site-packages
+# попадает в список, только если интерпретатор его действительно видит (не venv, не -s/-I)
+INTERPRETER_PROBE = (
+    "import json, os, struct, sys, sysconfig; print(json.dumps({"
+    "'version': '.'.join(map(str, sys.version_info[:3])), "
+    "'implementation': sys.implementation.name, "
+    "'abi': sys.implementation.cache_tag, "
+    "'platform': sysconfig.get_platform(), "
+    "'bits': struct.calcsize('P') * 8, "
+    "'venv': sys.prefix != sys.base_prefix, "
+    "'site_packages': [p for p in sys.path if os.path.basename(p) in ('site-packages', 'dist-packages')]}))"
+)
+
+InterpreterInfo = namedtuple('InterpreterInfo',
+                             'path version implementation abi platform bits venv site_packages sources')
+
+
+class InterpreterInventory:
+    """
+    Каталог интерпретаторов Python.
+    Поиск идёт параллельно по PATH, реестру, стандартным каталогам установки и виртуальным окружениям;
+    каждый найденный интерпретатор запускается один раз для определения версии и ABI.
+    Результаты кэшируются на диске и считаются актуальными, пока не изменились mtime и размер файла,
+    поэтому проверка интерпретатора при запуске скрипта - это поиск в словаре и один stat.
+    """
+
+    def __init__(self, cache_path, backend=None):
+        self.cache_path = cache_path
+        self.backend = backend or PlatformBackend()
+        self.writer = JsonFileWriter(cache_path)
+        self._entries = {}  # нормализованный путь -> запись кэша
+        self._lock = threading.Lock()
+        self._refresh_thread = None
+        self._discovery_done = False  # поиск в этом сеансе завершён (даже если ничего не нашёл)
+        self._load_cache()
+
+    @staticmethod
+    def _key(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    def _load_cache(self):
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except json.JSONDecodeError:
+            quarantine_corrupt_file(self.cache_path)
+            return
+        except OSError as e:
+            print(f"Ошибка загрузки кэша интерпретаторов: {e}")
+            return
+        self._entries = entries
+        self.writer.mark_written(entries)
+
+    def _save_cache(self):
+        with self._lock:
+            entries = {key: dict(entry) for key, entry in self._entries.items()}
+        self.writer.schedule(entries)
+
+    @staticmethod
+    def _stat(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return [st.st_mtime_ns, st.st_size]
+
+    def _probe(self, path, stat):
+        """Запускает интерпретатор и возвращает запись кэша (valid=False, если это не рабочий Python)"""
+        entry = {'path': path, 'stat': stat, 'probe': INTERPRETER_PROBE_VERSION, 'valid': False, 'sources': []}
+        try:
+            result = subprocess.run([path, '-I', '-c', INTERPRETER_PROBE], capture_output=True, text=True,
+                                    timeout=INTERPRETER_PROBE_TIMEOUT,
+                                    creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0))
+            if result.returncode == 0:
+                entry.update(json.loads(result.stdout.strip().splitlines()[-1]))
+                entry['valid'] = True
+        except Exception as e:
+            print(f"Ошибка проверки интерпретатора {path}: {e}")
+        return entry
+
+    def _lookup(self, path, probe=True):
+        """Актуальная запись кэша для пути; при отсутствии или изменении файла интерпретатор проверяется заново"""
+        key = self._key(path)
+        stat = self._stat(path)
+        with self._lock:
+            entry = self._entries.get(key)
+        if stat is None:
+            return None
+        if entry is not None and entry.get('stat') == stat and entry.get('probe') == INTERPRETER_PROBE_VERSION:
+            return entry
+        if not probe:
+            return None
+
+        new_entry = self._probe(path, stat)
+        if entry is not None:
+            new_entry['sources'] = entry.get('sources', [])
+        with self._lock:
+            self._entries[key] = new_entry
+        self._save_cache()
+        return new_entry
+
+    @staticmethod
+    def _to_info(entry):
+        return InterpreterInfo(entry['path'], entry['version'], entry['implementation'], entry['abi'],
+                               entry['platform'], entry['bits'], entry['venv'], tuple(entry['site_packages']),
+                               tuple(entry['sources']))
+
+    def get(self, path):
+        """Сведения об интерпретаторе или None, если это не рабочий Python"""
+        if not path:
+            return None
+        entry = self._lookup(path)
+        if entry is None or not entry['valid']:
+            return None
+        return self._to_info(entry)
+
+    def is_valid(self, path):
+        return self.get(path) is not None
+
+    def interpreters(self):
+        """Все найденные рабочие интерпретаторы, новые версии первыми"""
+        with self._lock:
+            entries = list(self._entries.values())
+        result = []
+        for entry in entries:
+            if (entry['valid'] and entry['sources'] and entry.get('probe') == INTERPRETER_PROBE_VERSION
+                    and self._stat(entry['path']) == entry['stat']):
+                result.append(self._to_info(entry))
+        result.sort(key=lambda info: tuple(int(part) for part in info.version.split('.')), reverse=True)
+        return result
+
+    def default(self):
+        """Интерпретатор по умолчанию: системная установка самой новой версии"""
+        with self._lock:
+            discovered = self._discovery_done or any(entry['sources'] for entry in self._entries.values())
+        # Ждём поиска только в первый раз: если интерпретаторов в системе нет, повторный поиск
+        # при каждом вызове (в том числе из потока интерфейса) ничего не изменит
+        if not discovered:
+            self.refresh(wait=True)
+
+        found = self.interpreters()
+        for source in INTERPRETER_SOURCES:
+            for info in found:
+                if source in info.sources and not info.venv:
+                    return info.path
+        return sys.executable
+
+    def refresh(self, venv_roots=(), wait=False):
+        """Запускает повторный поиск интерпретаторов в фоне (или ждёт его завершения)"""
+        with self._lock:
+            thread = self._refresh_thread
+            if thread is None or not thread.is_alive():
+                thread = threading.Thread(target=self._discover, args=(tuple(venv_roots),), daemon=True)
+                self._refresh_thread = thread
+                thread.start()
+        if wait:
+            thread.join()
+
+    def _discover(self, venv_roots):
+        try:
+            self._discover_interpreters(venv_roots)
+        finally:
+            self._discovery_done = True
+
+    def _discover_interpreters(self, venv_roots):
+        # Импорт при первом поиске: concurrent.futures тянет logging и не нужен до показа окна
+        from concurrent.futures import ThreadPoolExecutor
+
+        finders = {
+            'path': self._find_in_path,
+            'registry': self.backend.find_registered_interpreters,
+            'standard': self._find_standard,
+            'venv': lambda: self._find_venvs(venv_roots),
+        }
+        found = {}  # нормализованный путь -> (путь, [источники])
+        with ThreadPoolExecutor(max_workers=INTERPRETER_DISCOVERY_WORKERS) as executor:
+            futures = {source: executor.submit(finder) for source, finder in finders.items()}
+            for source, future in futures.items():
+                try:
+                    paths = future.result()
+                except Exception as e:
+                    print(f"Ошибка поиска интерпретаторов ({source}): {e}")
+                    continue
+                for path in paths:
+                    found.setdefault(self._key(path), (path, []))[1].append(source)
+
+            # Проверяем только новые и изменившиеся интерпретаторы, тоже параллельно
+            entries = dict(zip(found, executor.map(lambda item: self._lookup(item[0]), found.values())))
+
+        with self._lock:
+            for entry in self._entries.values():
+                entry['sources'] = []
+            for key, entry in entries.items():
+                if entry is not None:
+                    entry['sources'] = found[key][1]
+            # Пропавшие файлы больше не храним
+            self._entries = {key: entry for key, entry in self._entries.items()
+                             if entry['sources'] or os.path.exists(entry['path'])}
+        self._save_cache()
+
+    @staticmethod
+    def _find_in_path():
+        paths = []
+        for directory in os.environ.get('PATH', '').split(os.pathsep):
+            # Заглушки Microsoft Store вместо интерпретатора открывают магазин
+            if not directory or 'WindowsApps' in directory:
+                continue
+            for name in PYTHON_EXE_NAMES:
+                candidate = os.path.join(directory, name)
+                if os.path.isfile(candidate):
+                    paths.append(candidate)
+        return paths
+
+    @staticmethod
+    def _find_standard():
+        if sys.platform == 'win32':
+            patterns = [
+                r"C:\Python*\python.exe",
+                os.path.join(os.environ.get('ProgramFiles', r"C:\Program Files"), "Python*", "python.exe"),
+                os.path.join(os.environ.get('LOCALAPPDATA', ''), "Programs", "Python", "Python*", "python.exe"),
+            ]
+        else:
+            patterns = ["/usr/bin/python3*", "/usr/local/bin/python3*"]
+        paths = []
+        for pattern in patterns:
+            for candidate in glob.glob(pattern):
+                if os.path.isfile(candidate) and not candidate.endswith('-config'):
+                    paths.append(candidate)
+        return paths
+
+    @staticmethod
+    def _find_venvs(roots):
+        paths = []
+        for root in roots:
+            for name in VENV_DIR_NAMES:
+                for exe_name in PYTHON_EXE_NAMES:
+                    candidate = os.path.join(root, name, VENV_BIN_DIR, exe_name)
+                    if os.path.isfile(candidate):
+                        paths.append(candidate)
+                        break
+        return paths
+
+
+# Кэш списков установленных пакетов по интерпретаторам
+PACKAGE_CACHE_FILE = "packages.json"
+
+PackageInfo = namedtuple('PackageInfo', 'name version summary location')
+
+
+class PackageInventory:
+    """
+    Списки установленных пакетов без запуска pip.
+    Метаданные читаются напрямую из *.dist-info и *.egg-info в каталогах site-packages интерпретатора
+    в фоновом потоке. Список кэшируется (в памяти и на диске) и считается актуальным,
+    пока не изменилось время модификации ни одного из этих каталогов.
+    """
+
+    def __init__(self, interpreters, cache_path):
+        self.interpreters = interpreters
+        self.cache_path = cache_path
+        self.writer = JsonFileWriter(cache_path)
+        self._entries = {}  # интерпретатор -> {'dirs': {каталог: mtime}, 'packages': [...]}
+        self._lock = threading.Lock()
+        # Кэш читается с диска при первом обращении: при запуске программы списки пакетов не нужны
+        self._cache_loaded = False
+
+    def _load_cache(self):
+        """Читает кэш с диска один раз; вызывается под self._lock"""
+        if self._cache_loaded:
+            return
+        self._cache_loaded = True
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except json.JSONDecodeError:
+            quarantine_corrupt_file(self.cache_path)
+            return
+        except OSError as e:
+            print(f"Ошибка загрузки кэша пакетов: {e}")
+            return
+        self._entries = entries
+        self.writer.mark_written(entries)
+
+    @staticmethod
+    def _dir_mtimes(directories):
+        mtimes = {}
+        for directory in directories:
+            try:
+                mtimes[directory] = os.stat(directory).st_mtime_ns
+            except OSError:
+                mtimes[directory] = None
+        return mtimes
+
+    def get_cached(self, interpreter):
+        """Список пакетов из кэша, если он ещё актуален, иначе None"""
+        key = InterpreterInventory._key(interpreter)
+        with self._lock:
+            self._load_cache()
+            entry = self._entries.get(key)
+        if entry is None or self._dir_mtimes(entry['dirs']) != entry['dirs']:
+            return None
+        return [PackageInfo(*package) for package in entry['packages']]
+
+    def load(self, interpreter, callback):
+        """Получает список пакетов в фоне и передаёт в callback(packages, error)"""
+        cached = self.get_cached(interpreter)
+        if cached is not None:
+            callback(cached, None)
+            return
+
+        def run():
+            try:
+                packages = self.scan(interpreter)
+            except Exception as e:
+                callback(None, str(e))
+            else:
+                callback(packages, None)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def scan(self, interpreter):
+        """Читает метаданные пакетов из каталогов site-packages интерпретатора"""
+        info = self.interpreters.get(interpreter)
+        if info is None:
+            raise ValueError(f"Интерпретатор Python не найден: {interpreter}")
+
+        # Время модификации берём до чтения: изменения во время сканирования не потеряются
+        mtimes = self._dir_mtimes(info.site_packages)
+        packages = {}
+        for directory in info.site_packages:
+            try:
+                dir_entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for dir_entry in dir_entries:
+                if dir_entry.name.endswith('.dist-info'):
+                    metadata_path = os.path.join(dir_entry.path, 'METADATA')
+                elif dir_entry.name.endswith('.egg-info'):
+                    metadata_path = (os.path.join(dir_entry.path, 'PKG-INFO') if dir_entry.is_dir()
+                                     else dir_entry.path)
+                else:
+                    continue
+                package = self._read_metadata(metadata_path, directory)
+                # Первый найденный по порядку sys.path пакет - тот, что будет импортирован
+                if package is not None:
+                    packages.setdefault(package.name.lower().replace('_', '-'), package)
+
+        result = sorted(packages.values(), key=lambda package: package.name.lower())
+        with self._lock:
+            self._load_cache()
+            self._entries[InterpreterInventory._key(interpreter)] = {
+                'dirs': mtimes, 'packages': [list(package) for package in result]}
+            entries = dict(self._entries)
+        self.writer.schedule(entries)
+        return result
+
+    @staticmethod
+    def _read_metadata(path, location):
+        """Читает заголовки Name, Version и Summary из файла метаданных"""
+        headers = {}
+        try:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    line = line.rstrip('\r\n')
+                    if not line:
+                        break
+                    name, sep, value = line.partition(': ')
+                    if sep and name in ('Name', 'Version', 'Summary') and name not in headers:
+                        headers[name] = value.strip()
+        except OSError:
+            return None
+        if 'Name' not in headers:
+            return None
+        return PackageInfo(headers['Name'], headers.get('Version', ''), headers.get('Summary', ''), location)
@@ -0,0 +1,541 @@
+"""
+Журналы вывода скриптов на диске: сегменты с ротацией, разреженный индекс по номеру строки и времени,
+чтение диапазонов строк через mmap без загрузки файлов целиком и очистка старых сегментов по размеру и возрасту.
+"""
+import bisect
+import mmap
+import os
+import shutil
+import struct
+import threading
+import time
+from array import array
+
+
+# Каталог журналов (рядом с настройками): logs/<uuid скрипта>/<номер первой строки>.log и .idx
+LOG_DIR = "logs"
+# Размер сегмента, после которого начинается новый файл (байты)
+LOG_SEGMENT_BYTES = 4 * 1024 * 1024
+# Запись индекса добавляется каждые LOG_INDEX_LINES строк или LOG_INDEX_SECONDS секунд вывода
+LOG_INDEX_LINES = 256
+LOG_INDEX_SECONDS = 1.0
+# Период записи накопленного вывода на диск фоновым потоком (секунды)
+LOG_FLUSH_INTERVAL = 0.25
+# Период проверки ограничений хранения (секунды)
+LOG_RETENTION_CHECK_INTERVAL = 60.0
+# Ограничения хранения по умолчанию (на каждый скрипт; переопределяются в settings.json)
+DEFAULT_LOG_RETENTION_MB = 100
+DEFAULT_LOG_RETENTION_DAYS = 14
+# Размер блока при последовательном чтении журнала (поиск по выводу)
+LOG_READ_BLOCK_BYTES = 1024 * 1024
+# Сколько незаписанных строк держать в памяти, если диск недоступен (старые заменяются пустыми строками)
+LOG_PENDING_MAX_LINES = 100000
+
+# Запись индекса: номер строки, смещение начала строки в сегменте, время вывода строки
+_INDEX_ENTRY = struct.Struct("<qqd")
+
+
+def _split_lines(text):
+    """Делит текст на строки, сохраняя '\\n' (последняя строка может быть незавершённой)"""
+    parts = text.split('\n')
+    lines = [part + '\n' for part in parts[:-1]]
+    if parts[-1]:
+        lines.append(parts[-1])
+    return lines
+
+
+class LogSegment:
+    """Файл журнала со строками first_line..end_line - 1 и его разреженный индекс (файл .idx рядом)"""
+
+    def __init__(self, directory, first_line):
+        self.first_line = first_line
+        self.path = os.path.join(directory, f"{first_line:012d}.log")
+        self.index_path = os.path.join(directory, f"{first_line:012d}.idx")
+        self.lines = 0
+        self.size = 0  # байты завершённых строк
+        self.index_lines = array('q')
+        self.index_offsets = array('q')
+        self.index_times = array('d')
+
+    @property
+    def end_line(self):
+        return self.first_line + self.lines
+
+    @property
+    def last_time(self):
+        return self.index_times[-1] if self.index_times else 0.0
+
+    def load(self):
+        """Читает индекс и досчитывает строки после его последней записи; обрезанный хвост отбрасывается"""
+        try:
+            with open(self.index_path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = b""
+        file_size = os.path.getsize(self.path)
+        usable = len(data) - len(data) % _INDEX_ENTRY.size
+        for line, offset, timestamp in _INDEX_ENTRY.iter_unpack(data[:usable]):
+            if offset >= file_size:
+                break
+            self.index_lines.append(line)
+            self.index_offsets.append(offset)
+            self.index_times.append(timestamp)
+
+        line, offset = (self.index_lines[-1], self.index_offsets[-1]) if self.index_lines else (self.first_line, 0)
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            tail = f.read()
+        complete = tail.rfind(b'\n') + 1
+        self.lines = line - self.first_line + tail.count(b'\n', 0, complete)
+        self.size = offset + complete
+
+    def _seek(self, mm, start):
+        """Смещение начала строки start: переход к ближайшей записи индекса и поиск '\\n' от неё (None, если строки нет)"""
+        i = bisect.bisect_right(self.index_lines, start) - 1
+        line, pos = (self.index_lines[i], self.index_offsets[i]) if i >= 0 else (self.first_line, 0)
+        while line < start:
+            pos = mm.find(b'\n', pos) + 1
+            if pos == 0:
+                return None
+            line += 1
+        return pos
+
+    def read(self, start, stop, size):
+        """Строки [start, stop) через mmap первых size байт"""
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+            begin = self._seek(mm, start)
+            if begin is None:
+                return []
+            pos = begin
+            line = start
+            while line < stop:
+                found = mm.find(b'\n', pos)
+                if found < 0:
+                    break
+                pos = found + 1
+                line += 1
+            data = mm[begin:pos]
+        return _split_lines(data.decode('utf-8', errors='replace'))
+
+    def iter_blocks(self, start, stop, size, block_bytes):
+        """Текст строк [start, stop) блоками около block_bytes по границам строк: пары (номер первой строки, текст)"""
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+            pos = self._seek(mm, start)
+            line = start
+            while pos is not None and line < stop and pos < size:
+                end = mm.find(b'\n', min(size, pos + block_bytes) - 1) + 1 or size
+                data = mm[pos:end]
+                count = data.count(b'\n')
+                if line + count > stop:
+                    count = stop - line
+                    cut = 0
+                    for _ in range(count):
+                        cut = data.find(b'\n', cut) + 1
+                    data = data[:cut]
+                yield line, data.decode('utf-8', errors='replace')
+                line += count
+                pos = end
+
+    def line_at_time(self, timestamp):
+        """Номер строки из последней записи индекса не позже timestamp (вывод с неё покрывает это время)"""
+        i = bisect.bisect_right(self.index_times, timestamp) - 1
+        return self.index_lines[i] if i >= 0 else self.first_line
+
+
+class ScriptLog:
+    """
+    Журнал вывода одного скрипта: сегменты на диске и ещё не записанный хвост в памяти.
+    Повторяет интерфейс чтения OutputBuffer (first_index, end_index, get_lines, tail, append),
+    поэтому консоль показывает весь сохранённый вывод, в том числе прошлых запусков программы.
+    Номера строк сквозные для всех запусков и не сдвигаются при удалении старых сегментов.
+    Дописывает на диск только фоновый поток LogStore.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.segments = []
+        self._pending = []  # [строка, время] ещё не записанных строк (последняя может быть незавершённой)
+        self._pending_first = 0  # номер первой строки _pending
+        self._disk_end = 0  # номер строки после последней записанной на диск
+        self._lock = threading.Lock()
+        self._file = None  # открытые на дозапись файлы последнего сегмента (только поток записи)
+        self._index_file = None
+        self._write_failed = False
+        self._load()
+
+    def _load(self):
+        if not os.path.isdir(self.directory):
+            return
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith('.log'):
+                continue
+            try:
+                segment = LogSegment(self.directory, int(name[:-4]))
+                segment.load()
+            except (ValueError, OSError) as e:
+                print(f"Ошибка чтения журнала {os.path.join(self.directory, name)}: {e}")
+                continue
+            # Сегменты идут подряд; всё, что не продолжает предыдущий, не читается
+            if self.segments and segment.first_line != self.segments[-1].end_line:
+                continue
+            self.segments.append(segment)
+        if self.segments:
+            self._disk_end = self._pending_first = self.segments[-1].end_line
+
+    # --- Интерфейс OutputBuffer ---
+
+    @property
+    def first_index(self):
+        """Номер самой старой сохранённой строки"""
+        with self._lock:
+            return self.segments[0].first_line if self.segments else self._pending_first
+
+    @property
+    def end_index(self):
+        """Номер строки, следующей за последней"""
+        with self._lock:
+            return self._pending_first + len(self._pending)
+
+    @property
+    def dropped_lines(self):
+        """Строки, удалённые вместе со старыми сегментами"""
+        return self.first_index
+
+    def __len__(self):
+        return self.end_index - self.first_index
+
+    def append(self, text, timestamp=None):
+        """Добавляет вывод в конец журнала (на диск он попадёт в следующей записи фонового потока)"""
+        if not text:
+            return
+        now = time.time() if timestamp is None else timestamp
+        lines = _split_lines(text)
+        with self._lock:
+            pending = self._pending
+            if pending and not pending[-1][0].endswith('\n'):
+                pending[-1][0] += lines.pop(0)
+            pending.extend([line, now] for line in lines)
+            excess = len(pending) - LOG_PENDING_MAX_LINES
+            if excess > 0:
+                del pending[:excess]
+                self._pending_first += excess
+
+    def finish_line(self):
+        """Завершает незавершённую последнюю строку (процесс вышел, не выведя '\\n')"""
+        with self._lock:
+            if self._pending and not self._pending[-1][0].endswith('\n'):
+                self._pending[-1][0] += '\n'
+
+    def get_lines(self, start=None, stop=None):
+        """Строки с номерами [start, stop): с диска через mmap и из ещё не записанного хвоста"""
+        with self._lock:
+            first = self.segments[0].first_line if self.segments else self._pending_first
+            end = self._pending_first + len(self._pending)
+            start = first if start is None else min(max(start, first), end)
+            stop = end if stop is None else min(max(stop, start), end)
+            reads = [(segment, max(start, segment.first_line), min(stop, segment.end_line), segment.size)
+                     for segment in self.segments if segment.first_line < stop and segment.end_line > start]
+            lost = max(0, min(stop, self._pending_first) - max(start, self._disk_end))
+            pending = [line for line, _ in self._pending[max(0, start - self._pending_first):
+                                                         max(0, stop - self._pending_first)]]
+
+        lines = []
+        for segment, segment_start, segment_stop, size in reads:
+            try:
+                got = segment.read(segment_start, segment_stop, size)
+            except (OSError, ValueError):
+                got = []  # сегмент удалён очисткой, пока его читали
+            lines.extend(got)
+            lines.extend(['\n'] * (segment_stop - segment_start - len(got)))
+        lines.extend(['\n'] * lost)
+        lines.extend(pending)
+        return lines
+
+    def tail(self, max_lines):
+        """Возвращает последние max_lines строк одной строкой"""
+        end = self.end_index
+        return ''.join(self.get_lines(end - max_lines, end))
+
+    def iter_blocks(self, start=None, stop=None, block_bytes=LOG_READ_BLOCK_BYTES):
+        """
+        Текст строк [start, stop) блоками около block_bytes: пары (номер первой строки блока, текст).
+        Сегменты читаются через mmap без разбиения на строки, поэтому по блокам быстро идёт поиск.
+        """
+        with self._lock:
+            first = self.segments[0].first_line if self.segments else self._pending_first
+            end = self._pending_first + len(self._pending)
+            start = first if start is None else min(max(start, first), end)
+            stop = end if stop is None else min(max(stop, start), end)
+            reads = [(segment, max(start, segment.first_line), min(stop, segment.end_line), segment.size)
+                     for segment in self.segments if segment.first_line < stop and segment.end_line > start]
+            pending_start = max(start, self._pending_first)
+            pending = [line for line, _ in self._pending[pending_start - self._pending_first:
+                                                         max(0, stop - self._pending_first)]]
+
+        for segment, segment_start, segment_stop, size in reads:
+            try:
+                yield from segment.iter_blocks(segment_start, segment_stop, size, block_bytes)
+            except (OSError, ValueError):
+                continue  # сегмент удалён очисткой, пока его читали
+        if pending:
+            yield pending_start, ''.join(pending)
+
+    def line_at_time(self, timestamp):
+        """Номер первой строки, выведенной не раньше timestamp"""
+        with self._lock:
+            for segment in self.segments:
+                if segment.last_time >= timestamp:
+                    return segment.line_at_time(timestamp)
+            for i, (_, line_time) in enumerate(self._pending):
+                if line_time >= timestamp:
+                    return self._pending_first + i
+            return self._pending_first + len(self._pending)
+
+    # --- Запись (поток LogStore) ---
+
+    def _open_active(self, segment_bytes):
+        """Последний сегмент для дозаписи; новый - если последний заполнен"""
+        with self._lock:
+            active = self.segments[-1] if self.segments else None
+            if active is None or active.size >= segment_bytes:
+                self.close_files()
+                active = LogSegment(self.directory, self._disk_end)
+                self.segments.append(active)
+        if self._file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            # Отрезаем то, что могла оставить неудачная запись, - файлы должны точно совпадать с индексом
+            for path, size in ((active.path, active.size),
+                               (active.index_path, len(active.index_lines) * _INDEX_ENTRY.size)):
+                with open(path, 'ab') as f:
+                    f.truncate(size)
+            self._file = open(active.path, 'ab')
+            self._index_file = open(active.index_path, 'ab')
+        return active
+
+    def write_pending(self, segment_bytes=LOG_SEGMENT_BYTES):
+        """Дописывает на диск завершённые строки; возвращает True, если что-то записано"""
+        with self._lock:
+            complete = len(self._pending)
+            if complete and not self._pending[-1][0].endswith('\n'):
+                complete -= 1
+            batch = self._pending[:complete]
+            batch_first = self._pending_first
+            lost = batch_first - self._disk_end
+        if not batch and not lost:
+            return False
+
+        # Строки, вытесненные из памяти, пока диск был недоступен, записываются пустыми
+        lines = [('\n', batch[0][1] if batch else time.time())] * lost + batch
+        written = 0
+        try:
+            while written < len(lines):
+                segment = self._open_active(segment_bytes)
+                chunk = []
+                entries = []
+                size = segment.size
+                line_number = self._disk_end
+                last_line = segment.index_lines[-1] if segment.index_lines else None
+                last_time = segment.last_time
+                for text, line_time in lines[written:]:
+                    data = text.encode('utf-8', errors='replace')
+                    if chunk and size + len(data) > segment_bytes:
+                        break
+                    if (last_line is None or line_number - last_line >= LOG_INDEX_LINES
+                            or line_time - last_time >= LOG_INDEX_SECONDS):
+                        entries.append((line_number, size, line_time))
+                        last_line, last_time = line_number, line_time
+                    chunk.append(data)
+                    size += len(data)
+                    line_number += 1
+
+                self._file.write(b"".join(chunk))
+                self._file.flush()
+                self._index_file.write(b"".join(_INDEX_ENTRY.pack(*entry) for entry in entries))
+                self._index_file.flush()
+
+                with self._lock:
+                    for line, offset, line_time in entries:
+                        segment.index_lines.append(line)
+                        segment.index_offsets.append(offset)
+                        segment.index_times.append(line_time)
+                    segment.lines += len(chunk)
+                    segment.size = size
+                    self._disk_end += len(chunk)
+                    # Записанные строки уходят из памяти (если их ещё не вытеснили)
+                    consumed = max(0, self._disk_end - self._pending_first)
+                    del self._pending[:consumed]
+                    self._pending_first += consumed
+                written += len(chunk)
+            self._write_failed = False
+        except OSError as e:
+            if not self._write_failed:
+                print(f"Ошибка записи журнала {self.directory}: {e}")
+            self._write_failed = True
+            self.close_files()
+        return written > 0
+
+    def apply_retention(self, max_bytes, max_age):
+        """Удаляет самые старые сегменты сверх max_bytes и старше max_age секунд (последний сегмент остаётся)"""
+        now = time.time()
+        with self._lock:
+            total = sum(segment.size for segment in self.segments)
+            removed = []
+            for segment in self.segments[:-1]:
+                too_old = max_age and segment.last_time and now - segment.last_time > max_age
+                if not (total > max_bytes or too_old):
+                    break
+                removed.append(segment)
+                total -= segment.size
+            del self.segments[:len(removed)]
+        for segment in removed:
+            for path in (segment.path, segment.index_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    print(f"Ошибка удаления старого журнала {path}: {e}")
+
+    def close_files(self):
+        for f in (self._file, self._index_file):
+            if f is not None:
+                try:
+                    f.close()
+                except OSError:
+                    pass
+        self._file = None
+        self._index_file = None
+
+
+class LogStore:
+    """
+    Журналы вывода всех скриптов (каталог logs/<uuid>) и общий фоновый поток записи.
+    Поток раз в LOG_FLUSH_INTERVAL дописывает накопленные строки всех журналов и
+    раз в LOG_RETENTION_CHECK_INTERVAL удаляет сегменты сверх ограничений по размеру и возрасту -
+    во всех журналах каталога, в том числе скриптов, которые в этом сеансе не запускались.
+    """
+
+    def __init__(self, directory, retention_mb=DEFAULT_LOG_RETENTION_MB, retention_days=DEFAULT_LOG_RETENTION_DAYS):
+        self.directory = directory
+        self.retention_bytes = retention_mb * 1024 * 1024
+        self.retention_seconds = retention_days * 86400
+        self.logs = {}  # script_uuid -> ScriptLog
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def configure(self, retention_mb, retention_days):
+        """Меняет ограничения хранения (0 дней - без ограничения по возрасту)"""
+        self.retention_bytes = max(1, retention_mb) * 1024 * 1024
+        self.retention_seconds = max(0, retention_days) * 86400
+        # Очистка нужна и журналам скриптов, которые в этом сеансе не запускались
+        with self._lock:
+            self._start_thread()
+
+    def _start_thread(self):
+        """Запускает фоновый поток записи и очистки; вызывается под _lock"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="LogStore", daemon=True)
+            self._thread.start()
+
+    def open(self, script_uuid):
+        """Журнал скрипта (при первом обращении читает индексы его сегментов)"""
+        with self._lock:
+            log = self.logs.get(script_uuid)
+            if log is None:
+                log = ScriptLog(os.path.join(self.directory, script_uuid))
+                self.logs[script_uuid] = log
+            self._start_thread()
+        return log
+
+    def get(self, script_uuid):
+        """Открытый журнал скрипта или None"""
+        return self.logs.get(script_uuid)
+
+    def delete(self, script_uuid):
+        """Удаляет журнал скрипта вместе с файлами (при удалении скрипта из каталога)"""
+        with self._write_lock:
+            with self._lock:
+                log = self.logs.pop(script_uuid, None)
+            if log is not None:
+                log.close_files()
+            shutil.rmtree(os.path.join(self.directory, script_uuid), ignore_errors=True)
+
+    def retain(self, script_uuids):
+        """Удаляет журналы скриптов, которых больше нет в каталоге"""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if name not in script_uuids and os.path.isdir(os.path.join(self.directory, name)):
+                self.delete(name)
+
+    def flush(self):
+        """Дописывает на диск весь накопленный вывод"""
+        with self._write_lock:
+            for log in list(self.logs.values()):
+                log.write_pending()
+
+    def _apply_retention(self):
+        with self._write_lock:
+            for log in list(self.logs.values()):
+                log.apply_retention(self.retention_bytes, self.retention_seconds)
+            try:
+                names = os.listdir(self.directory)
+            except FileNotFoundError:
+                return
+            for name in names:
+                # Журналы, не открытые в этом сеансе, проверяются по размеру и времени изменения файлов;
+                # под _lock, чтобы open() не прочитал сегменты, которые сейчас удаляются
+                with self._lock:
+                    if name not in self.logs:
+                        self._apply_retention_to_directory(os.path.join(self.directory, name))
+
+    def _apply_retention_to_directory(self, directory):
+        """Удаляет самые старые сегменты закрытого журнала сверх ограничений (последний сегмент остаётся)"""
+        try:
+            names = sorted(name for name in os.listdir(directory) if name.endswith('.log'))
+            segments = [(name, os.stat(os.path.join(directory, name))) for name in names]
+        except (NotADirectoryError, FileNotFoundError):
+            return
+        except OSError as e:
+            print(f"Ошибка чтения журнала {directory}: {e}")
+            return
+        now = time.time()
+        total = sum(stat.st_size for _, stat in segments)
+        for name, stat in segments[:-1]:
+            too_old = self.retention_seconds and now - stat.st_mtime > self.retention_seconds
+            if not (total > self.retention_bytes or too_old):
+                break
+            total -= stat.st_size
+            for path in (os.path.join(directory, name), os.path.join(directory, name[:-4] + ".idx")):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    print(f"Ошибка удаления старого журнала {path}: {e}")
+
+    def _run(self):
+        next_retention = time.monotonic()
+        while not self._stop_event.wait(LOG_FLUSH_INTERVAL):
+            try:
+                self.flush()
+                if time.monotonic() >= next_retention:
+                    next_retention = time.monotonic() + LOG_RETENTION_CHECK_INTERVAL
+                    self._apply_retention()
+            except Exception as e:
+                print(f"Ошибка записи журналов вывода: {e}")
+
+    def close(self):
+        """Останавливает фоновую запись и дописывает остаток вывода"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        with self._write_lock:
+            for log in list(self.logs.values()):
+                log.finish_line()
+                log.write_pending()
+                log.close_files()
@@ -0,0 +1,173 @@
+"""Сбор метрик CPU и памяти процессов скриптов в фоновом потоке"""
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+import psutil
+
+from .proctree import process_children_map, descendant_pids
+
+
+# Период сбора метрик производительности (секунды)
+MONITOR_INTERVAL = 1.0
+
+# Неизменяемые снимки метрик, которые публикует фоновый поток.
+# Показатели скрипта - сумма по всему дереву процессов, children - показатели каждого потомка.
+# memory - % памяти системы, rss - байты, io - байт/с чтения и записи (0, если ОС его не сообщает)
+MetricsSnapshot = namedtuple('MetricsSnapshot', ['timestamp', 'system_cpu', 'scripts'])
+ScriptMetrics = namedtuple('ScriptMetrics', ['pid', 'cpu', 'memory', 'alive', 'children', 'rss', 'threads', 'io'],
+                           defaults=((), 0, 0, 0.0))
+ProcessMetrics = namedtuple('ProcessMetrics', ['pid', 'name', 'cpu', 'memory', 'create_time'])
+
+
+class ResourceSampler(threading.Thread):
+    """
+    Фоновый поток сбора метрик процессов.
+    Раз в интервал опрашивает psutil и публикует один неизменяемый MetricsSnapshot,
+    поэтому поток Tk только применяет готовые значения и никогда не блокируется.
+    Каждый скрипт учитывается вместе с потомками: дерево строится по одному обходу списка процессов
+    системы за интервал, а однажды замеченные потомки отслеживаются и после потери родителя.
+    """
+
+    def __init__(self, interval=MONITOR_INTERVAL, history=None):
+        super().__init__(name="ResourceSampler", daemon=True)
+        self.interval = interval
+        self.enabled = True
+        self.history = history  # MetricsHistory, в которую добавляется каждый снимок (если задана)
+        self.snapshot = MetricsSnapshot(time.time(), 0.0, MappingProxyType({}))
+        self._targets = MappingProxyType({})  # script_uuid -> pid
+        self._members = {}  # script_uuid -> (pid, множество PID известных потомков)
+        self._stop_event = threading.Event()
+        # Кэш дескрипторов процессов: pid -> {'process', 'name', 'last_cpu_times', 'last_io', 'last_check_time'}
+        self._handles = {}
+        self._total_memory = psutil.virtual_memory().total
+
+    def set_targets(self, targets):
+        """Задаёт процессы для опроса: словарь script_uuid -> pid"""
+        self._targets = MappingProxyType(dict(targets))
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        # Первый вызов без интервала только запоминает начальные значения
+        psutil.cpu_percent(interval=None)
+        while not self._stop_event.wait(self.interval):
+            if not self.enabled:
+                continue
+            try:
+                self.snapshot = self.sample(self._targets)
+            except Exception as e:
+                print(f"Ошибка сбора метрик: {e}")
+                continue
+            if self.history is not None:
+                try:
+                    self.history.record(self.snapshot)
+                except Exception as e:
+                    print(f"Ошибка записи истории метрик: {e}")
+
+    def _get_handle(self, pid):
+        """Возвращает закэшированный дескриптор процесса или создаёт новый"""
+        handle = self._handles.get(pid)
+        if handle is None:
+            process = psutil.Process(pid)
+            # Для нового процесса считаем среднюю загрузку с момента его запуска
+            handle = {
+                'process': process,
+                'name': process.name(),
+                'last_cpu_times': (0.0, 0.0),
+                'last_io': 0,
+                'last_check_time': process.create_time()
+            }
+            self._handles[pid] = handle
+        return handle
+
+    def _sample_process(self, pid, now):
+        """Читает все нужные поля процесса за одно обращение к ОС: (cpu %, память %, rss, потоки, байт/с)"""
+        handle = self._get_handle(pid)
+        process = handle['process']
+        with process.oneshot():
+            cpu_times = process.cpu_times()
+            memory_info = process.memory_info()
+            threads = process.num_threads()
+            io_bytes = None
+            if hasattr(process, 'io_counters'):  # в macOS счётчиков ввода-вывода нет
+                try:
+                    io = process.io_counters()
+                    io_bytes = io.read_bytes + io.write_bytes
+                except psutil.AccessDenied:
+                    pass
+
+        last_user, last_system = handle['last_cpu_times']
+        elapsed = now - handle['last_check_time']
+        cpu_delta = (cpu_times.user - last_user) + (cpu_times.system - last_system)
+        cpu_usage = max(0.0, cpu_delta / elapsed * 100) if elapsed > 0 else 0.0
+        io_rate = 0.0
+        if io_bytes is not None:
+            io_rate = max(0.0, (io_bytes - handle['last_io']) / elapsed) if elapsed > 0 else 0.0
+            handle['last_io'] = io_bytes
+
+        handle['last_cpu_times'] = (cpu_times.user, cpu_times.system)
+        handle['last_check_time'] = now
+
+        memory_usage = memory_info.rss / self._total_memory * 100
+        return cpu_usage, memory_usage, memory_info.rss, threads, io_rate
+
+    def _descendants(self, script_uuid, pid, children_map):
+        """PID потомков скрипта: текущие потомки процесса и ещё живые ранее замеченные (в т.ч. осиротевшие)"""
+        root_pid, known = self._members.get(script_uuid, (pid, set()))
+        roots = [pid]
+        if root_pid == pid:
+            for member in known:
+                handle = self._handles.get(member)
+                if handle is not None and handle['process'].is_running():
+                    roots.append(member)
+        return descendant_pids(roots, children_map) | set(roots[1:])
+
+    def sample(self, targets):
+        """Собирает метрики системы и всех переданных деревьев процессов за один проход"""
+        system_cpu = psutil.cpu_percent(interval=None)
+        now = time.time()
+        children_map = process_children_map(targets.values()) if targets else {}
+
+        scripts = {}
+        members = {}
+        for script_uuid, pid in targets.items():
+            try:
+                cpu_usage, memory_usage, rss, threads, io_rate = self._sample_process(pid, now)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                self._handles.pop(pid, None)
+                scripts[script_uuid] = ScriptMetrics(pid, 0.0, 0.0, False)
+                continue
+
+            children = []
+            alive_members = set()
+            for child_pid in sorted(self._descendants(script_uuid, pid, children_map)):
+                try:
+                    child_cpu, child_memory, child_rss, child_threads, child_io = self._sample_process(child_pid, now)
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    self._handles.pop(child_pid, None)
+                    continue
+                alive_members.add(child_pid)
+                handle = self._handles[child_pid]
+                children.append(ProcessMetrics(child_pid, handle['name'], child_cpu, child_memory,
+                                               handle['process'].create_time()))
+                cpu_usage += child_cpu
+                memory_usage += child_memory
+                rss += child_rss
+                threads += child_threads
+                io_rate += child_io
+            members[script_uuid] = (pid, alive_members)
+            scripts[script_uuid] = ScriptMetrics(pid, cpu_usage, memory_usage, True, tuple(children),
+                                                 rss, threads, io_rate)
+        self._members = members
+
+        # Забываем дескрипторы процессов, которые больше не отслеживаются
+        active_pids = set(targets.values())
+        for _, script_members in members.values():
+            active_pids.update(script_members)
+        for pid in [pid for pid in self._handles if pid not in active_pids]:
+            del self._handles[pid]
+
+        return MetricsSnapshot(now, system_cpu, MappingProxyType(scripts))
@@ -0,0 +1,392 @@
+"""Вывод скриптов: кольцевой буфер строк, декодирование потоков и общий движок чтения каналов"""
+import os
+import threading
+import selectors
+import codecs
+
+
+# Ограничения буфера вывода по умолчанию (переопределяются в settings.json)
+DEFAULT_OUTPUT_MAX_LINES = 20000
+DEFAULT_OUTPUT_MAX_BYTES = 8 * 1024 * 1024
+
+# Сколько последних строк вывода (кроме трассировок) попадает в отчёт об ошибке
+CRASH_REPORT_TAIL_LINES = 30
+
+
+class OutputBuffer:
+    """
+    Кольцевой буфер вывода скрипта.
+    Хранит строки в массиве фиксированной ёмкости: добавление и доступ по номеру строки
+    выполняются за O(1), при превышении лимита по строкам или байтам вытесняются самые старые строки.
+    Номера строк абсолютные - они не сдвигаются при вытеснении.
+    """
+
+    def __init__(self, max_lines=DEFAULT_OUTPUT_MAX_LINES, max_bytes=DEFAULT_OUTPUT_MAX_BYTES):
+        self.max_lines = max(1, int(max_lines))
+        self.max_bytes = max(1, int(max_bytes))
+        self._ring = [None] * self.max_lines
+        self._head = 0  # позиция самой старой строки в массиве
+        self._count = 0
+        self._bytes = 0
+        self._first_index = 0  # абсолютный номер самой старой хранимой строки
+        self.dropped_lines = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _line_size(line):
+        return len(line.encode('utf-8', errors='replace'))
+
+    @staticmethod
+    def _split_lines(text):
+        """Делит текст на строки, сохраняя '\\n' (последняя строка может быть незавершённой)"""
+        parts = text.split('\n')
+        lines = [part + '\n' for part in parts[:-1]]
+        if parts[-1]:
+            lines.append(parts[-1])
+        return lines
+
+    def append(self, text):
+        """Добавляет текст в конец буфера"""
+        if not text:
+            return
+
+        lines = self._split_lines(text)
+        with self._lock:
+            # Дописываем незавершённую последнюю строку, чтобы не дробить её на части
+            if self._count:
+                last_pos = (self._head + self._count - 1) % self.max_lines
+                last_line = self._ring[last_pos]
+                if not last_line.endswith('\n'):
+                    merged = last_line + lines[0]
+                    self._ring[last_pos] = merged
+                    self._bytes += self._line_size(merged) - self._line_size(last_line)
+                    lines = lines[1:]
+
+            for line in lines:
+                if self._count == self.max_lines:
+                    self._pop_oldest()
+                self._ring[(self._head + self._count) % self.max_lines] = line
+                self._count += 1
+                self._bytes += self._line_size(line)
+
+            while self._bytes > self.max_bytes and self._count > 1:
+                self._pop_oldest()
+
+    def _pop_oldest(self):
+        line = self._ring[self._head]
+        self._ring[self._head] = None
+        self._head = (self._head + 1) % self.max_lines
+        self._count -= 1
+        self._bytes -= self._line_size(line)
+        self._first_index += 1
+        self.dropped_lines += 1
+
+    @property
+    def first_index(self):
+        """Абсолютный номер самой старой хранимой строки"""
+        return self._first_index
+
+    @property
+    def end_index(self):
+        """Абсолютный номер строки, следующей за последней"""
+        return self._first_index + self._count
+
+    def __len__(self):
+        return self._count
+
+    def get_lines(self, start=None, stop=None):
+        """Возвращает список строк с абсолютными номерами [start, stop)"""
+        with self._lock:
+            first = self._first_index
+            end = first + self._count
+            start = first if start is None else min(max(start, first), end)
+            stop = end if stop is None else min(max(stop, start), end)
+            return [self._ring[(self._head + i - first) % self.max_lines] for i in range(start, stop)]
+
+    def tail(self, max_lines):
+        """Возвращает последние max_lines строк одной строкой"""
+        end = self.end_index
+        return ''.join(self.get_lines(end - max_lines, end))
+
+    def get_text(self):
+        """Возвращает весь хранимый вывод одной строкой"""
+        return ''.join(self.get_lines())
+
+    def clear(self):
+        with self._lock:
+            self._first_index += self._count
+            self._ring = [None] * self.max_lines
+            self._head = 0
+            self._count = 0
+            self._bytes = 0
+
+
+# Кодировки вывода, из которых выбирается кодировка потока при автоопределении
+AUTO_ENCODINGS = ('utf-8', 'cp1251', 'cp866')
+# Значения кодировки в настройках скрипта ("auto" - автоопределение)
+OUTPUT_ENCODING_CHOICES = ('auto',) + AUTO_ENCODINGS
+CYRILLIC_LETTERS = frozenset('абвгдеёжзийклмнопрстуфхцчшщъыьэюяАБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ')
+
+
+class StreamDecoder:
+    """
+    Декодер одного потока вывода (stdout или stderr).
+    Кодировка берётся из настроек скрипта или определяется один раз по первым не-ASCII данным,
+    после чего поток декодируется только ею. Инкрементальный декодер собирает многобайтовые
+    символы, разрезанные между порциями данных.
+    """
+
+    def __init__(self, encoding=None):
+        self.encoding = None
+        self._decoder = None
+        self._has_carry = False  # в инкрементальном декодере могут оставаться байты незавершённого символа
+        if encoding and encoding != 'auto':
+            self._set_encoding(encoding)
+
+    def _set_encoding(self, encoding):
+        self.encoding = codecs.lookup(encoding).name
+        self._decoder = codecs.getincrementaldecoder(self.encoding)(errors='replace')
+
+    def decode(self, data, final=False):
+        """Декодирует очередную порцию байтов"""
+        if self._decoder is None:
+            # Пока идёт чистый ASCII, кодировку определять не по чему
+            if data.isascii():
+                return data.decode('ascii')
+            self._set_encoding(self.detect_encoding(data))
+
+        # Целая строка без остатка от прошлой порции декодируется напрямую - это заметно быстрее
+        if data.endswith(b'\n') and not self._has_carry:
+            return data.decode(self.encoding, 'replace')
+
+        # '\n' всегда завершает символ, поэтому после такой порции в декодере ничего не остаётся
+        self._has_carry = not (final or data.endswith(b'\n'))
+        return self._decoder.decode(data, final)
+
+    @staticmethod
+    def detect_encoding(data):
+        """Определяет кодировку по образцу данных"""
+        try:
+            data.decode('utf-8')
+            return 'utf-8'
+        except UnicodeDecodeError as e:
+            # Символ, обрезанный на конце порции, не повод отказываться от utf-8
+            if e.reason == 'unexpected end of data' and e.start >= len(data) - 3:
+                return 'utf-8'
+
+        # cp1251 и cp866 декодируют почти любые байты, поэтому выбираем ту,
+        # в которой получается больше кириллических букв
+        best_encoding, best_score = AUTO_ENCODINGS[1], -1
+        for encoding in AUTO_ENCODINGS[1:]:
+            text = data.decode(encoding, errors='replace')
+            score = sum(1 for char in text if char in CYRILLIC_LETTERS)
+            if score > best_score:
+                best_encoding, best_score = encoding, score
+        return best_encoding
+
+
+# Размер порции чтения из каналов вывода
+READ_CHUNK_SIZE = 64 * 1024
+# Строка без '\n' длиннее этого значения выдаётся частями, чтобы не копить её бесконечно
+MAX_PENDING_LINE_BYTES = 64 * 1024
+
+
+class OutputReactor:
+    """
+    Общий движок чтения вывода всех запущенных скриптов.
+    В Linux/macOS все каналы обслуживаются одним потоком через selectors, а завершение процесса
+    отслеживается через pidfd без опроса. Каналы читаются до EOF, даже если корневой процесс уже вышел:
+    вывод потомков, унаследовавших stdout/stderr, не теряется, а on_exit вызывается после обоих событий. В Windows select не работает с каналами, поэтому
+    каждый канал читается блокирующе в своём потоке (без sleep), а отдельного потока-наблюдателя нет:
+    выход процесса ожидает поток, дочитавший последний канал.
+    Обработчики on_line(stream_name, raw_line) и on_exit(returncode) вызываются из потоков движка.
+    """
+
+    def __init__(self):
+        self.use_selector = os.name == 'posix'
+        self._lock = threading.Lock()
+        self._thread = None
+        if self.use_selector:
+            self._selector = selectors.DefaultSelector()
+            self._pending = []  # наблюдения, ожидающие регистрации в потоке движка
+            self._wakeup_r, self._wakeup_w = os.pipe()
+            os.set_blocking(self._wakeup_r, False)
+            os.set_blocking(self._wakeup_w, False)
+            self._selector.register(self._wakeup_r, selectors.EVENT_READ, None)
+
+    def register(self, process, on_line, on_exit):
+        """Начинает чтение stdout/stderr процесса"""
+        watch = {
+            'process': process,
+            'on_line': on_line,
+            'on_exit': on_exit,
+            'streams': {},
+            'pidfd': None,
+            'exited': False,  # корневой процесс завершён и его код возврата получен через pidfd
+            'finished': False
+        }
+        for name, stream in (('stdout', process.stdout), ('stderr', process.stderr)):
+            if stream is not None:
+                watch['streams'][stream.fileno()] = {'name': name, 'stream': stream, 'buffer': bytearray()}
+
+        if self.use_selector:
+            with self._lock:
+                self._pending.append(watch)
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run_selector, name="OutputReactor", daemon=True)
+                    self._thread.start()
+            try:
+                os.write(self._wakeup_w, b'\0')
+            except BlockingIOError:
+                pass  # поток движка и так будет разбужен
+        else:
+            watch['open_streams'] = len(watch['streams'])
+            for fd, stream_state in watch['streams'].items():
+                threading.Thread(target=self._run_blocking_reader, args=(watch, fd, stream_state),
+                                 name=f"OutputReader-{process.pid}-{stream_state['name']}", daemon=True).start()
+
+    @staticmethod
+    def _feed(watch, stream_state, data):
+        """Добавляет прочитанные байты и выдаёт обработчику все завершённые строки"""
+        buffer = stream_state['buffer']
+        buffer += data
+        start = 0
+        while True:
+            newline = buffer.find(b'\n', start)
+            if newline == -1:
+                break
+            watch['on_line'](stream_state['name'], bytes(buffer[start:newline + 1]))
+            start = newline + 1
+        del buffer[:start]
+
+        # Очень длинную строку без перевода строки выдаём частями
+        if len(buffer) >= MAX_PENDING_LINE_BYTES:
+            watch['on_line'](stream_state['name'], bytes(buffer))
+            buffer.clear()
+
+    @staticmethod
+    def _flush(watch, stream_state):
+        """Выдаёт остаток незавершённой строки при закрытии канала"""
+        if stream_state['buffer']:
+            watch['on_line'](stream_state['name'], bytes(stream_state['buffer']))
+            stream_state['buffer'].clear()
+
+    def _finish(self, watch):
+        if watch['finished']:
+            return
+        watch['finished'] = True
+        returncode = watch['process'].wait()
+        try:
+            watch['on_exit'](returncode)
+        except Exception as e:
+            print(f"Ошибка обработки завершения процесса: {e}")
+
+    # --- Windows: блокирующее чтение, по потоку на канал ---
+
+    def _run_blocking_reader(self, watch, fd, stream_state):
+        try:
+            while True:
+                data = os.read(fd, READ_CHUNK_SIZE)
+                if not data:
+                    break
+                self._feed(watch, stream_state, data)
+        except Exception as e:
+            print(f"Ошибка чтения {stream_state['name']}: {e}")
+        self._flush(watch, stream_state)
+
+        with self._lock:
+            watch['open_streams'] -= 1
+            is_last = watch['open_streams'] == 0
+        if is_last:
+            self._finish(watch)
+
+    # --- Linux/macOS: один поток на все каналы ---
+
+    def _run_selector(self):
+        while True:
+            for key, _ in self._selector.select():
+                if key.data is None:
+                    self._accept_pending()
+                    continue
+                kind, watch, stream_state = key.data
+                # Канал мог быть закрыт завершением процесса раньше в этой же пачке событий,
+                # а его номер - уже выдан другому файлу
+                if kind == 'stream' and watch['streams'].get(key.fd) is not stream_state:
+                    continue
+                try:
+                    if kind == 'exit':
+                        self._on_process_exit(watch)
+                    else:
+                        self._read_stream(watch, key.fd, stream_state)
+                except Exception as e:
+                    print(f"Ошибка движка вывода: {e}")
+
+    def _accept_pending(self):
+        try:
+            while os.read(self._wakeup_r, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+        with self._lock:
+            pending, self._pending = self._pending, []
+
+        for watch in pending:
+            for fd, stream_state in watch['streams'].items():
+                os.set_blocking(fd, False)
+                self._selector.register(fd, selectors.EVENT_READ, ('stream', watch, stream_state))
+            try:
+                # pidfd сообщает о завершении процесса без опроса (Linux 5.3+)
+                watch['pidfd'] = os.pidfd_open(watch['process'].pid)
+                self._selector.register(watch['pidfd'], selectors.EVENT_READ, ('exit', watch, None))
+            except (AttributeError, OSError):
+                watch['pidfd'] = None
+                if not watch['streams']:
+                    self._wait_in_thread(watch)
+
+    def _read_stream(self, watch, fd, stream_state):
+        try:
+            data = os.read(fd, READ_CHUNK_SIZE)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+
+        if data:
+            self._feed(watch, stream_state, data)
+            return
+
+        # Канал закрыт: все процессы, державшие его открытым, завершились или закрыли его
+        self._close_stream(watch, fd)
+        if watch['streams'] or watch['pidfd'] is not None:
+            return
+        if watch['exited']:
+            self._finish(watch)
+        else:
+            # Без pidfd о завершении узнаём по закрытию каналов, wait выполняем вне потока движка
+            self._wait_in_thread(watch)
+
+    def _close_stream(self, watch, fd):
+        stream_state = watch['streams'].pop(fd, None)
+        if stream_state is None:
+            return
+        self._flush(watch, stream_state)
+        self._selector.unregister(fd)
+        try:
+            stream_state['stream'].close()
+        except OSError:
+            pass
+
+    def _on_process_exit(self, watch):
+        # Процесс завершён: забираем код возврата, но каналы читаем дальше - их могут держать открытыми
+        # потомки, пережившие корневой процесс; о завершении сообщаем после закрытия всех каналов
+        watch['process'].wait()
+        self._selector.unregister(watch['pidfd'])
+        os.close(watch['pidfd'])
+        watch['pidfd'] = None
+        watch['exited'] = True
+        if not watch['streams']:
+            self._finish(watch)
+
+    def _wait_in_thread(self, watch):
+        threading.Thread(target=self._finish, args=(watch,), daemon=True).start()
@@ -0,0 +1,128 @@
+"""Хранение каталога скриптов и настроек: отложенная атомарная запись JSON (и двоичных файлов)"""
+import os
+import sys
+import json
+import threading
+import time
+from datetime import datetime
+
+
+# Задержка отложенной записи: изменения за это время сливаются в одну запись на диск (секунды)
+PERSIST_DELAY = 0.5
+
+
+class JsonFileWriter:
+    """
+    Отложенная атомарная запись JSON-файла в фоновом потоке.
+    Серия вызовов schedule() за PERSIST_DELAY превращается в одну запись последнего снимка.
+    Файл пишется во временный и атомарно подменяется через os.replace, поэтому сбой
+    посреди записи не оставляет обрезанный JSON. Если содержимое не изменилось, запись пропускается.
+    """
+
+    def __init__(self, path, delay=PERSIST_DELAY):
+        self.path = path
+        self.delay = delay
+        self._data = None
+        self._pending = False
+        self._deadline = 0
+        self._last_written = None  # текст последней записи (или загруженного файла)
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread = None
+
+    @staticmethod
+    def _serialize(data):
+        return json.dumps(data, indent=4, ensure_ascii=False)
+
+    @staticmethod
+    def _open(path):
+        return open(path, 'w', encoding='utf-8')
+
+    def mark_written(self, data):
+        """Запоминает данные, уже лежащие на диске, чтобы не перезаписывать их без изменений"""
+        self._last_written = self._serialize(data)
+
+    def schedule(self, data):
+        """Планирует запись снимка данных; снимок не должен меняться после передачи"""
+        with self._condition:
+            self._data = data
+            self._pending = True
+            self._deadline = time.monotonic() + self.delay
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"JsonFileWriter-{os.path.basename(self.path)}",
+                                                daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def flush(self):
+        """Немедленно записывает отложенный снимок (при выходе из программы)"""
+        # Запись, уже начатая фоновым потоком, завершается раньше, и её снимок не новее отложенного
+        with self._write_lock:
+            self._write_pending()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                # Ждём, пока поток изменений не затихнет
+                while self._pending and time.monotonic() < self._deadline:
+                    self._condition.wait(self._deadline - time.monotonic())
+            with self._write_lock:
+                self._write_pending()
+
+    def _write_pending(self):
+        """Забирает последний снимок и пишет его; вызывается под _write_lock, чтобы старый снимок не лёг поверх нового"""
+        with self._condition:
+            if not self._pending:
+                return
+            data = self._data
+            self._pending = False
+        try:
+            text = self._serialize(data)
+            if text == self._last_written:
+                return
+
+            temp_path = self.path + ".tmp"
+            with self._open(temp_path) as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+            self._last_written = text
+        except Exception as e:
+            print(f"Ошибка записи {self.path}: {str(e)}")
+
+
+class BinaryFileWriter(JsonFileWriter):
+    """Та же отложенная атомарная запись для уже готовых байтов (schedule(bytes))"""
+
+    @staticmethod
+    def _serialize(data):
+        return bytes(data)
+
+    @staticmethod
+    def _open(path):
+        return open(path, 'wb')
+
+
+def quarantine_corrupt_file(path):
+    """Переименовывает повреждённый файл, чтобы следующая запись не затёрла данные пользователя"""
+    corrupt_path = f"{path}.corrupt-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+    try:
+        os.replace(path, corrupt_path)
+        print(f"Повреждённый файл сохранён как {corrupt_path}")
+    except OSError as e:
+        print(f"Не удалось переименовать повреждённый файл {path}: {e}")
+
+
+# Определяем базовый путь для работы с файлами в EXE
+def get_base_path():
+    if getattr(sys, 'frozen', False):
+        # Если программа запущена как EXE
+        return os.path.dirname(sys.executable)
+    else:
+        # Если программа запущена как скрипт - каталог рядом с пакетом psm (там же, где main.py)
+        return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BASE_PATH = get_base_path()
@@ -0,0 +1,283 @@
+"""
+Приоритет, приоритет ввода-вывода и привязка к ядрам CPU для процессов скриптов (через psutil),
+а также автоматическое распределение тяжёлых скриптов по ядрам по истории загрузки.
+"""
+import math
+import os
+import sys
+import threading
+
+# Уровни приоритета процесса (по умолчанию - как у менеджера, то есть 'normal')
+PRIORITY_LEVELS = ('idle', 'below_normal', 'normal', 'above_normal', 'high')
+# Уровни приоритета ввода-вывода
+IO_PRIORITY_LEVELS = ('low', 'normal', 'high')
+
+# Значения nice для POSIX; повышение приоритета (отрицательный nice) обычно требует прав root
+POSIX_NICE = {'idle': 19, 'below_normal': 10, 'normal': 0, 'above_normal': -5, 'high': -10}
+
+# Период пересчёта автоматического распределения по ядрам (секунды)
+PLACEMENT_INTERVAL = 10.0
+# Скрипт считается тяжёлым, если его сглаженная загрузка выше этого порога (% одного ядра)
+PLACEMENT_HEAVY_THRESHOLD = 50.0
+# Тяжёлый скрипт снова считается лёгким только ниже этой доли порога (чтобы привязка не дёргалась)
+PLACEMENT_RELEASE_RATIO = 0.5
+# Вес нового замера в экспоненциально сглаженной загрузке
+PLACEMENT_SMOOTHING = 0.3
+
+
+def parse_cpu_list(text):
+    """Разбирает список ядер вида "0-3,6" в отсортированный список номеров; пустая строка - все ядра (None)"""
+    text = (text or "").strip()
+    if not text:
+        return None
+    cpus = set()
+    for part in text.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, sep, last = part.partition('-')
+        try:
+            if sep:
+                cpus.update(range(int(first), int(last) + 1))
+            else:
+                cpus.add(int(first))
+        except ValueError:
+            raise ValueError(f"Некорректный список ядер: {text}")
+    if not cpus or min(cpus) < 0:
+        raise ValueError(f"Некорректный список ядер: {text}")
+    return sorted(cpus)
+
+
+def format_cpu_list(cpus):
+    """Обратное к parse_cpu_list: [0, 1, 2, 3, 6] -> "0-3,6" """
+    if not cpus:
+        return ""
+    ranges = []
+    start = previous = cpus[0]
+    for cpu in list(cpus[1:]) + [None]:
+        if cpu is not None and cpu == previous + 1:
+            previous = cpu
+            continue
+        ranges.append(str(start) if start == previous else f"{start}-{previous}")
+        if cpu is not None:
+            start = previous = cpu
+    return ",".join(ranges)
+
+
+def _priority_value(psutil, level):
+    if sys.platform == 'win32':
+        return {
+            'idle': psutil.IDLE_PRIORITY_CLASS,
+            'below_normal': psutil.BELOW_NORMAL_PRIORITY_CLASS,
+            'normal': psutil.NORMAL_PRIORITY_CLASS,
+            'above_normal': psutil.ABOVE_NORMAL_PRIORITY_CLASS,
+            'high': psutil.HIGH_PRIORITY_CLASS,
+        }[level]
+    return POSIX_NICE[level]
+
+
+def _set_io_priority(psutil, process, level):
+    if sys.platform == 'win32':
+        process.ionice({
+            'low': psutil.IOPRIO_LOW,
+            'normal': psutil.IOPRIO_NORMAL,
+            'high': psutil.IOPRIO_HIGH,
+        }[level])
+    elif hasattr(psutil, 'IOPRIO_CLASS_BE'):
+        # Linux: класс IDLE для низкого, "best effort" с уровнем 4 (по умолчанию) или 0 для высокого
+        if level == 'low':
+            process.ionice(psutil.IOPRIO_CLASS_IDLE)
+        else:
+            process.ionice(psutil.IOPRIO_CLASS_BE, 4 if level == 'normal' else 0)
+    else:
+        raise NotImplementedError("приоритет ввода-вывода не поддерживается на этой платформе")
+
+
+def apply_process_settings(pid, script_info, previous_info=None):
+    """
+    Применяет к процессу и его потомкам приоритет, приоритет ввода-вывода и привязку к ядрам из настроек скрипта.
+    Незаданные настройки не трогаются, а снятые (были в previous_info) возвращаются к обычным значениям.
+    Возвращает список ошибок (пустой, если всё применено).
+    """
+    priority = script_info.get('priority')
+    io_priority = script_info.get('io_priority')
+    affinity = script_info.get('cpu_affinity')
+    if previous_info:
+        if previous_info.get('priority') and not priority:
+            priority = 'normal'
+        if previous_info.get('io_priority') and not io_priority:
+            io_priority = 'normal'
+        if previous_info.get('cpu_affinity') and not affinity:
+            affinity = list(range(os.cpu_count() or 1))
+    if not (priority or io_priority or affinity):
+        return []
+
+    import psutil
+
+    processes = _process_tree(psutil, pid)
+    if not processes:
+        return []
+
+    # Настройка применяется ко всему дереву процессов скрипта; ошибка одного вида сообщается один раз
+    errors = {}
+    for process in processes:
+        if priority in PRIORITY_LEVELS:
+            try:
+                process.nice(_priority_value(psutil, priority))
+            except psutil.NoSuchProcess:
+                continue
+            except (psutil.Error, OSError) as e:
+                errors.setdefault('priority', f"приоритет: {e}")
+        if io_priority in IO_PRIORITY_LEVELS:
+            try:
+                _set_io_priority(psutil, process, io_priority)
+            except psutil.NoSuchProcess:
+                continue
+            except (psutil.Error, OSError, NotImplementedError, AttributeError) as e:
+                errors.setdefault('io_priority', f"приоритет ввода-вывода: {e}")
+        if affinity:
+            try:
+                process.cpu_affinity(list(affinity))
+            except psutil.NoSuchProcess:
+                continue
+            except (psutil.Error, OSError, ValueError, AttributeError) as e:
+                errors.setdefault('cpu_affinity', f"ядра CPU: {e}")
+    return list(errors.values())
+
+
+def _process_tree(psutil, pid):
+    """Процесс и все его потомки (пустой список, если процесса уже нет)"""
+    try:
+        process = psutil.Process(pid)
+        return [process] + process.children(recursive=True)
+    except psutil.NoSuchProcess:
+        return []
+
+
+def affinity_supported():
+    """Можно ли задавать привязку к ядрам на этой платформе (в macOS нельзя)"""
+    import psutil
+    return hasattr(psutil.Process, 'cpu_affinity')
+
+
+class AutoPlacer(threading.Thread):
+    """
+    Автоматическое распределение тяжёлых скриптов по ядрам.
+    Раз в MONITOR_INTERVAL берёт загрузку скриптов из снимков ResourceSampler и сглаживает её,
+    раз в PLACEMENT_INTERVAL закрепляет за каждым тяжёлым скриптом столько наименее занятых ядер,
+    сколько ему нужно (ceil(загрузка / 100)). Остальные скрипты остаются на всех ядрах, поэтому
+    тяжёлые скрипты не собираются на одних и тех же ядрах и не вытесняют лёгкие.
+    Скрипты с явно заданной привязкой к ядрам в распределении не участвуют (их нет в targets).
+    """
+
+    def __init__(self, sampler, interval=PLACEMENT_INTERVAL, heavy_threshold=PLACEMENT_HEAVY_THRESHOLD):
+        super().__init__(name="AutoPlacer", daemon=True)
+        import psutil
+        self._psutil = psutil
+        self.sampler = sampler
+        self.interval = interval
+        self.heavy_threshold = heavy_threshold
+        self.cpu_count = psutil.cpu_count() or 1
+        self.all_cpus = list(range(self.cpu_count))
+        self.placements = {}  # script_uuid -> (pid, [ядра]) закреплённых тяжёлых скриптов
+        self._load = {}  # script_uuid -> (pid, сглаженная загрузка в % одного ядра)
+        self._targets = {}  # script_uuid -> pid
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def set_targets(self, targets):
+        """Задаёт скрипты, участвующие в распределении: словарь script_uuid -> pid"""
+        with self._lock:
+            self._targets = dict(targets)
+
+    def stop(self):
+        """Останавливает распределение и возвращает закреплённым скриптам все ядра"""
+        self._stop_event.set()
+
+    def run(self):
+        elapsed = 0.0
+        last_timestamp = None
+        while not self._stop_event.wait(self.sampler.interval):
+            snapshot = self.sampler.snapshot
+            if snapshot.timestamp != last_timestamp:
+                last_timestamp = snapshot.timestamp
+                self._observe(snapshot)
+            elapsed += self.sampler.interval
+            if elapsed >= self.interval:
+                elapsed = 0.0
+                try:
+                    self.rebalance()
+                except Exception as e:
+                    print(f"Ошибка распределения скриптов по ядрам: {e}")
+        self._release_all()
+
+    def _observe(self, snapshot):
+        """Добавляет замер загрузки в сглаженную историю каждого скрипта"""
+        with self._lock:
+            targets = dict(self._targets)
+        load = {}
+        for script_uuid, pid in targets.items():
+            metrics = snapshot.scripts.get(script_uuid)
+            if metrics is None or metrics.pid != pid or not metrics.alive:
+                continue
+            previous_pid, previous = self._load.get(script_uuid, (pid, metrics.cpu))
+            if previous_pid != pid:
+                previous = metrics.cpu
+            load[script_uuid] = (pid, previous + PLACEMENT_SMOOTHING * (metrics.cpu - previous))
+        self._load = load
+
+    def rebalance(self):
+        """Пересчитывает закрепление тяжёлых скриптов за ядрами"""
+        release_threshold = self.heavy_threshold * PLACEMENT_RELEASE_RATIO
+        heavy = {}
+        for script_uuid, (pid, load) in self._load.items():
+            placed = self.placements.get(script_uuid)
+            still_heavy = placed is not None and placed[0] == pid and load >= release_threshold
+            if load >= self.heavy_threshold or still_heavy:
+                heavy[script_uuid] = (pid, load)
+
+        # Скрипты, которые стали лёгкими, возвращаются на все ядра; завершённые и получившие
+        # явную привязку к ядрам просто забываются
+        with self._lock:
+            targets = dict(self._targets)
+        for script_uuid in [u for u in self.placements if u not in heavy]:
+            pid, _ = self.placements.pop(script_uuid)
+            if targets.get(script_uuid) == pid:
+                self._set_affinity(pid, self.all_cpus)
+
+        # Сначала учитываем уже закреплённые скрипты (без лишних перемещений), затем новые - от самых тяжёлых
+        core_load = [0.0] * self.cpu_count
+        order = sorted(heavy.items(), key=lambda item: (item[0] not in self.placements, -item[1][1]))
+        for script_uuid, (pid, load) in order:
+            needed = min(self.cpu_count, max(1, math.ceil(load / 100)))
+            placed = self.placements.get(script_uuid)
+            if placed is not None and placed[0] == pid and len(placed[1]) == needed:
+                cpus = placed[1]
+            else:
+                cpus = sorted(sorted(range(self.cpu_count), key=lambda cpu: core_load[cpu])[:needed])
+                if self._set_affinity(pid, cpus):
+                    self.placements[script_uuid] = (pid, cpus)
+                else:
+                    self.placements.pop(script_uuid, None)
+                    continue
+            for cpu in cpus:
+                core_load[cpu] += load / len(cpus)
+
+    def _set_affinity(self, pid, cpus):
+        """Привязывает к ядрам процесс скрипта и его потомков; False, если не удалось для самого процесса"""
+        processes = _process_tree(self._psutil, pid)
+        for index, process in enumerate(processes):
+            try:
+                process.cpu_affinity(cpus)
+            except (self._psutil.Error, OSError, ValueError):
+                if index == 0:
+                    return False
+        return bool(processes)
+
+    def _release_all(self):
+        with self._lock:
+            targets = dict(self._targets)
+        for script_uuid, (pid, _) in self.placements.items():
+            if targets.get(script_uuid) == pid:
+                self._set_affinity(pid, self.all_cpus)
+        self.placements.clear()
@@ -0,0 +1,179 @@
+"""Пул заранее запущенных интерпретаторов для быстрого старта скриптов"""
+import json
+import subprocess
+import threading
+
+from .proctree import PROCESS_GROUP_OPTIONS
+
+
+# Сколько прогретых процессов держать наготове для каждого интерпретатора
+WARM_POOL_SIZE = 1
+WARM_POOL_REFILL_INTERVAL = 2.0
+# Сколько раз подряд прогретый процесс может не запуститься или завершиться в ожидании,
+# прежде чем его интерпретатор исключается из пула (до следующей настройки пула)
+WARM_POOL_MAX_FAILURES = 3
+
+# Код рабочего процесса пула: импортирует модули из argv, ждёт на stdin строку с JSON-заданием
+# и выполняет скрипт как __main__. stdin читается побайтно, чтобы не забрать ввод самого скрипта.
+# До получения задания stdout и stderr направлены в devnull: вывод при импорте модулей некому читать,
+# он переполнил бы канал или достался бы скрипту.
+WARM_WORKER_BOOTSTRAP = r"""
+import json, os, runpy, sys
+_saved = os.dup(1), os.dup(2)
+_null = os.open(os.devnull, os.O_WRONLY)
+os.dup2(_null, 1)
+os.dup2(_null, 2)
+for _name in sys.argv[1:]:
+    try:
+        __import__(_name)
+    except Exception:
+        pass
+_line = b''
+while not _line.endswith(b'\n'):
+    _chunk = os.read(0, 1)
+    if not _chunk:
+        sys.exit(0)
+    _line += _chunk
+_job = json.loads(_line)
+sys.stdout.flush()
+sys.stderr.flush()
+os.dup2(_saved[0], 1)
+os.dup2(_saved[1], 2)
+for _fd in (_null, *_saved):
+    os.close(_fd)
+sys.argv = [_job['path']]
+sys.path[0] = os.path.dirname(os.path.abspath(_job['path']))
+runpy.run_path(_job['path'], run_name='__main__')
+"""
+
+
+class WarmInterpreterPool:
+    """
+    Пул заранее запущенных интерпретаторов с уже импортированными модулями.
+    Для каждого нужного интерпретатора в фоне поддерживается size свободных процессов;
+    acquire() отдаёт один из них под скрипт, а пул тут же готовит замену.
+    Интерпретатор, процессы которого WARM_POOL_MAX_FAILURES раз подряд не дожили до задания,
+    больше не прогревается - его скрипты запускаются обычным способом.
+    """
+
+    def __init__(self, size=WARM_POOL_SIZE, modules=()):
+        self.size = size
+        self.modules = tuple(modules)
+        self._interpreters = set()
+        self._idle = {}  # interpreter -> [Popen, ...]
+        self._failures = {}  # interpreter -> неудачных запусков подряд
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def configure(self, interpreters, size=None, modules=None):
+        """Задаёт набор интерпретаторов и параметры пула; при смене модулей прогретые процессы пересоздаются"""
+        stale = []
+        with self._lock:
+            if size is not None:
+                self.size = max(0, int(size))
+            if modules is not None and tuple(modules) != self.modules:
+                self.modules = tuple(modules)
+                stale = [p for workers in self._idle.values() for p in workers]
+                self._idle.clear()
+            self._interpreters = set(interpreters)
+            self._failures.clear()
+            for interpreter in list(self._idle):
+                if interpreter not in self._interpreters:
+                    stale.extend(self._idle.pop(interpreter))
+        self._discard(stale)
+        self._wakeup.set()
+
+    def acquire(self, interpreter, script_path):
+        """Запускает скрипт в прогретом процессе; возвращает Popen или None, если свободных нет"""
+        process = None
+        while process is None:
+            with self._lock:
+                workers = self._idle.get(interpreter)
+                if not workers:
+                    break
+                candidate = workers.pop(0)
+            if candidate.poll() is not None:
+                continue
+            try:
+                job = json.dumps({'path': script_path}) + '\n'
+                candidate.stdin.write(job.encode('utf-8'))
+                process = candidate
+                with self._lock:
+                    self._failures.pop(interpreter, None)
+            except OSError:
+                self._discard([candidate])
+        self._wakeup.set()
+        return process
+
+    def shutdown(self):
+        self._stopped = True
+        self._wakeup.set()
+        with self._lock:
+            stale = [p for workers in self._idle.values() for p in workers]
+            self._idle.clear()
+        self._discard(stale)
+
+    def _spawn(self, interpreter, modules):
+        return subprocess.Popen(
+            [interpreter, '-c', WARM_WORKER_BOOTSTRAP, *modules],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            stdin=subprocess.PIPE,
+            bufsize=0,
+            **PROCESS_GROUP_OPTIONS)
+
+    def _discard(self, processes):
+        for process in processes:
+            try:
+                process.kill()
+                process.wait(timeout=1)
+            except Exception:
+                pass
+
+    def _record_failure(self, interpreter, count=1):
+        """Учитывает неудачные запуски прогретых процессов; вызывается под _lock"""
+        failures = self._failures.get(interpreter, 0) + count
+        self._failures[interpreter] = failures
+        if failures >= WARM_POOL_MAX_FAILURES > failures - count:
+            print(f"Прогретый интерпретатор {interpreter} не запускается ({failures} раз подряд), "
+                  f"его скрипты будут запускаться обычным способом")
+
+    def _run(self):
+        while not self._stopped:
+            with self._lock:
+                modules = self.modules
+                missing = []
+                for interpreter in self._interpreters:
+                    workers = self._idle.setdefault(interpreter, [])
+                    alive = [p for p in workers if p.poll() is None]
+                    if len(alive) < len(workers):
+                        # Процесс завершился, не дождавшись задания (например, упал при импорте)
+                        self._record_failure(interpreter, len(workers) - len(alive))
+                    workers[:] = alive
+                    if self._failures.get(interpreter, 0) >= WARM_POOL_MAX_FAILURES:
+                        continue
+                    missing.extend([interpreter] * (self.size - len(workers)))
+
+            for interpreter in missing:
+                if self._stopped:
+                    break
+                try:
+                    process = self._spawn(interpreter, modules)
+                except Exception as e:
+                    print(f"Ошибка запуска прогретого интерпретатора {interpreter}: {e}")
+                    with self._lock:
+                        self._record_failure(interpreter)
+                    continue
+                with self._lock:
+                    if self._stopped or modules != self.modules or interpreter not in self._interpreters:
+                        stale = [process]
+                    else:
+                        self._idle.setdefault(interpreter, []).append(process)
+                        stale = []
+                self._discard(stale)
+
+            self._wakeup.wait(WARM_POOL_REFILL_INTERVAL)
+            self._wakeup.clear()
@@ -0,0 +1,171 @@
+"""
+Дерево процессов скрипта: сам процесс и все его потомки (воркеры multiprocessing, вспомогательные программы).
+В POSIX каждый скрипт запускается в собственной сессии, поэтому сигнал получает вся группа процессов,
+в том числе потомки, которые уже потеряли родителя; в Windows дерево находится через psutil.
+"""
+import os
+import signal
+
+# Дополнительные аргументы Popen для процесса скрипта: отдельная сессия и группа процессов в POSIX
+PROCESS_GROUP_OPTIONS = {'start_new_session': True} if os.name == 'posix' else {}
+
+
+def process_children_map(group_leaders=()):
+    """
+    Карта PID -> PID дочерних процессов по одному обходу всех процессов системы.
+    Для group_leaders (процессы скриптов, запущенные с PROCESS_GROUP_OPTIONS) дочерними считаются
+    и все процессы их группы: так в дерево попадают потомки, родитель которых уже завершился.
+    """
+    import psutil
+
+    create_times = {}
+    parents = {}
+    for process in psutil.process_iter(['ppid', 'create_time']):
+        create_times[process.pid] = process.info['create_time']
+        parents[process.pid] = process.info['ppid']
+    children = {}
+    for pid, ppid in parents.items():
+        # Родитель, созданный позже потомка, - это другой процесс с повторно выданным PID (Windows)
+        if ppid and ppid != pid and (create_times.get(ppid) or 0) <= (create_times[pid] or 0):
+            children.setdefault(ppid, []).append(pid)
+    leaders = {pid for pid in group_leaders if pid in parents} if PROCESS_GROUP_OPTIONS else ()
+    if leaders:
+        # getpgid вызывается не для всех процессов системы, а только для возможных осиротевших членов групп:
+        # процесс создан после скрипта, а его нынешний родитель (init, subreaper) - раньше.
+        # Потомки, чей родитель жив, уже найдены обходом по ppid
+        oldest = min(create_times[pid] or 0 for pid in leaders)
+        tree = descendant_pids(leaders, children) | leaders
+        for pid, ppid in parents.items():
+            if pid in tree or (create_times[pid] or 0) < oldest:
+                continue
+            if ppid in parents and (create_times[ppid] or 0) >= oldest:
+                continue
+            try:
+                pgid = os.getpgid(pid)
+            except OSError:
+                continue
+            if pgid in leaders and pgid != pid and parents[pid] != pgid:
+                children.setdefault(pgid, []).append(pid)
+    return children
+
+
+def descendant_pids(roots, children_map):
+    """PID всех потомков процессов roots (сами roots не входят)"""
+    stack = list(roots)
+    found = set(stack)
+    while stack:
+        for child in children_map.get(stack.pop(), ()):
+            if child not in found:
+                found.add(child)
+                stack.append(child)
+    return found.difference(roots)
+
+
+class ProcessTree:
+    """
+    Процесс скрипта (Popen) вместе с потомками, найденными в момент создания объекта.
+    Повторяет интерфейс Popen, который нужен ShutdownCoordinator (pid, poll, terminate, kill):
+    poll() возвращает код выхода только когда завершились и сам процесс, и все его потомки.
+    """
+
+    def __init__(self, process, known=None, children_map=None):
+        import psutil
+
+        self._psutil = psutil
+        self.process = process
+        self.pid = process.pid
+        # Группа процессов есть, только если процесс запущен с PROCESS_GROUP_OPTIONS
+        self._pgid = None
+        if PROCESS_GROUP_OPTIONS:
+            try:
+                if os.getpgid(process.pid) == process.pid:
+                    self._pgid = process.pid
+            except OSError:
+                pass
+        self.members = self._collect(known or {}, children_map)
+
+    def _collect(self, known=None, children_map=None):
+        """
+        Потомки процесса и уже известные процессы дерева (например, осиротевшие) с их потомками.
+        known - PID -> время создания ранее замеченных потомков: PID, выданный с тех пор другому
+        процессу, не совпадёт по времени создания и в дерево не попадёт.
+        children_map - готовая карта process_children_map(), когда останавливается сразу много скриптов.
+        """
+        psutil = self._psutil
+        if children_map is None:
+            children_map = process_children_map([self.pid])
+        roots = [self.pid]
+        members = []
+        for pid, create_time in (known or {}).items():
+            try:
+                process = psutil.Process(pid)
+                if process.create_time() == create_time:
+                    roots.append(pid)
+                    members.append(process)
+            except psutil.Error:
+                pass
+        for pid in descendant_pids(roots, children_map):
+            try:
+                members.append(psutil.Process(pid))
+            except psutil.Error:
+                pass
+        return members
+
+    def _signal_group(self, signum):
+        if self._pgid is None:
+            return
+        try:
+            os.killpg(self._pgid, signum)
+        except OSError:
+            pass
+
+    def _outside_group(self, pid):
+        """Процесс не получает сигнал группы (группы нет или процесс из неё вышел)"""
+        if self._pgid is None:
+            return True
+        try:
+            return os.getpgid(pid) != self._pgid
+        except OSError:
+            return False  # процесс уже завершился
+
+    def terminate(self):
+        """Сигнал завершения всему дереву; каждый процесс получает SIGTERM один раз"""
+        # Обработчик вида "первый SIGTERM - мягкое завершение, второй - немедленный выход"
+        # не должен сработать из-за повторного сигнала, поэтому напрямую - только вышедшим из группы
+        self._signal_group(signal.SIGTERM)
+        if self.process.poll() is None and self._outside_group(self.pid):
+            self.process.terminate()
+        for member in self.members:
+            if not self._outside_group(member.pid):
+                continue
+            try:
+                member.terminate()
+            except self._psutil.Error:
+                pass
+
+    def kill(self):
+        """Принудительное завершение всего дерева, включая потомков, появившихся после terminate()"""
+        known = {member.pid for member in self.members}
+        self.members.extend(member for member in self._collect() if member.pid not in known)
+        self._signal_group(signal.SIGKILL)
+        if self.process.poll() is None:
+            self.process.kill()
+        for member in self.members:
+            try:
+                member.kill()
+            except self._psutil.Error:
+                pass
+
+    def poll(self):
+        """Код выхода процесса скрипта или None, пока жив он сам или хотя бы один его потомок"""
+        returncode = self.process.poll()
+        if returncode is None:
+            return None
+        self.members = [member for member in self.members if self._is_alive(member)]
+        return None if self.members else returncode
+
+    def _is_alive(self, member):
+        try:
+            return member.is_running() and member.status() != self._psutil.STATUS_ZOMBIE
+        except self._psutil.Error:
+            return False
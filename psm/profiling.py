@@ -0,0 +1,42 @@
+"""Отчёт о времени запуска программы: где тратится время до первой отрисовки окна и до конца автозапуска"""
+import os
+import time
+
+
+class StartupProfile:
+    """
+    Отметки этапов запуска. Каждая отметка хранит время с начала отсчёта (обычно - начала
+    импорта main.py); отчёт показывает длительность каждого этапа и накопленное время.
+    Время от создания процесса до начала отсчёта (у сборки PyInstaller onefile - распаковка
+    архива и запуск интерпретатора) определяется через psutil, если он доступен.
+    """
+
+    def __init__(self, origin=None):
+        self.origin = time.perf_counter() if origin is None else origin
+        self._origin_wall = time.time() - (time.perf_counter() - self.origin)
+        self.marks = []  # (этап, секунды от начала отсчёта)
+
+    def mark(self, name):
+        """Отмечает завершение этапа name"""
+        self.marks.append((name, time.perf_counter() - self.origin))
+
+    def process_startup(self):
+        """Секунды от создания процесса до начала отсчёта или None, если узнать нельзя"""
+        try:
+            import psutil
+            created = psutil.Process(os.getpid()).create_time()
+        except Exception:
+            return None
+        return max(0.0, self._origin_wall - created)
+
+    def report(self):
+        """Текст отчёта: длительность каждого этапа и время с начала отсчёта (мс)"""
+        lines = ["Профиль запуска (мс):"]
+        before = self.process_startup()
+        if before is not None:
+            lines.append(f"  {'запуск процесса и интерпретатора':<36} {before * 1000:>8.0f}")
+        previous = 0.0
+        for name, at in self.marks:
+            lines.append(f"  {name:<36} {(at - previous) * 1000:>8.0f}   итого {at * 1000:>8.0f}")
+            previous = at
+        return "\n".join(lines)
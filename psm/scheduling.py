@@ -0,0 +1,199 @@
+"""Порядок запуска скриптов при старте и параллельная остановка групп процессов"""
+import threading
+import time
+
+
+# Параметры планировщика автозапуска по умолчанию (переопределяются в settings.json)
+AUTOSTART_MAX_CONCURRENT = 2
+AUTOSTART_CPU_THRESHOLD = 85  # % общей загрузки CPU, выше которого новые запуски ждут
+AUTOSTART_TICK_MS = 200
+# Запуск без вывода считается завершённым через это время (секунды)
+AUTOSTART_LAUNCH_TIMEOUT = 30.0
+# Дольше этого не ждём снижения нагрузки, если сейчас ничего не запускается (секунды)
+AUTOSTART_CPU_MAX_WAIT = 15.0
+
+
+class AutostartScheduler:
+    """
+    Планировщик автозапуска скриптов.
+    Запускает скрипты по приоритету (больше - раньше) с индивидуальной задержкой, одновременно
+    держит не больше max_concurrent "запускающихся" скриптов (от старта до первого вывода)
+    и не начинает новый запуск, пока общая загрузка CPU выше порога.
+    Тики выполняются через schedule_fn (root.after), уведомления можно слать из любого потока.
+    """
+
+    def __init__(self, start_fn, schedule_fn, cpu_load_fn=None, name_fn=None,
+                 max_concurrent=AUTOSTART_MAX_CONCURRENT, cpu_threshold=AUTOSTART_CPU_THRESHOLD, on_finished=None):
+        self.start_fn = start_fn
+        self.schedule_fn = schedule_fn
+        self.cpu_load_fn = cpu_load_fn
+        self.name_fn = name_fn or (lambda script_uuid: script_uuid)
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.cpu_threshold = cpu_threshold
+        self.on_finished = on_finished
+        self.launch_times = {}  # script_uuid -> секунды от запуска до первого вывода
+        self._queue = []  # (-priority, порядок, script_uuid, задержка)
+        self._launching = {}  # script_uuid -> время запуска (monotonic)
+        self._lock = threading.Lock()
+        self._started_at = None
+        self._blocked_since = None
+        self._running = False
+
+    def add(self, script_uuid, priority=0, delay=0.0):
+        with self._lock:
+            self._queue.append((-int(priority), len(self._queue), script_uuid, max(0.0, float(delay))))
+            self._queue.sort()
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._started_at = time.monotonic()
+        self._tick()
+
+    def notify_first_output(self, script_uuid):
+        """Скрипт выдал первую строку - запуск завершён"""
+        with self._lock:
+            spawned_at = self._launching.pop(script_uuid, None)
+        if spawned_at is not None:
+            elapsed = time.monotonic() - spawned_at
+            self.launch_times[script_uuid] = elapsed
+            print(f"Автозапуск: '{self.name_fn(script_uuid)}' - первый вывод через {elapsed:.2f} с")
+
+    def notify_exit(self, script_uuid):
+        """Скрипт завершился, не успев ничего вывести"""
+        with self._lock:
+            spawned_at = self._launching.pop(script_uuid, None)
+        if spawned_at is not None:
+            print(f"Автозапуск: '{self.name_fn(script_uuid)}' завершился через "
+                  f"{time.monotonic() - spawned_at:.2f} с без вывода")
+
+    def _admit_by_cpu(self, now):
+        """Разрешает новый запуск, если загрузка CPU ниже порога"""
+        cpu_load = self.cpu_load_fn() if self.cpu_load_fn else None
+        if cpu_load is None or cpu_load < self.cpu_threshold:
+            self._blocked_since = None
+            return True
+
+        # Не ждём бесконечно: система может быть загружена чем-то посторонним
+        if self._blocked_since is None:
+            self._blocked_since = now
+        return not self._launching and now - self._blocked_since >= AUTOSTART_CPU_MAX_WAIT
+
+    def _tick(self):
+        now = time.monotonic()
+        to_start = []
+        with self._lock:
+            # Скрипты, которые долго молчат после запуска, больше не занимают слот
+            for script_uuid, spawned_at in list(self._launching.items()):
+                if now - spawned_at >= AUTOSTART_LAUNCH_TIMEOUT:
+                    del self._launching[script_uuid]
+                    print(f"Автозапуск: '{self.name_fn(script_uuid)}' без вывода за {AUTOSTART_LAUNCH_TIMEOUT:.0f} с")
+
+            while len(self._launching) + len(to_start) < self.max_concurrent:
+                ready = [entry for entry in self._queue if now - self._started_at >= entry[3]]
+                if not ready or not self._admit_by_cpu(now):
+                    break
+                self._queue.remove(ready[0])
+                to_start.append(ready[0][2])
+
+        for script_uuid in to_start:
+            spawned_at = time.monotonic()
+            with self._lock:
+                self._launching[script_uuid] = spawned_at
+            if not self.start_fn(script_uuid):
+                with self._lock:
+                    self._launching.pop(script_uuid, None)
+
+        with self._lock:
+            finished = not self._queue and not self._launching
+        if finished:
+            self._running = False
+            print(f"Автозапуск завершён за {time.monotonic() - self._started_at:.2f} с")
+            if self.on_finished is not None:
+                self.on_finished()
+            return
+        self.schedule_fn(AUTOSTART_TICK_MS, self._tick)
+
+
+# Сколько процессы получают на корректное завершение до принудительного kill (секунды)
+SHUTDOWN_GRACE_PERIOD = 5.0
+# Сколько ждём процессы после kill (секунды)
+SHUTDOWN_KILL_WAIT = 2.0
+SHUTDOWN_POLL_INTERVAL = 0.05
+
+
+class ShutdownCoordinator:
+    """
+    Параллельная остановка группы процессов.
+    Сигнал завершения отправляется всем процессам сразу, ожидание идёт в фоновом потоке
+    с одним общим сроком; кто не успел к сроку - завершается принудительно.
+    """
+
+    def __init__(self, processes, grace_period=SHUTDOWN_GRACE_PERIOD):
+        self.processes = list(processes)
+        self.grace_period = grace_period
+        self.total = len(self.processes)
+        self.finished = 0
+        self.killed = 0
+        self.done = threading.Event()
+        self._deadline = None
+        self._thread = None
+
+    def start(self):
+        """Отправляет всем процессам сигнал завершения и запускает ожидание"""
+        for process in self.processes:
+            try:
+                if process.poll() is None:
+                    process.terminate()
+            except Exception as e:
+                print(f"Ошибка отправки сигнала завершения процессу {process.pid}: {e}")
+        self._deadline = time.monotonic() + self.grace_period
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def kill_now(self):
+        """Не ждать окончания срока - завершить оставшиеся процессы немедленно"""
+        self._deadline = time.monotonic()
+
+    def progress(self):
+        return self.finished, self.total
+
+    def remaining(self):
+        """Секунды до принудительного завершения оставшихся процессов (0, если срок истёк или не начат)"""
+        deadline = self._deadline
+        if deadline is None:
+            return 0
+        return max(0, deadline - time.monotonic())
+
+    def _wait_all(self, pending, deadline_fn):
+        while pending and time.monotonic() < deadline_fn():
+            for process in list(pending):
+                try:
+                    exited = process.poll() is not None
+                except Exception:
+                    exited = True
+                if exited:
+                    pending.remove(process)
+                    self.finished += 1
+            if pending:
+                time.sleep(SHUTDOWN_POLL_INTERVAL)
+        return pending
+
+    def _run(self):
+        pending = self._wait_all(list(self.processes), lambda: self._deadline)
+
+        for process in pending:
+            try:
+                process.kill()
+                self.killed += 1
+            except Exception as e:
+                print(f"Ошибка принудительного завершения процесса {process.pid}: {e}")
+
+        kill_deadline = time.monotonic() + SHUTDOWN_KILL_WAIT
+        pending = self._wait_all(pending, lambda: kill_deadline)
+        if pending:
+            print(f"Не удалось дождаться завершения процессов: {[p.pid for p in pending]}")
+            self.finished += len(pending)
+        self.done.set()
@@ -0,0 +1,266 @@
+"""
+Поиск по выводу скриптов: потоковый просмотр буферов в памяти и журналов на диске блоками
+скомпилированным регулярным выражением (подстрока - тоже выражение, экранированное re.escape),
+выдача результатов по мере нахождения с контекстом, отмена и необязательный триграммный индекс.
+"""
+import re
+import threading
+import time
+
+
+# Сколько строк буфера в памяти просматривается за один блок
+SEARCH_BLOCK_LINES = 4096
+# Строк контекста до и после найденной строки
+SEARCH_CONTEXT_LINES = 2
+# Предел числа результатов одного поиска
+SEARCH_MAX_RESULTS = 1000
+# Как часто найденное передаётся получателю (секунды)
+SEARCH_REPORT_INTERVAL = 0.1
+
+# Индекс: строк в одном куске и период дообработки нового вывода (секунды)
+INDEX_CHUNK_LINES = 4096
+INDEX_INTERVAL = 30.0
+
+
+def compile_query(query, regex=False, ignore_case=False):
+    """Компилирует запрос; ValueError для пустого запроса или некорректного выражения"""
+    if not query:
+        raise ValueError("Пустой запрос")
+    flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+    try:
+        return re.compile(query if regex else re.escape(query), flags)
+    except re.error as e:
+        raise ValueError(f"Некорректное регулярное выражение: {e}")
+
+
+def iter_blocks(source, start=None, stop=None):
+    """Блоки текста источника вывода: пары (номер первой строки, текст из целых строк)"""
+    if hasattr(source, 'iter_blocks'):
+        yield from source.iter_blocks(start, stop)
+        return
+    first, end = source.first_index, source.end_index
+    line = first if start is None else max(start, first)
+    stop = end if stop is None else min(stop, end)
+    while line < stop:
+        lines = source.get_lines(line, min(stop, line + SEARCH_BLOCK_LINES))
+        if not lines:
+            return
+        yield max(line, source.first_index), ''.join(lines)
+        line = max(line, source.first_index) + len(lines)
+
+
+def search_source(source, pattern, start=None, stop=None, cancel_event=None):
+    """
+    Совпадения в строках [start, stop) источника вывода (OutputBuffer или ScriptLog):
+    генератор (номер строки, текст строки, начало совпадения, конец совпадения); одна строка - один результат.
+    """
+    for first_line, text in iter_blocks(source, start, stop):
+        if cancel_event is not None and cancel_event.is_set():
+            return
+        line = first_line
+        counted = 0  # до этой позиции переводы строк уже учтены в line
+        match = pattern.search(text)
+        while match:
+            begin = match.start()
+            line += text.count('\n', counted, begin)
+            line_start = text.rfind('\n', 0, begin) + 1
+            line_end = text.find('\n', begin) + 1 or len(text)
+            counted = line_start
+            yield (line, text[line_start:line_end].rstrip('\n'),
+                   begin - line_start, min(match.end(), line_end) - line_start)
+            if line_end >= len(text) or (cancel_event is not None and cancel_event.is_set()):
+                break
+            match = pattern.search(text, line_end)
+
+
+class SearchMatch:
+    """Найденная строка с контекстом; start и end - границы совпадения в строке"""
+
+    __slots__ = ('script_uuid', 'line', 'text', 'start', 'end', 'before', 'after')
+
+    def __init__(self, script_uuid, line, text, start, end, before=(), after=()):
+        self.script_uuid = script_uuid
+        self.line = line
+        self.text = text
+        self.start = start
+        self.end = end
+        self.before = before
+        self.after = after
+
+
+class OutputSearch(threading.Thread):
+    """
+    Поиск по выводу нескольких скриптов в фоновом потоке.
+    sources - список (script_uuid, источник вывода). Найденное передаётся пачками через
+    on_results(список SearchMatch) не чаще раза в SEARCH_REPORT_INTERVAL, по окончании вызывается
+    on_finished(число найденных, True - если поиск остановлен пределом результатов).
+    Оба обратных вызова приходят из фонового потока. cancel() прерывает поиск между блоками.
+    """
+
+    def __init__(self, sources, pattern, on_results, on_finished=None, literal=None, index=None,
+                 max_results=SEARCH_MAX_RESULTS, context_lines=SEARCH_CONTEXT_LINES):
+        super().__init__(name="OutputSearch", daemon=True)
+        self.sources = list(sources)
+        self.pattern = pattern
+        self.on_results = on_results
+        self.on_finished = on_finished
+        self.literal = literal  # подстрока запроса - по ней индекс сужает просмотр
+        self.index = index
+        self.max_results = max_results
+        self.context_lines = context_lines
+        self.found = 0
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def run(self):
+        batch = []
+        last_report = time.monotonic()
+        truncated = False
+        try:
+            for script_uuid, source in self.sources:
+                ranges = [(None, None)]
+                if self.index is not None and self.literal:
+                    ranges = self.index.candidates(script_uuid, source, self.literal)
+                for start, stop in ranges:
+                    for line, text, begin, end in search_source(source, self.pattern, start, stop,
+                                                                self._cancel_event):
+                        context = self.context_lines
+                        before = source.get_lines(line - context, line) if context else []
+                        after = source.get_lines(line + 1, line + 1 + context) if context else []
+                        batch.append(SearchMatch(script_uuid, line, text, begin, end,
+                                                 [l.rstrip('\n') for l in before], [l.rstrip('\n') for l in after]))
+                        self.found += 1
+                        if self.found >= self.max_results:
+                            truncated = True
+                            return
+                        if time.monotonic() - last_report >= SEARCH_REPORT_INTERVAL:
+                            self.on_results(batch)
+                            batch = []
+                            last_report = time.monotonic()
+                    if self.cancelled:
+                        return
+        except Exception as e:
+            print(f"Ошибка поиска по выводу: {e}")
+        finally:
+            if batch:
+                self.on_results(batch)
+            if self.on_finished is not None:
+                self.on_finished(self.found, truncated)
+
+
+class TrigramIndex(threading.Thread):
+    """
+    Необязательный индекс для повторного поиска подстроки по выводу всех скриптов.
+    Вывод каждого скрипта делится на куски по INDEX_CHUNK_LINES строк; для каждой триграммы
+    (три подряд идущих символа в нижнем регистре) хранится битовая маска кусков, где она встречается;
+    биты отсчитываются от первого сохранившегося куска, удалённые ротацией журнала куски выбрасываются.
+    Поиск просматривает только куски, в которых есть все триграммы запроса, и ещё не проиндексированный хвост.
+    Индексируются только журналы на диске (ScriptLog): их номера строк не меняются между запусками.
+    sources_fn() возвращает словарь script_uuid -> источник вывода; новый вывод дообрабатывается
+    в фоне раз в INDEX_INTERVAL.
+    """
+
+    def __init__(self, sources_fn, interval=INDEX_INTERVAL, chunk_lines=INDEX_CHUNK_LINES):
+        super().__init__(name="TrigramIndex", daemon=True)
+        self.sources_fn = sources_fn
+        self.interval = interval
+        self.chunk_lines = chunk_lines
+        # script_uuid -> [словарь триграмма -> маска кусков, номер строки конца индекса, номер куска бита 0]
+        self.scripts = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while True:
+            try:
+                for script_uuid, source in list(self.sources_fn().items()):
+                    if self._stop_event.is_set():
+                        return
+                    self.update(script_uuid, source)
+            except Exception as e:
+                print(f"Ошибка индексации вывода: {e}")
+            if self._stop_event.wait(self.interval):
+                return
+
+    def update(self, script_uuid, source):
+        """Добавляет в индекс завершённые куски вывода скрипта, появившиеся с прошлого раза"""
+        if not hasattr(source, 'iter_blocks'):
+            return
+        chunk_lines = self.chunk_lines
+        first_chunk = source.first_index // chunk_lines
+        with self._lock:
+            entry = self.scripts.get(script_uuid)
+            if entry is None or source.end_index < entry[1]:
+                # Нового скрипта (или журнала, начатого заново) ещё нет в индексе
+                entry = [{}, first_chunk * chunk_lines, first_chunk]
+                self.scripts[script_uuid] = entry
+            elif first_chunk > entry[2]:
+                self._prune(entry, first_chunk)
+        trigrams, indexed_end, base = entry
+        while indexed_end + chunk_lines <= source.end_index and not self._stop_event.is_set():
+            text = ''.join(source.get_lines(indexed_end, indexed_end + chunk_lines)).lower()
+            bit = 1 << (indexed_end // chunk_lines - base)
+            found = {text[i:i + 3] for i in range(len(text) - 2)}
+            with self._lock:
+                for trigram in found:
+                    trigrams[trigram] = trigrams.get(trigram, 0) | bit
+                indexed_end += chunk_lines
+                entry[1] = indexed_end
+
+    def _prune(self, entry, first_chunk):
+        """
+        Убирает куски, удалённые из журнала при ротации: маски сдвигаются так, что бит 0 - первый
+        сохранившийся кусок, поэтому их размер не растёт вместе с номерами строк. Вызывается под _lock.
+        """
+        trigrams, indexed_end, base = entry
+        shift = first_chunk - base
+        for trigram, mask in list(trigrams.items()):
+            mask >>= shift
+            if mask:
+                trigrams[trigram] = mask
+            else:
+                del trigrams[trigram]
+        entry[1] = max(indexed_end, first_chunk * self.chunk_lines)
+        entry[2] = first_chunk
+
+    def candidates(self, script_uuid, source, literal):
+        """Диапазоны строк [start, stop), где может встретиться literal; без индекса - весь вывод"""
+        literal = literal.lower()
+        with self._lock:
+            entry = self.scripts.get(script_uuid)
+            if entry is None or len(literal) < 3:
+                return [(None, None)]
+            trigrams, indexed_end, base = entry
+            mask = -1
+            for i in range(len(literal) - 2):
+                mask &= trigrams.get(literal[i:i + 3], 0)
+                if not mask:
+                    break
+        ranges = []
+        chunk = base
+        while mask > 0:
+            if mask & 1:
+                start = chunk * self.chunk_lines
+                if ranges and ranges[-1][1] == start:
+                    ranges[-1] = (ranges[-1][0], start + self.chunk_lines)
+                else:
+                    ranges.append((start, start + self.chunk_lines))
+            mask >>= 1
+            chunk += 1
+        # Ещё не проиндексированный хвост просматривается целиком
+        ranges.append((indexed_end, None))
+        return ranges
+
+    def forget(self, script_uuid):
+        """Удаляет индекс скрипта (при удалении скрипта из каталога)"""
+        with self._lock:
+            self.scripts.pop(script_uuid, None)
@@ -0,0 +1,210 @@
+"""
+История метрик скриптов: кольцевые буферы на массивах (array) в нескольких разрешениях
+и компактный двоичный файл, в котором история переживает перезапуск программы.
+"""
+import math
+import struct
+import sys
+import threading
+import time
+from array import array
+
+from .persistence import BinaryFileWriter, quarantine_corrupt_file
+
+
+# Поля истории: CPU (% одного ядра), память (байты RSS), число потоков, диск (байт/с чтения и записи)
+HISTORY_FIELDS = ('cpu', 'rss', 'threads', 'io')
+# Разрешения истории: (шаг в секундах, число точек) - 5 минут по секунде, час по 10 секунд, сутки по минуте
+HISTORY_RESOLUTIONS = ((1, 300), (10, 360), (60, 1440))
+# Имя файла истории и период его сохранения (секунды)
+HISTORY_FILE = "metrics_history.bin"
+HISTORY_SAVE_INTERVAL = 60.0
+
+# Заголовок файла: сигнатура, версия, число полей, разрешений и скриптов
+HISTORY_MAGIC = b"PSMH"
+HISTORY_VERSION = 1
+_HEADER = struct.Struct("<4sHHHI")
+_RESOLUTION = struct.Struct("<II")
+_UUID_SIZE = 36
+
+
+class RingSeries:
+    """
+    Кольцевой буфер одного разрешения: точка номер n покрывает время [n * step, (n + 1) * step).
+    Значения всех полей хранятся подряд в array('f'), номера точек - в array('q'), поэтому
+    память не зависит от длительности работы. Несколько замеров в одной точке сливаются
+    в максимум, чтобы на грубых разрешениях не пропадали кратковременные пики.
+    """
+
+    __slots__ = ('step', 'capacity', 'values', 'buckets')
+
+    def __init__(self, step, capacity, field_count=len(HISTORY_FIELDS)):
+        self.step = step
+        self.capacity = capacity
+        self.values = array('f', [math.nan]) * (capacity * field_count)
+        self.buckets = array('q', [-1]) * capacity
+
+    def add(self, timestamp, sample):
+        bucket = int(timestamp // self.step)
+        slot = bucket % self.capacity
+        base = slot * len(sample)
+        values = self.values
+        if self.buckets[slot] != bucket:
+            self.buckets[slot] = bucket
+            values[base:base + len(sample)] = array('f', sample)
+        else:
+            for i, value in enumerate(sample):
+                if not value <= values[base + i]:
+                    values[base + i] = value
+
+    def window(self, field_index, count, now, field_count=len(HISTORY_FIELDS)):
+        """Последние count точек поля до момента now (старые - первыми); None там, где данных нет"""
+        count = min(count, self.capacity)
+        last = int(now // self.step)
+        result = []
+        for bucket in range(last - count + 1, last + 1):
+            slot = bucket % self.capacity
+            if self.buckets[slot] == bucket:
+                value = self.values[slot * field_count + field_index]
+                result.append(None if math.isnan(value) else value)
+            else:
+                result.append(None)
+        return result
+
+
+class MetricsHistory:
+    """
+    История метрик всех скриптов каталога: по RingSeries на каждое разрешение.
+    Запись идёт из потока сбора метрик, чтение - из потока интерфейса, поэтому доступ под блокировкой.
+    Раз в HISTORY_SAVE_INTERVAL история отдаётся в фоновую запись в двоичный файл.
+    """
+
+    def __init__(self, path=None, resolutions=HISTORY_RESOLUTIONS, save_interval=HISTORY_SAVE_INTERVAL):
+        self.path = path
+        self.resolutions = tuple(resolutions)
+        self.save_interval = save_interval
+        self.scripts = {}  # script_uuid -> [RingSeries для каждого разрешения]
+        self._lock = threading.Lock()
+        self._next_save = time.monotonic() + save_interval
+        self.writer = BinaryFileWriter(path) if path else None
+
+    def _series(self, script_uuid):
+        series = self.scripts.get(script_uuid)
+        if series is None:
+            series = [RingSeries(step, capacity) for step, capacity in self.resolutions]
+            self.scripts[script_uuid] = series
+        return series
+
+    def record(self, snapshot):
+        """Добавляет в историю живые скрипты снимка метрик (MetricsSnapshot)"""
+        with self._lock:
+            for script_uuid, metrics in snapshot.scripts.items():
+                if not metrics.alive:
+                    continue
+                sample = (metrics.cpu, metrics.rss, metrics.threads, metrics.io)
+                for series in self._series(script_uuid):
+                    series.add(snapshot.timestamp, sample)
+        if self.writer is not None and time.monotonic() >= self._next_save:
+            self.save()
+
+    def window(self, script_uuid, field, step, count, now=None):
+        """Последние count точек поля field в разрешении step (секунды) или None, если истории нет"""
+        index = [s for s, _ in self.resolutions].index(step)
+        with self._lock:
+            series = self.scripts.get(script_uuid)
+            if series is None:
+                return None
+            return series[index].window(HISTORY_FIELDS.index(field), count, time.time() if now is None else now)
+
+    def forget(self, script_uuid):
+        """Удаляет историю скрипта (при удалении скрипта из каталога)"""
+        with self._lock:
+            self.scripts.pop(script_uuid, None)
+
+    def retain(self, script_uuids):
+        """Оставляет историю только скриптов из script_uuids"""
+        with self._lock:
+            for script_uuid in [u for u in self.scripts if u not in script_uuids]:
+                del self.scripts[script_uuid]
+
+    # --- Двоичный файл ---
+
+    def to_bytes(self):
+        """
+        Формат: заголовок, (шаг, число точек) каждого разрешения, затем для каждого скрипта
+        UUID (36 байт ASCII) и для каждого разрешения номера точек (int64) и значения (float32), little-endian.
+        """
+        with self._lock:
+            parts = [_HEADER.pack(HISTORY_MAGIC, HISTORY_VERSION, len(HISTORY_FIELDS),
+                                  len(self.resolutions), len(self.scripts))]
+            parts.extend(_RESOLUTION.pack(step, capacity) for step, capacity in self.resolutions)
+            for script_uuid, series_list in self.scripts.items():
+                parts.append(script_uuid.encode('ascii').ljust(_UUID_SIZE)[:_UUID_SIZE])
+                for series in series_list:
+                    buckets, values = series.buckets, series.values
+                    if sys.byteorder == 'big':
+                        buckets, values = array('q', buckets), array('f', values)
+                        buckets.byteswap()
+                        values.byteswap()
+                    parts.append(buckets.tobytes())
+                    parts.append(values.tobytes())
+        return b"".join(parts)
+
+    def load_bytes(self, data):
+        """Загружает историю из to_bytes(); ValueError, если файл повреждён. Другая раскладка разрешений - пустая история"""
+        if len(data) < _HEADER.size:
+            raise ValueError("файл истории обрезан")
+        magic, version, field_count, resolution_count, script_count = _HEADER.unpack_from(data)
+        if magic != HISTORY_MAGIC:
+            raise ValueError("неизвестный формат файла истории")
+        offset = _HEADER.size
+        resolutions = tuple(_RESOLUTION.unpack_from(data, offset + i * _RESOLUTION.size)
+                            for i in range(resolution_count))
+        offset += resolution_count * _RESOLUTION.size
+        if version != HISTORY_VERSION or field_count != len(HISTORY_FIELDS) or resolutions != self.resolutions:
+            # Раскладка поменялась вместе с версией программы - начинаем историю заново
+            return
+
+        scripts = {}
+        for _ in range(script_count):
+            script_uuid = data[offset:offset + _UUID_SIZE].decode('ascii').strip()
+            offset += _UUID_SIZE
+            series_list = []
+            for step, capacity in resolutions:
+                series = RingSeries(step, capacity)
+                for name, item_size in (('buckets', 8), ('values', 4 * field_count)):
+                    size = capacity * item_size
+                    if offset + size > len(data):
+                        raise ValueError("файл истории обрезан")
+                    target = getattr(series, name)
+                    target[:] = array(target.typecode, data[offset:offset + size])
+                    if sys.byteorder == 'big':
+                        target.byteswap()
+                    offset += size
+                series_list.append(series)
+            scripts[script_uuid] = series_list
+        with self._lock:
+            self.scripts = scripts
+
+    def load(self):
+        """Читает историю из файла; повреждённый файл откладывается в сторону"""
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            print(f"Ошибка чтения истории метрик: {e}")
+            return
+        try:
+            self.load_bytes(data)
+        except (ValueError, UnicodeDecodeError, struct.error) as e:
+            print(f"Ошибка чтения истории метрик: {e}")
+            quarantine_corrupt_file(self.path)
+            return
+        self.writer.mark_written(data)
+
+    def save(self):
+        """Планирует фоновую запись истории в файл"""
+        self._next_save = time.monotonic() + self.save_interval
+        self.writer.schedule(self.to_bytes())
@@ -0,0 +1,161 @@
+"""
+Отчёт об ошибке скрипта без копирования всего вывода: трассировки Python распознаются
+по мере поступления строк, хранятся только последние из них (одинаковые - с числом повторов)
+и короткий хвост остального вывода.
+"""
+import re
+from collections import OrderedDict, deque
+
+from .output import CRASH_REPORT_TAIL_LINES
+
+
+# Сколько разных последних трассировок попадает в отчёт об ошибке
+CRASH_REPORT_TRACEBACKS = 3
+# Предел строк одной трассировки (от очень длинной остаются начало и конец)
+TRACEBACK_MAX_LINES = 200
+
+TRACEBACK_HEADER = "Traceback (most recent call last):"
+EXCEPTION_GROUP_HEADER = "Exception Group Traceback (most recent call last):"
+# Строки между звеньями цепочки исключений
+CHAIN_MESSAGES = (
+    "During handling of the above exception, another exception occurred:",
+    "The above exception was the direct cause of the following exception:",
+)
+# Адреса объектов в repr различаются от запуска к запуску и не мешают группировке
+_ADDRESS = re.compile(r" at 0x[0-9a-fA-F]+")
+
+
+def _is_header(text):
+    """Заголовок трассировки или группы исключений (у группы он может идти с отступом и рамкой)"""
+    return text.startswith(TRACEBACK_HEADER) or text.lstrip(' +|').startswith(EXCEPTION_GROUP_HEADER)
+
+
+class _Block:
+    """Собираемая трассировка одного потока вывода"""
+
+    __slots__ = ('head', 'tail', 'skipped', 'state', 'group')
+
+    def __init__(self, first_line, group, max_lines):
+        self.head = [first_line]
+        self.tail = deque(maxlen=max_lines // 2)
+        self.skipped = 0
+        self.state = 'frames'  # frames -> exception -> blank -> chain -> frames ...
+        self.group = group  # группа исключений (ExceptionGroup): все её строки с отступом
+
+    def add(self, line, max_lines):
+        if len(self.head) < max_lines - self.tail.maxlen:
+            self.head.append(line)
+            return
+        if len(self.tail) == self.tail.maxlen:
+            self.skipped += 1
+        self.tail.append(line)
+
+    def text(self):
+        lines = list(self.head)
+        if self.skipped:
+            lines.append(f"  ... (пропущено строк: {self.skipped})")
+        lines.extend(self.tail)
+        return "\n".join(lines)
+
+
+class TracebackDetector:
+    """
+    Распознаёт трассировки Python в выводе одного запуска скрипта построчно, без буфера всего вывода.
+    Строки каждого потока (stdout, stderr) разбираются отдельно, чтобы перемешанный вывод не рвал трассировку.
+    Цепочки исключений ("During handling of the above exception...") собираются в одну трассировку,
+    одинаковые трассировки (с точностью до адресов объектов) группируются с числом повторов.
+    Хранятся последние keep разных трассировок и tail_lines строк остального вывода, поэтому
+    отчёт об ошибке маленький и готов сразу после завершения процесса.
+    """
+
+    def __init__(self, keep=CRASH_REPORT_TRACEBACKS, tail_lines=CRASH_REPORT_TAIL_LINES,
+                 max_block_lines=TRACEBACK_MAX_LINES):
+        self.keep = keep
+        self.max_block_lines = max_block_lines
+        self.tail = deque(maxlen=tail_lines)
+        self.groups = OrderedDict()  # нормализованный текст -> [текст, число повторов]
+        self.total = 0  # всего трассировок за запуск
+        self._blocks = {}  # поток -> _Block
+
+    def feed(self, line, stream='stderr'):
+        """Обрабатывает очередную строку вывода"""
+        text = line.rstrip('\r\n')
+        block = self._blocks.get(stream)
+        if block is not None and self._continue(block, text):
+            return
+        if block is not None:
+            self._finish(stream)
+
+        if _is_header(text):
+            self._blocks[stream] = _Block(text, not text.startswith(TRACEBACK_HEADER), self.max_block_lines)
+            return
+        self.tail.append(text)
+
+    def _continue(self, block, text):
+        """Добавляет строку к трассировке; False, если строка трассировке уже не принадлежит"""
+        indented = text[:1] in (' ', '\t', '+', '|')
+        if block.state == 'frames':
+            if indented:
+                block.add(text, self.max_block_lines)
+                return True
+            if block.group or not text.strip():
+                return False
+            # Первая строка без отступа - тип и сообщение исключения
+            block.add(text, self.max_block_lines)
+            block.state = 'exception'
+            return True
+        if block.state == 'exception':
+            # Сообщение исключения может занимать несколько строк (и заметки add_note) - до пустой строки
+            if not text.strip():
+                block.state = 'blank'
+                return True
+            if _is_header(text):
+                return False
+            block.add(text, self.max_block_lines)
+            return True
+        if block.state == 'blank':
+            if text not in CHAIN_MESSAGES:
+                return False
+            block.add("", self.max_block_lines)
+            block.add(text, self.max_block_lines)
+            block.state = 'chain'
+            return True
+        # state == 'chain': пустая строка и заголовок следующего звена
+        if not text.strip():
+            return True
+        if _is_header(text):
+            block.add("", self.max_block_lines)
+            block.add(text, self.max_block_lines)
+            block.state = 'frames'
+            block.group = not text.startswith(TRACEBACK_HEADER)
+            return True
+        return False
+
+    def _finish(self, stream):
+        text = self._blocks.pop(stream).text()
+        key = _ADDRESS.sub(" at 0x...", text)
+        group = self.groups.pop(key, None)
+        self.groups[key] = [text, group[1] + 1 if group else 1]
+        while len(self.groups) > self.keep:
+            self.groups.popitem(last=False)
+        self.total += 1
+
+    def flush(self):
+        """Завершает незаконченные трассировки (процесс вышел)"""
+        for stream in list(self._blocks):
+            self._finish(stream)
+
+    def report(self):
+        """Текст отчёта: последние трассировки с числом повторов и хвост остального вывода"""
+        self.flush()
+        parts = []
+        if self.groups:
+            title = "Трассировки Python"
+            if self.total > len(self.groups):
+                title += f" (всего: {self.total}, показаны последние разные: {len(self.groups)})"
+            parts.append(title + ":")
+            for text, count in self.groups.values():
+                parts.append(f"[повторений: {count}]\n{text}" if count > 1 else text)
+        if self.tail:
+            parts.append("Последние строки вывода:\n" + "\n".join(self.tail))
+        return "\n\n".join(parts)